@@ -0,0 +1,40 @@
+"""add notification outbox
+
+Revision ID: 012_notification_outbox
+Revises: 011_favorites
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '012_notification_outbox'
+down_revision = '011_favorites'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Тип notificationtype уже создан в 007_add_notifications
+    notificationtype_enum = postgresql.ENUM('ITEM_REMOVED_BY_REPORT', 'ITEM_APPROVED', 'ITEM_REJECTED', 'NEW_BOOKING_REQUEST', 'BOOKING_CANCELLED_BY_RENTER', 'BOOKING_CONFIRMED', 'BOOKING_REJECTED', 'BOOKING_CANCELLED_BY_OWNER', name='notificationtype', create_type=False)
+
+    # Outbox пишется в транзакции изменения состояния, поэтому без внешних ключей и лишних индексов
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('type', notificationtype_enum, nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('related_item_id', sa.Integer(), nullable=True),
+        sa.Column('related_booking_id', sa.Integer(), nullable=True),
+        sa.Column('related_report_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('notification_outbox')
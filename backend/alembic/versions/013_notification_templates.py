@@ -0,0 +1,142 @@
+"""store notifications as template params
+
+Revision ID: 013_notification_templates
+Revises: 012_notification_outbox
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+import re
+
+# revision identifiers, used by Alembic.
+revision = '013_notification_templates'
+down_revision = '012_notification_outbox'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Шаблоны зафиксированы здесь, чтобы миграция не зависела от текущего кода приложения
+TEMPLATES = {
+    'ITEM_REMOVED_BY_REPORT': ('Объявление снято из-за жалобы', 'Ваше объявление "{item}" было снято с публикации из-за жалобы.'),
+    'ITEM_APPROVED': ('Объявление одобрено', 'Ваше объявление "{item}" было одобрено и опубликовано.'),
+    'ITEM_REJECTED': ('Объявление отклонено', 'Ваше объявление "{item}" было отклонено.'),
+    'NEW_BOOKING_REQUEST': ('Новое бронирование', 'Пользователь {renter} хочет забронировать ваше объявление "{item}".'),
+    'BOOKING_CONFIRMED': ('Бронирование подтверждено', 'Ваше бронирование объявления "{item}" было подтверждено.'),
+    'BOOKING_REJECTED': ('Бронирование отклонено', 'Ваше бронирование объявления "{item}" было отклонено владельцем.'),
+    'BOOKING_CANCELLED_BY_OWNER': ('Бронирование отменено', 'Владелец отменил ваше бронирование объявления "{item}".'),
+    'BOOKING_CANCELLED_BY_RENTER': ('Бронирование отменено', 'Пользователь {renter} отменил бронирование вашего объявления "{item}".'),
+}
+COMMENT_SUFFIX = ' Причина: {comment}'
+
+
+def _pattern(message):
+    pattern = re.escape(message)
+    for name in ('item', 'renter'):
+        pattern = pattern.replace(re.escape('{%s}' % name), '(?P<%s>.*)' % name)
+    return pattern
+
+
+PATTERNS = {
+    notification_type: re.compile(
+        _pattern(message) + ('(?: Причина: (?P<comment>.*))?' if notification_type == 'ITEM_REJECTED' else ''),
+        re.DOTALL,
+    )
+    for notification_type, (_, message) in TEMPLATES.items()
+}
+
+
+def render(notification_type, params):
+    title, message = TEMPLATES[notification_type]
+    message = message.format(item=params.get('item', ''), renter=params.get('renter', ''))
+    if params.get('comment'):
+        message += COMMENT_SUFFIX.format(comment=params['comment'])
+    return title, message
+
+
+def parse(notification_type, title, message):
+    """Восстанавливает параметры шаблона из готового текста (None, если текст не совпадает с шаблоном)"""
+    if notification_type not in TEMPLATES or title != TEMPLATES[notification_type][0]:
+        return None
+    match = PATTERNS[notification_type].fullmatch(message or '')
+    if not match:
+        return None
+    params = {key: value for key, value in match.groupdict().items() if value}
+    if render(notification_type, params) != (title, message):
+        return None
+    return params
+
+
+def dump(params):
+    return json.dumps(params, ensure_ascii=False, separators=(',', ':'))
+
+
+def _batches(connection, table, columns, where):
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text(f"SELECT id, {columns} FROM {table} WHERE id > :last_id AND {where} ORDER BY id LIMIT :limit"),
+            {'last_id': last_id, 'limit': BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    op.add_column('notifications', sa.Column('params', sa.Text(), nullable=True))
+    op.alter_column('notifications', 'title', existing_type=sa.String(), nullable=True)
+    op.alter_column('notifications', 'message', existing_type=sa.Text(), nullable=True)
+
+    # Сжимаем существующие записи: текст заменяется параметрами шаблона.
+    # Записи, текст которых не восстанавливается шаблоном, остаются как есть.
+    for rows in _batches(connection, 'notifications', 'type, title, message', 'params IS NULL'):
+        updates = []
+        for row_id, notification_type, title, message in rows:
+            params = parse(notification_type, title, message)
+            if params is not None:
+                updates.append({'id': row_id, 'params': dump(params)})
+        if updates:
+            connection.execute(
+                sa.text("UPDATE notifications SET params = :params, title = NULL, message = NULL WHERE id = :id"),
+                updates,
+            )
+
+    op.add_column('notification_outbox', sa.Column('params', sa.Text(), nullable=False, server_default='{}'))
+    for rows in _batches(connection, 'notification_outbox', 'type, title, message', '1 = 1'):
+        updates = [
+            {'id': row_id, 'params': dump(parse(notification_type, title, message) or {})}
+            for row_id, notification_type, title, message in rows
+        ]
+        connection.execute(sa.text("UPDATE notification_outbox SET params = :params WHERE id = :id"), updates)
+    op.drop_column('notification_outbox', 'message')
+    op.drop_column('notification_outbox', 'title')
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+
+    op.add_column('notification_outbox', sa.Column('title', sa.String(), nullable=False, server_default=''))
+    op.add_column('notification_outbox', sa.Column('message', sa.Text(), nullable=False, server_default=''))
+    for rows in _batches(connection, 'notification_outbox', 'type, params', '1 = 1'):
+        updates = []
+        for row_id, notification_type, params in rows:
+            title, message = render(notification_type, json.loads(params or '{}'))
+            updates.append({'id': row_id, 'title': title, 'message': message})
+        connection.execute(sa.text("UPDATE notification_outbox SET title = :title, message = :message WHERE id = :id"), updates)
+    op.drop_column('notification_outbox', 'params')
+
+    for rows in _batches(connection, 'notifications', 'type, params', 'params IS NOT NULL'):
+        updates = []
+        for row_id, notification_type, params in rows:
+            title, message = render(notification_type, json.loads(params))
+            updates.append({'id': row_id, 'title': title, 'message': message})
+        connection.execute(sa.text("UPDATE notifications SET title = :title, message = :message WHERE id = :id"), updates)
+    op.alter_column('notifications', 'message', existing_type=sa.Text(), nullable=False)
+    op.alter_column('notifications', 'title', existing_type=sa.String(), nullable=False)
+    op.drop_column('notifications', 'params')
@@ -0,0 +1,72 @@
+"""notification archive and hot-query index
+
+Revision ID: 014_notification_retention
+Revises: 013_notification_templates
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '014_notification_retention'
+down_revision = '013_notification_templates'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Основной запрос get_notifications/get_unread_count
+    op.create_index(
+        'ix_notifications_user_id_is_read_created_at',
+        'notifications',
+        ['user_id', 'is_read', 'created_at'],
+        unique=False,
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # Архив секционирован по месяцам created_at; секции создает задача архивации
+        op.execute("""
+            CREATE TABLE notifications_archive (
+                id INTEGER NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                user_id INTEGER NOT NULL,
+                type notificationtype NOT NULL,
+                params TEXT,
+                title VARCHAR,
+                message TEXT,
+                is_read BOOLEAN NOT NULL,
+                related_item_id INTEGER,
+                related_booking_id INTEGER,
+                related_report_id INTEGER,
+                read_at TIMESTAMP WITH TIME ZONE,
+                archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """)
+    else:
+        op.create_table(
+            'notifications_archive',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('type', sa.Enum('ITEM_REMOVED_BY_REPORT', 'ITEM_APPROVED', 'ITEM_REJECTED', 'NEW_BOOKING_REQUEST', 'BOOKING_CANCELLED_BY_RENTER', 'BOOKING_CONFIRMED', 'BOOKING_REJECTED', 'BOOKING_CANCELLED_BY_OWNER', name='notificationtype'), nullable=False),
+            sa.Column('params', sa.Text(), nullable=True),
+            sa.Column('title', sa.String(), nullable=True),
+            sa.Column('message', sa.Text(), nullable=True),
+            sa.Column('is_read', sa.Boolean(), nullable=False),
+            sa.Column('related_item_id', sa.Integer(), nullable=True),
+            sa.Column('related_booking_id', sa.Integer(), nullable=True),
+            sa.Column('related_report_id', sa.Integer(), nullable=True),
+            sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+            sa.PrimaryKeyConstraint('id', 'created_at')
+        )
+    op.create_index(op.f('ix_notifications_archive_user_id'), 'notifications_archive', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_notifications_archive_user_id'), table_name='notifications_archive')
+    # Секции удаляются вместе с родительской таблицей
+    op.drop_table('notifications_archive')
+    op.drop_index('ix_notifications_user_id_is_read_created_at', table_name='notifications')
@@ -0,0 +1,40 @@
+"""notification delivery state
+
+Revision ID: 015_notification_delivery
+Revises: 014_notification_retention
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '015_notification_delivery'
+down_revision = '014_notification_retention'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('notifications', sa.Column('delivery_attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('notifications', sa.Column('next_delivery_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Уже существующие уведомления в Telegram не отправляем
+    op.execute("UPDATE notifications SET delivered_at = created_at")
+
+    # Частичный индекс: воркер доставки смотрит только на недоставленные уведомления
+    op.create_index(
+        'ix_notifications_undelivered',
+        'notifications',
+        ['next_delivery_at'],
+        unique=False,
+        postgresql_where=sa.text('delivered_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_undelivered', table_name='notifications')
+    op.drop_column('notifications', 'next_delivery_at')
+    op.drop_column('notifications', 'delivery_attempts')
+    op.drop_column('notifications', 'delivered_at')
@@ -0,0 +1,25 @@
+"""notification coalescing count
+
+Revision ID: 016_notification_count
+Revises: 015_notification_delivery
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '016_notification_count'
+down_revision = '015_notification_delivery'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('count', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('notifications_archive', sa.Column('count', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('notifications_archive', 'count')
+    op.drop_column('notifications', 'count')
@@ -0,0 +1,23 @@
+"""user auth version
+
+Revision ID: 017_user_auth_version
+Revises: 016_notification_count
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '017_user_auth_version'
+down_revision = '016_notification_count'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('auth_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'auth_version')
@@ -0,0 +1,45 @@
+"""moderation result cache
+
+Revision ID: 019_moderation_cache
+Revises: 018_user_sessions
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '019_moderation_cache'
+down_revision = '018_user_sessions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'moderation_results',
+        sa.Column('image_hash', sa.String(length=64), nullable=False),
+        sa.Column('model_version', sa.String(length=64), nullable=False),
+        sa.Column('predicted_class', sa.String(length=50), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('probabilities', sa.JSON(), nullable=False),
+        sa.Column('embedding', sa.LargeBinary(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('image_hash', 'model_version'),
+    )
+    op.create_index(op.f('ix_moderation_results_model_version'), 'moderation_results', ['model_version'], unique=False)
+    op.create_table(
+        'moderation_image_urls',
+        sa.Column('url_hash', sa.String(length=64), nullable=False),
+        sa.Column('image_hash', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('url_hash'),
+    )
+    op.create_index(op.f('ix_moderation_image_urls_image_hash'), 'moderation_image_urls', ['image_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_moderation_image_urls_image_hash'), table_name='moderation_image_urls')
+    op.drop_table('moderation_image_urls')
+    op.drop_index(op.f('ix_moderation_results_model_version'), table_name='moderation_results')
+    op.drop_table('moderation_results')
@@ -0,0 +1,44 @@
+"""moderation jobs queue
+
+Revision ID: 020_moderation_jobs
+Revises: 019_moderation_cache
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '020_moderation_jobs'
+down_revision = '019_moderation_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'moderation_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('image_url', sa.String(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.Enum('PENDING', 'DEAD', name='moderationjobstatus'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_moderation_jobs_id'), 'moderation_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_moderation_jobs_item_id'), 'moderation_jobs', ['item_id'], unique=False)
+    # Воркер выбирает ожидающие задачи, срок которых наступил
+    op.create_index('ix_moderation_jobs_status_next_attempt_at', 'moderation_jobs', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_moderation_jobs_status_next_attempt_at', table_name='moderation_jobs')
+    op.drop_index(op.f('ix_moderation_jobs_item_id'), table_name='moderation_jobs')
+    op.drop_index(op.f('ix_moderation_jobs_id'), table_name='moderation_jobs')
+    op.drop_table('moderation_jobs')
+    op.execute('DROP TYPE IF EXISTS moderationjobstatus')
@@ -0,0 +1,25 @@
+"""item text moderation score
+
+Revision ID: 021_item_text_moderation
+Revises: 020_moderation_jobs
+Create Date: 2026-10-20 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '021_item_text_moderation'
+down_revision = '020_moderation_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('items', sa.Column('text_moderation_score', sa.Float(), nullable=True))
+    op.add_column('items', sa.Column('text_moderation_flags', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('items', 'text_moderation_flags')
+    op.drop_column('items', 'text_moderation_score')
@@ -0,0 +1,50 @@
+"""item embeddings and duplicate flag
+
+Revision ID: 022_item_embeddings
+Revises: 021_item_text_moderation
+Create Date: 2026-10-20 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '022_item_embeddings'
+down_revision = '021_item_text_moderation'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'item_embeddings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('model_version', sa.String(length=64), nullable=False),
+        sa.Column('embedding', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('item_id'),
+    )
+    op.create_index(op.f('ix_item_embeddings_id'), 'item_embeddings', ['id'], unique=False)
+    op.create_index(op.f('ix_item_embeddings_owner_id'), 'item_embeddings', ['owner_id'], unique=False)
+    op.create_index(op.f('ix_item_embeddings_model_version'), 'item_embeddings', ['model_version'], unique=False)
+
+    op.add_column('items', sa.Column('duplicate_of_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'items_duplicate_of_id_fkey',
+        'items', 'items',
+        ['duplicate_of_id'], ['id'],
+        ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('items_duplicate_of_id_fkey', 'items', type_='foreignkey')
+    op.drop_column('items', 'duplicate_of_id')
+    op.drop_index(op.f('ix_item_embeddings_model_version'), table_name='item_embeddings')
+    op.drop_index(op.f('ix_item_embeddings_owner_id'), table_name='item_embeddings')
+    op.drop_index(op.f('ix_item_embeddings_id'), table_name='item_embeddings')
+    op.drop_table('item_embeddings')
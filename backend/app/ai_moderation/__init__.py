@@ -4,11 +4,14 @@ Uses fine-tuned CLIP model for classifying images
 """
 
 # Lazy imports to avoid requiring torch when AI moderation is disabled
-__all__ = ["ImageModerationPredictor"]
+__all__ = ["ImageModerationPredictor", "OnnxModerationPredictor"]
 
 def __getattr__(name):
     if name == "ImageModerationPredictor":
         from app.ai_moderation.predictor import ImageModerationPredictor
         return ImageModerationPredictor
+    if name == "OnnxModerationPredictor":
+        from app.ai_moderation.onnx_engine import OnnxModerationPredictor
+        return OnnxModerationPredictor
     raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
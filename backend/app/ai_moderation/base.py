@@ -0,0 +1,183 @@
+"""
+Engine-independent part of the image moderation predictor.
+
+Subclasses implement predict_batch() for a concrete inference engine
+(PyTorch in predictor.py, ONNX Runtime in onnx_engine.py); everything else,
+including the prediction format, is shared. This module does not import torch.
+"""
+
+import asyncio
+from PIL import Image
+from typing import Dict, Any, List, Sequence
+import logging
+
+from app.core.memory import peak_rss_mb, rss_mb
+from app.ai_moderation.preprocessor import download_image_async, download_image_sync, load_image_from_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class ModerationPredictorBase:
+    """
+    Common interface of moderation predictors.
+    
+    Attributes:
+        classes: class names in the order of the model outputs
+        model_version: identifies the weights; cached results are tied to it
+    """
+    
+    classes: List[str]
+    model_version: str
+    
+    def predict(self, image: Image.Image) -> Dict[str, Any]:
+        """
+        Predict moderation status for an image.
+        
+        Args:
+            image: PIL.Image in RGB format
+        
+        Returns:
+            dict with fields:
+            - predicted_class: str, one of self.classes
+            - confidence: float, 0.0-1.0
+            - probabilities: dict with probabilities for all classes
+            - processing_time_ms: int
+            - embedding: normalized CLIP image embedding (list of floats)
+        """
+        return self.predict_batch([image])[0]
+    
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict[str, Any]]:
+        """
+        Predict moderation status for several images in one forward pass.
+        
+        Returns:
+            list of prediction dicts (same format as predict()), in input order
+        """
+        raise NotImplementedError
+    
+    def build_predictions(
+        self,
+        probs: Sequence[Sequence[float]],
+        embeddings: Sequence[Sequence[float]],
+        processing_time_ms: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Turn per-image class probabilities and embeddings into prediction dicts.
+        """
+        predictions = []
+        for row, embedding in zip(probs, embeddings):
+            predicted_idx = max(range(len(row)), key=row.__getitem__)
+            predicted_class = self.classes[predicted_idx]
+            confidence = row[predicted_idx]
+            probabilities = {
+                class_name: float(prob)
+                for class_name, prob in zip(self.classes, row)
+            }
+            
+            logger.debug(
+                f"Prediction details - class: {predicted_class}, confidence: {confidence:.6f}, "
+                f"probabilities: {probabilities}"
+            )
+            
+            predictions.append({
+                "predicted_class": predicted_class,
+                "confidence": confidence,
+                "probabilities": probabilities,
+                "processing_time_ms": processing_time_ms,
+                "embedding": embedding,
+            })
+        
+        return predictions
+    
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Memory of the worker process in MB; engines add the size of their weights.
+        """
+        return {
+            "rss_mb": round(rss_mb(), 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+    
+    def warmup(self) -> None:
+        """
+        Run one inference on a blank image so that lazy initialization
+        (kernels, allocator, thread pools) happens before the first request.
+        """
+        self.predict(Image.new("RGB", (224, 224)))
+    
+    async def predict_from_url(self, image_url: str) -> Dict[str, Any]:
+        """
+        Predict moderation status for an image from URL (async).
+        
+        Args:
+            image_url: URL of the image
+        
+        Returns:
+            dict with prediction results (same format as predict())
+        
+        Raises:
+            ValueError: If image cannot be downloaded or processed
+        """
+        image = await download_image_async(image_url)
+        # Inference is CPU-bound: keep it off the event loop
+        return await asyncio.to_thread(self.predict, image)
+    
+    def predict_from_url_sync(self, image_url: str) -> Dict[str, Any]:
+        """
+        Predict moderation status for an image from URL (sync).
+        
+        Args:
+            image_url: URL of the image
+        
+        Returns:
+            dict with prediction results (same format as predict())
+        
+        Raises:
+            ValueError: If image cannot be downloaded or processed
+        """
+        image = download_image_sync(image_url)
+        return self.predict(image)
+    
+    def predict_from_bytes(self, image_bytes: bytes) -> Dict[str, Any]:
+        """
+        Predict moderation status for an image from bytes.
+        
+        Args:
+            image_bytes: Image data as bytes
+        
+        Returns:
+            dict with prediction results (same format as predict())
+        
+        Raises:
+            ValueError: If image cannot be decoded
+        """
+        image = load_image_from_bytes(image_bytes)
+        return self.predict(image)
+    
+    def format_prediction_for_api(self, prediction: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Format prediction result for API response.
+        
+        Args:
+            prediction: Raw prediction dict from predict()
+        
+        Returns:
+            Formatted dict for API response:
+            - status: "approved" or "rejected"
+            - reason: exact class name
+            - confidence: float
+            - probabilities: dict
+            - processing_time_ms: int
+            - model: "trained"
+        """
+        predicted_class = prediction["predicted_class"]
+        
+        return {
+            "status": "approved" if predicted_class == "approved" else "rejected",
+            "reason": predicted_class,
+            "confidence": prediction["confidence"],
+            "probabilities": prediction["probabilities"],
+            "processing_time_ms": prediction["processing_time_ms"],
+            "model": "trained",
+        }
+
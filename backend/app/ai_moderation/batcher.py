@@ -0,0 +1,220 @@
+"""
+Dynamic micro-batching for moderation inference.
+
+Concurrent requests put their images on a queue. A single worker task takes
+the first waiting image, collects more until max_batch_size is reached or
+max_wait_ms has passed, runs one batched forward pass in a thread and hands
+each result back to the awaiting caller. Under low load an image waits at
+most max_wait_ms; under high load batches fill up and throughput grows.
+
+Inference runs on a dedicated executor, never on the event loop or in the
+default thread pool shared with database work. The queue is bounded: when it
+is full submit() fails at once with InferenceQueueFull instead of making the
+caller wait behind everybody else.
+
+This module does not import torch: it works with any callable that maps a
+list of inputs to a list of results.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """Too many images are already waiting for inference"""
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class BatcherMetrics:
+    """Counters plus a sliding window of recent latencies and batch sizes"""
+
+    def __init__(self, window: int = 1000):
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.rejected = 0
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.queue_wait_ms: Deque[float] = deque(maxlen=window)
+        self.batch_sizes: Deque[int] = deque(maxlen=window)
+        self.inference_ms: Deque[float] = deque(maxlen=window)
+
+    def record_batch(self, size: int, inference_ms: float, queue_waits_ms: List[float], latencies_ms: List[float]) -> None:
+        self.batches += 1
+        self.items += size
+        self.batch_sizes.append(size)
+        self.inference_ms.append(inference_ms)
+        self.queue_wait_ms.extend(queue_waits_ms)
+        self.latencies_ms.extend(latencies_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        sizes = list(self.batch_sizes)
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            "max_batch_size_seen": max(sizes) if sizes else 0,
+            "latency_p50_ms": round(_percentile(self.latencies_ms, 50), 2),
+            "latency_p99_ms": round(_percentile(self.latencies_ms, 99), 2),
+            "queue_wait_p99_ms": round(_percentile(self.queue_wait_ms, 99), 2),
+            "inference_p50_ms": round(_percentile(self.inference_ms, 50), 2),
+        }
+
+
+# (input, future, monotonic time of submission)
+_Entry = Tuple[Any, "asyncio.Future", float]
+
+
+class InferenceBatcher:
+    """
+    Groups concurrent submissions into batches for predict_batch.
+
+    Args:
+        predict_batch: blocking callable, list of inputs -> list of results (same order)
+        max_batch_size: upper bound for one forward pass
+        max_wait_ms: how long the first image of a batch waits for company
+        max_queue: images allowed to wait; beyond that submit() raises InferenceQueueFull
+        executor: where predict_batch runs (default: the loop's default executor)
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 0,
+        executor: Optional[Executor] = None,
+        metrics_window: int = 1000,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.executor = executor
+        self.metrics = BatcherMetrics(metrics_window)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one input and wait for its result (exceptions of the model are re-raised)"""
+        queue = self._ensure_worker()
+        if self.max_queue and queue.qsize() >= self.max_queue:
+            self.metrics.rejected += 1
+            raise InferenceQueueFull(f"{queue.qsize()} images are waiting for inference")
+        future = self._loop.create_future()
+        queue.put_nowait((item, future, time.monotonic()))
+        return await future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self, queue: asyncio.Queue) -> List[_Entry]:
+        batch = [await queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Already queued entries are taken without waiting
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Callers that went away (request cancelled) are not worth a forward pass
+        return [entry for entry in batch if not entry[1].done()]
+
+    async def _run(self) -> None:
+        queue = self._queue
+        batch: List[_Entry] = []
+        try:
+            while True:
+                batch = await self._collect(queue)
+                if batch:
+                    await self._execute(batch)
+        finally:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.cancel()
+
+    async def _execute(self, batch: List[_Entry]) -> None:
+        started = time.monotonic()
+        inputs = [item for item, _, _ in batch]
+        try:
+            results = await self._loop.run_in_executor(self.executor, self.predict_batch, inputs)
+            if len(results) != len(inputs):
+                raise RuntimeError(f"predict_batch returned {len(results)} results for {len(inputs)} inputs")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if len(batch) > 1:
+                # One broken input must not fail its neighbours: retry them one by one
+                logger.warning(f"Batch of {len(batch)} failed ({e}), retrying items individually")
+                for entry in batch:
+                    await self._execute([entry])
+                return
+            self.metrics.errors += 1
+            _, future, _ = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        finished = time.monotonic()
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        self.metrics.record_batch(
+            len(batch),
+            (finished - started) * 1000,
+            [(started - submitted) * 1000 for _, _, submitted in batch],
+            [(finished - submitted) * 1000 for _, _, submitted in batch],
+        )
+
+    async def close(self) -> None:
+        """Stop the worker; callers still waiting get CancelledError"""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics.snapshot(),
+            "queue_depth": self.queue_depth(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_queue": self.max_queue,
+        }
@@ -0,0 +1,200 @@
+"""
+Offline evaluation and benchmarking of moderation predictors.
+
+Works with any ModerationPredictorBase (PyTorch or ONNX Runtime) and does not
+import torch. A labelled dataset is a directory with one subdirectory per
+class, named like the model classes:
+
+    dataset/
+        approved/*.jpg
+        rejected_spam/*.jpg
+        ...
+
+Quality is reported per confidence threshold: a prediction below the threshold
+is left to a human (it abstains), so precision is measured over the images the
+model would act on and coverage says how many of them there are. This is the
+trade-off behind AI_MODERATION_AUTO_APPROVE_CONFIDENCE and
+AI_MODERATION_AUTO_REJECT_CONFIDENCE.
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from app.ai_moderation.preprocessor import load_image_from_bytes
+from app.core.ai_service import auto_moderation_status
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+APPROVED = "approved"
+
+
+def load_labelled_dataset(root, classes: Optional[Sequence[str]] = None) -> List[Tuple[Path, str]]:
+    """
+    List (path, label) pairs of a dataset directory, sorted by label and name.
+
+    Args:
+        root: directory with one subdirectory per class
+        classes: if given, subdirectories with other names are an error
+
+    Raises:
+        ValueError: If the directory has no images or an unknown class
+    """
+    root = Path(root)
+    samples = []
+    for directory in sorted(p for p in root.iterdir() if p.is_dir()):
+        if classes is not None and directory.name not in classes:
+            raise ValueError(f"Unknown class directory {directory.name!r}, expected one of {list(classes)}")
+        samples.extend(
+            (path, directory.name)
+            for path in sorted(directory.iterdir())
+            if path.suffix.lower() in IMAGE_SUFFIXES
+        )
+    if not samples:
+        raise ValueError(f"No labelled images found in {root}")
+    return samples
+
+
+def load_image(path) -> Image.Image:
+    """Decode an image file the same way uploads are decoded in production"""
+    return load_image_from_bytes(Path(path).read_bytes())
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100)"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def latency_stats(timings_ms: Sequence[float], images_per_call: int = 1) -> Dict[str, float]:
+    """Latency percentiles of predict_batch() calls and the resulting throughput"""
+    return {
+        "calls": len(timings_ms),
+        "p50_ms": round(percentile(timings_ms, 50), 2),
+        "p90_ms": round(percentile(timings_ms, 90), 2),
+        "p99_ms": round(percentile(timings_ms, 99), 2),
+        "mean_ms": round(sum(timings_ms) / len(timings_ms), 2),
+        "images_per_second": round(images_per_call * len(timings_ms) / (sum(timings_ms) / 1000), 2),
+    }
+
+
+def classification_report(
+    predictions: Sequence[Dict[str, Any]],
+    labels: Sequence[str],
+    classes: Sequence[str],
+    threshold: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Per-class precision and recall when predictions below threshold abstain.
+
+    Precision of a class is computed over the confident predictions of that
+    class; recall over all images of the class, so abstentions lower recall.
+
+    Returns:
+        dict with threshold, coverage (share of confident predictions),
+        accuracy over confident predictions and per-class
+        precision/recall/support/predicted
+    """
+    confident = [
+        (prediction["predicted_class"], label)
+        for prediction, label in zip(predictions, labels)
+        if prediction["confidence"] >= threshold
+    ]
+    correct = sum(predicted == label for predicted, label in confident)
+
+    per_class = {}
+    for class_name in classes:
+        support = sum(label == class_name for label in labels)
+        predicted = sum(p == class_name for p, _ in confident)
+        true_positives = sum(p == class_name and label == class_name for p, label in confident)
+        per_class[class_name] = {
+            "precision": round(true_positives / predicted, 4) if predicted else None,
+            "recall": round(true_positives / support, 4) if support else None,
+            "support": support,
+            "predicted": predicted,
+        }
+
+    return {
+        "threshold": threshold,
+        "coverage": round(len(confident) / len(labels), 4) if labels else 0.0,
+        "accuracy": round(correct / len(confident), 4) if confident else None,
+        "classes": per_class,
+    }
+
+
+def auto_moderation_report(
+    predictions: Sequence[Dict[str, Any]],
+    labels: Sequence[str],
+    approve_confidence: float,
+    reject_confidence: float
+) -> Dict[str, Any]:
+    """
+    What automatic moderation would do with these thresholds.
+
+    Decisions come from ai_service.auto_moderation_status, the rule live
+    moderation uses: an image is approved automatically if the model predicts
+    "approved" with confidence >= approve_confidence, rejected if it predicts
+    any other class with confidence >= reject_confidence, and goes to the
+    human queue otherwise. The error rates are what moderators would never see:
+    wrongly_approved are violating images let through, wrongly_rejected are
+    good listings blocked.
+    """
+    approved = rejected = wrongly_approved = wrongly_rejected = 0
+    for prediction, label in zip(predictions, labels):
+        status = auto_moderation_status(
+            prediction["predicted_class"], prediction["confidence"], approve_confidence, reject_confidence
+        )
+        if status == "approved":
+            approved += 1
+            wrongly_approved += label != APPROVED
+        elif status == "rejected":
+            rejected += 1
+            wrongly_rejected += label == APPROVED
+
+    total = len(labels)
+    return {
+        "approve_confidence": approve_confidence,
+        "reject_confidence": reject_confidence,
+        "auto_approved": approved,
+        "auto_rejected": rejected,
+        "manual": total - approved - rejected,
+        "automation_rate": round((approved + rejected) / total, 4) if total else 0.0,
+        "wrongly_approved": wrongly_approved,
+        "wrongly_rejected": wrongly_rejected,
+    }
+
+
+def predict_all(predictor, images: Sequence[Image.Image], batch_size: int = 16) -> List[Dict[str, Any]]:
+    """Run the predictor over all images in batches of batch_size"""
+    predictions = []
+    for start in range(0, len(images), batch_size):
+        predictions.extend(predictor.predict_batch(list(images[start:start + batch_size])))
+    return predictions
+
+
+def benchmark(
+    predictor,
+    images: Sequence[Image.Image],
+    batch_size: int,
+    repeat: int = 20,
+    warmup: int = 2
+) -> Dict[str, Any]:
+    """
+    Time predictor.predict_batch() on batches of batch_size images.
+
+    Images are cycled if there are fewer than batch_size. Preprocessing is
+    included in the timings, decoding is not.
+    """
+    batch = [images[i % len(images)] for i in range(batch_size)]
+    for _ in range(warmup):
+        predictor.predict_batch(batch)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predictor.predict_batch(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {"batch_size": batch_size, **latency_stats(timings, batch_size)}
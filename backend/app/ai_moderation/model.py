@@ -1,17 +1,32 @@
 """
 Model loading and initialization for CLIP-based image moderation
+
+Only the vision tower and the visual projection of CLIP are loaded
+(CLIPVisionModelWithProjection): the text encoder is never used for
+moderation and would take a large share of every worker's memory.
 """
 
 import torch
 import torch.nn as nn
-from transformers import CLIPProcessor, CLIPModel
+from transformers import CLIPImageProcessor, CLIPVisionModelWithProjection
 from pathlib import Path
+import hashlib
 import json
 from typing import Optional, Dict, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+DTYPES = {
+    "float32": torch.float32,
+    "bfloat16": torch.bfloat16,
+    "float16": torch.float16,
+}
+
+
+def _parameters_mb(module: nn.Module) -> float:
+    return sum(p.numel() * p.element_size() for p in module.parameters()) / 2**20
+
 
 class CLIPClassificationHead(nn.Module):
     """
@@ -48,7 +63,8 @@ class CLIPModerationModel:
         self,
         model_dir: Path,
         model_name: str = "openai/clip-vit-base-patch32",
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        dtype: str = "float32"
     ):
         """
         Initialize CLIP moderation model.
@@ -57,6 +73,8 @@ class CLIPModerationModel:
             model_dir: Path to directory containing trained model files
             model_name: Hugging Face model name for CLIP
             device: Device to use ('cuda' or 'cpu'). Auto-detects if None.
+            dtype: Weights of the vision tower: 'float32', 'bfloat16' or 'float16'.
+                The classification head always runs in float32.
         """
         self.model_dir = Path(model_dir)
         self.model_name = model_name
@@ -66,11 +84,18 @@ class CLIPModerationModel:
         else:
             self.device = torch.device(device)
         
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}, expected one of {sorted(DTYPES)}")
+        self.dtype = DTYPES[dtype]
+        if self.dtype == torch.float16 and self.device.type == "cpu":
+            logger.warning("float16 inference on CPU is slow on most processors, bfloat16 is preferred")
+        
         self.config: Optional[Dict[str, Any]] = None
         self.classes: Optional[list] = None
-        self.processor: Optional[CLIPProcessor] = None
-        self.clip_model: Optional[CLIPModel] = None
+        self.processor: Optional[CLIPImageProcessor] = None
+        self.clip_model: Optional[CLIPVisionModelWithProjection] = None
         self.classification_head: Optional[CLIPClassificationHead] = None
+        self.version: Optional[str] = None
         
     def load_config(self) -> Dict[str, Any]:
         """Load model configuration from config.json"""
@@ -92,14 +117,18 @@ class CLIPModerationModel:
         return self.config
     
     def load_models(self):
-        """Load CLIP model and trained classification head"""
+        """Load the CLIP vision tower and trained classification head"""
         if self.config is None:
             self.load_config()
         
-        # Load CLIP processor and model
-        logger.info(f"Loading CLIP model: {self.model_name}")
-        self.processor = CLIPProcessor.from_pretrained(self.model_name)
-        self.clip_model = CLIPModel.from_pretrained(self.model_name)
+        # Load CLIP image processor and vision model (text weights of the checkpoint are skipped)
+        logger.info(f"Loading CLIP vision model: {self.model_name} ({str(self.dtype).replace('torch.', '')})")
+        self.processor = CLIPImageProcessor.from_pretrained(self.model_name)
+        self.clip_model = CLIPVisionModelWithProjection.from_pretrained(
+            self.model_name,
+            torch_dtype=self.dtype,
+            low_cpu_mem_usage=True
+        )
         self.clip_model = self.clip_model.to(self.device)
         self.clip_model.eval()  # Set to evaluation mode
         
@@ -127,7 +156,31 @@ class CLIPModerationModel:
         self.classification_head.load_state_dict(state_dict)
         self.classification_head.eval()  # Set to evaluation mode
         
-        logger.info("Classification head loaded successfully")
+        self.version = self.compute_version(head_path)
+        logger.info(f"Classification head loaded successfully (model version {self.version[:12]})")
+    
+    def compute_version(self, head_path: Path) -> str:
+        """
+        Identify the exact model: sha256 of the backbone name, config and head weights.
+        Cached moderation results are only valid for the version that produced them.
+        """
+        digest = hashlib.sha256(self.model_name.encode())
+        digest.update(json.dumps(self.config, sort_keys=True).encode())
+        # Reduced precision changes the outputs slightly: results are cached separately
+        if self.dtype != torch.float32:
+            digest.update(str(self.dtype).encode())
+        with open(head_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def memory_report(self) -> Dict[str, Any]:
+        """Size of the loaded weights in MB"""
+        return {
+            "dtype": str(self.dtype).replace("torch.", ""),
+            "vision_weights_mb": round(_parameters_mb(self.clip_model), 1),
+            "head_weights_mb": round(_parameters_mb(self.classification_head), 1),
+        }
     
     def is_loaded(self) -> bool:
         """Check if models are loaded"""
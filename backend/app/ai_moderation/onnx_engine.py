@@ -0,0 +1,259 @@
+"""
+ONNX Runtime engine for the CLIP moderation model.
+
+The vision tower, the visual projection, L2 normalization and the
+classification head are exported as one graph:
+
+    pixel_values (N, 3, H, W) -> probs (N, classes), embeddings (N, dim)
+
+Next to every exported file a metadata file (<name>.onnx.json) keeps the class
+names and preprocessing parameters, so serving needs neither torch nor
+transformers. quantize_int8() produces a dynamically quantized copy (int8
+weights, activations quantized on the fly), which is smaller and usually
+faster on CPU; compare_predictions() measures how far it drifts from the
+reference model.
+
+Only export_to_onnx() needs torch, and it imports it lazily.
+"""
+
+import hashlib
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+from app.ai_moderation.base import ModerationPredictorBase
+from app.ai_moderation.preprocessor import CLIP_IMAGE_SIZE, CLIP_MEAN, CLIP_STD, ClipPreprocessor
+
+logger = logging.getLogger(__name__)
+
+ONNX_FILENAME = "moderation.onnx"
+ONNX_INT8_FILENAME = "moderation.int8.onnx"
+INPUT_NAME = "pixel_values"
+OUTPUT_NAMES = ["probs", "embeddings"]
+
+
+def default_onnx_path(model_dir: Union[str, Path], int8: bool = False) -> Path:
+    return Path(model_dir) / (ONNX_INT8_FILENAME if int8 else ONNX_FILENAME)
+
+
+def metadata_path(onnx_path: Union[str, Path]) -> Path:
+    onnx_path = Path(onnx_path)
+    return onnx_path.with_name(onnx_path.name + ".json")
+
+
+def write_metadata(onnx_path: Union[str, Path], metadata: Dict[str, Any]) -> Path:
+    path = metadata_path(onnx_path)
+    path.write_text(json.dumps(metadata, indent=2, ensure_ascii=False))
+    return path
+
+
+def read_metadata(onnx_path: Union[str, Path]) -> Dict[str, Any]:
+    path = metadata_path(onnx_path)
+    if not path.exists():
+        raise FileNotFoundError(f"ONNX metadata not found: {path}")
+    return json.loads(path.read_text())
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_to_onnx(model, onnx_path: Union[str, Path], opset: int = 17) -> Path:
+    """
+    Export a loaded CLIPModerationModel to ONNX (fp32, dynamic batch axis).
+
+    Args:
+        model: CLIPModerationModel with load_models() done
+        onnx_path: output file; metadata is written next to it
+        opset: ONNX opset version
+
+    Returns:
+        Path of the exported model
+    """
+    import torch
+
+    class VisionPipeline(torch.nn.Module):
+        def __init__(self, clip_model, head):
+            super().__init__()
+            self.vision_model = clip_model.vision_model
+            self.visual_projection = clip_model.visual_projection
+            self.head = head
+
+        def forward(self, pixel_values):
+            pooled_output = self.vision_model(pixel_values).pooler_output
+            image_features = self.visual_projection(pooled_output)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            return torch.softmax(self.head(image_features), dim=1), image_features
+
+    onnx_path = Path(onnx_path)
+    image_processor = model.processor
+    size = image_processor.crop_size["height"]
+
+    pipeline = VisionPipeline(model.clip_model, model.classification_head).float().cpu().eval()
+    dummy = torch.zeros(1, 3, size, size)
+    batch_axis = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            pipeline,
+            (dummy,),
+            str(onnx_path),
+            input_names=[INPUT_NAME],
+            output_names=OUTPUT_NAMES,
+            dynamic_axes={name: batch_axis for name in [INPUT_NAME, *OUTPUT_NAMES]},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    # Export does not change the weights: keep serving on the original device and dtype
+    model.clip_model.to(model.device, model.dtype)
+    model.classification_head.to(model.device)
+
+    write_metadata(onnx_path, {
+        "classes": model.get_classes(),
+        "image_size": size,
+        "mean": list(image_processor.image_mean),
+        "std": list(image_processor.image_std),
+        "model_name": model.model_name,
+        "source_version": model.version,
+        "quantization": None,
+    })
+    logger.info(f"Exported moderation model to {onnx_path}")
+    return onnx_path
+
+
+def quantize_int8(src: Union[str, Path], dst: Union[str, Path]) -> Path:
+    """
+    Dynamic int8 quantization of an exported model (weights int8, activations
+    quantized at run time). Metadata is copied with quantization="int8".
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    dst = Path(dst)
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+    metadata = read_metadata(src)
+    metadata["quantization"] = "int8"
+    write_metadata(dst, metadata)
+    logger.info(f"Quantized {src} -> {dst}")
+    return dst
+
+
+def compare_predictions(
+    reference: Sequence[Dict[str, Any]],
+    candidate: Sequence[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Accuracy parity of two predictors on the same images.
+
+    Returns:
+        dict with fields:
+        - images: int
+        - top1_agreement: share of images with the same predicted class
+        - max_abs_prob_diff / mean_abs_prob_diff: over all class probabilities
+        - min_embedding_cosine: worst cosine similarity of the embeddings
+    """
+    if len(reference) != len(candidate):
+        raise ValueError(f"{len(reference)} reference predictions vs {len(candidate)} candidate predictions")
+    if not reference:
+        raise ValueError("No predictions to compare")
+
+    classes = list(reference[0]["probabilities"])
+    ref_probs = np.array([[p["probabilities"][c] for c in classes] for p in reference])
+    cand_probs = np.array([[p["probabilities"][c] for c in classes] for p in candidate])
+    diff = np.abs(ref_probs - cand_probs)
+    agreement = np.mean([r["predicted_class"] == c["predicted_class"] for r, c in zip(reference, candidate)])
+
+    ref_emb = np.array([p["embedding"] for p in reference], dtype=np.float64)
+    cand_emb = np.array([p["embedding"] for p in candidate], dtype=np.float64)
+    cosine = np.sum(ref_emb * cand_emb, axis=1) / (
+        np.linalg.norm(ref_emb, axis=1) * np.linalg.norm(cand_emb, axis=1)
+    )
+
+    return {
+        "images": len(reference),
+        "top1_agreement": float(agreement),
+        "max_abs_prob_diff": float(diff.max()),
+        "mean_abs_prob_diff": float(diff.mean()),
+        "min_embedding_cosine": float(cosine.min()),
+    }
+
+
+class OnnxModerationPredictor(ModerationPredictorBase):
+    """
+    Predictor for image moderation on ONNX Runtime (CPU).
+    """
+
+    def __init__(self, onnx_path: Union[str, Path], threads: Optional[int] = None):
+        """
+        Args:
+            onnx_path: model exported by export_to_onnx() (or its int8 copy)
+            threads: intra-op threads (None: onnxruntime default)
+        """
+        import onnxruntime as ort
+
+        onnx_path = Path(onnx_path)
+        if not onnx_path.exists():
+            raise FileNotFoundError(f"ONNX model not found: {onnx_path}")
+
+        metadata = read_metadata(onnx_path)
+        self.classes = metadata["classes"]
+        self.image_size = metadata.get("image_size", CLIP_IMAGE_SIZE)
+        self.preprocess = ClipPreprocessor(
+            self.image_size,
+            metadata.get("mean", CLIP_MEAN),
+            metadata.get("std", CLIP_STD),
+        )
+        self.quantization = metadata.get("quantization")
+        self.model_version = file_sha256(onnx_path)
+        self.weights_mb = onnx_path.stat().st_size / 2**20
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Batches already run on one dedicated thread: no parallelism between graph nodes
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+
+        logger.info(
+            f"ONNX moderation model loaded from {onnx_path} "
+            f"(quantization: {self.quantization or 'none'}, version {self.model_version[:12]})"
+        )
+
+    def memory_report(self) -> Dict[str, Any]:
+        return {
+            **super().memory_report(),
+            "dtype": self.quantization or "float32",
+            "weights_mb": round(self.weights_mb, 1),
+        }
+
+    def warmup(self) -> None:
+        self.predict(Image.new("RGB", (self.image_size, self.image_size)))
+
+    def predict_batch(self, images: List[Image.Image]) -> List[Dict[str, Any]]:
+        """
+        Predict moderation status for several images in one session run.
+
+        Args:
+            images: list of PIL.Image in RGB format
+
+        Returns:
+            list of prediction dicts (same format as predict()), in input order;
+            processing_time_ms is the time of the whole batch
+        """
+        start_time = time.time()
+
+        pixel_values = self.preprocess(images)
+        probs, embeddings = self.session.run(OUTPUT_NAMES, {INPUT_NAME: pixel_values})
+
+        processing_time_ms = int((time.time() - start_time) * 1000)
+
+        return self.build_predictions(probs.tolist(), embeddings.tolist(), processing_time_ms)
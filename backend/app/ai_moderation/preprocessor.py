@@ -1,116 +1,265 @@
 """
 Image preprocessing utilities for CLIP moderation model
+
+Downloads are streamed and cut off at AI_MODERATION_MAX_DOWNLOAD_BYTES.
+Decoding checks the pixel count from the header before any pixel data is
+read, and JPEGs are decoded at a reduced scale (draft mode) that is still at
+least the model input size, so a 12 MP photo costs a fraction of a full
+decode. ClipPreprocessor then does one resize+crop per image and normalizes
+the whole batch with NumPy into a reused buffer. NumPy comes with
+requirements-ai.txt and is imported only when a preprocessor is created, so
+downloading and decoding work without it.
 """
 
+import asyncio
+import threading
 import aiohttp
-import requests
 from io import BytesIO
 from PIL import Image
-from typing import Union
+from typing import List, Optional, Sequence, TYPE_CHECKING
 import logging
 
+from app.core.config import settings
+from app.core.http_client import get_http_session
+
 logger = logging.getLogger(__name__)
 
+if TYPE_CHECKING:
+    import numpy as np
 
-async def download_image_async(url: str, timeout: int = 30) -> Image.Image:
+# CLIPImageProcessor defaults shared by the openai/clip-vit-* checkpoints
+CLIP_IMAGE_SIZE = 224
+CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _too_large(size: int, max_bytes: int) -> ValueError:
+    return ValueError(f"Image is too large: more than {max_bytes} bytes (got at least {size})")
+
+
+async def download_image_bytes_async(url: str, timeout: int = 30, max_bytes: Optional[int] = None) -> bytes:
     """
-    Download image from URL asynchronously.
-    
+    Download raw image bytes from URL asynchronously (shared HTTP session).
+
     Args:
         url: Image URL
         timeout: Request timeout in seconds
-    
+        max_bytes: Size cap (default: AI_MODERATION_MAX_DOWNLOAD_BYTES)
+
     Returns:
-        PIL.Image in RGB format
-    
+        Response body
+
     Raises:
-        ValueError: If image cannot be downloaded or decoded
+        ValueError: If image cannot be downloaded or is larger than max_bytes
     """
+    max_bytes = max_bytes or settings.AI_MODERATION_MAX_DOWNLOAD_BYTES
     # Replace localhost:9000 with minio:9000 for Docker internal access
     # This is needed because AI moderation runs inside Docker container
     internal_url = url.replace('http://localhost:9000', 'http://minio:9000')
     internal_url = internal_url.replace('http://127.0.0.1:9000', 'http://minio:9000')
-    
+
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(internal_url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
-                if response.status != 200:
-                    raise ValueError(f"Failed to download image: HTTP {response.status}")
-                
-                data = await response.read()
-                image = Image.open(BytesIO(data))
-                
-                # Convert to RGB (handles RGBA, P, etc.)
-                if image.mode != "RGB":
-                    image = image.convert("RGB")
-                
-                return image
-    
+        session = get_http_session()
+        async with session.get(internal_url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != 200:
+                raise ValueError(f"Failed to download image: HTTP {response.status}")
+            if response.content_length is not None and response.content_length > max_bytes:
+                raise _too_large(response.content_length, max_bytes)
+
+            # Content-Length may be missing or wrong: count what actually arrives
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                data += chunk
+                if len(data) > max_bytes:
+                    raise _too_large(len(data), max_bytes)
+            return bytes(data)
+
     except aiohttp.ClientError as e:
         logger.error(f"Error downloading image from {internal_url} (original: {url}): {e}")
         raise ValueError(f"Failed to download image: {str(e)}")
-    except Exception as e:
-        logger.error(f"Error processing image from {url}: {e}")
-        raise ValueError(f"Failed to process image: {str(e)}")
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout downloading image from {internal_url} (original: {url})")
+        raise ValueError("Failed to download image: timeout")
 
 
-def download_image_sync(url: str, timeout: int = 30) -> Image.Image:
+async def download_image_async(url: str, timeout: int = 30) -> Image.Image:
+    """
+    Download image from URL asynchronously.
+
+    Args:
+        url: Image URL
+        timeout: Request timeout in seconds
+
+    Returns:
+        PIL.Image in RGB format
+
+    Raises:
+        ValueError: If image cannot be downloaded or decoded
+    """
+    data = await download_image_bytes_async(url, timeout)
+    return await asyncio.to_thread(load_image_from_bytes, data)
+
+
+def download_image_sync(url: str, timeout: int = 30, max_bytes: Optional[int] = None) -> Image.Image:
     """
     Download image from URL synchronously.
-    
+
     Args:
         url: Image URL
         timeout: Request timeout in seconds
-    
+        max_bytes: Size cap (default: AI_MODERATION_MAX_DOWNLOAD_BYTES)
+
     Returns:
         PIL.Image in RGB format
-    
+
     Raises:
         ValueError: If image cannot be downloaded or decoded
     """
+    # requests comes with requirements-ai.txt; the server itself downloads through aiohttp
+    import requests
+
+    max_bytes = max_bytes or settings.AI_MODERATION_MAX_DOWNLOAD_BYTES
     try:
-        response = requests.get(url, timeout=timeout, stream=True)
-        response.raise_for_status()
-        
-        image = Image.open(BytesIO(response.content))
-        
-        # Convert to RGB (handles RGBA, P, etc.)
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        
-        return image
-    
+        with requests.get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            data = bytearray()
+            for chunk in response.iter_content(_CHUNK_SIZE):
+                data += chunk
+                if len(data) > max_bytes:
+                    raise _too_large(len(data), max_bytes)
+
     except requests.RequestException as e:
         logger.error(f"Error downloading image from {url}: {e}")
         raise ValueError(f"Failed to download image: {str(e)}")
-    except Exception as e:
-        logger.error(f"Error processing image from {url}: {e}")
-        raise ValueError(f"Failed to process image: {str(e)}")
+
+    return load_image_from_bytes(bytes(data))
 
 
-def load_image_from_bytes(image_bytes: bytes) -> Image.Image:
+def load_image_from_bytes(
+    image_bytes: bytes,
+    min_size: int = CLIP_IMAGE_SIZE,
+    max_pixels: Optional[int] = None
+) -> Image.Image:
     """
-    Load image from bytes.
-    
+    Decode image bytes for moderation.
+
+    The pixel count is checked from the header before decoding. JPEGs are
+    decoded in draft mode at the smallest DCT scale that keeps both sides at
+    least min_size, so the result may be smaller than the original.
+
     Args:
         image_bytes: Image data as bytes
-    
+        min_size: Smallest side needed by the model
+        max_pixels: Pixel limit (default: AI_MODERATION_MAX_IMAGE_PIXELS)
+
     Returns:
         PIL.Image in RGB format
-    
+
     Raises:
-        ValueError: If image cannot be decoded
+        ValueError: If image cannot be decoded or has too many pixels
     """
+    max_pixels = max_pixels or settings.AI_MODERATION_MAX_IMAGE_PIXELS
     try:
         image = Image.open(BytesIO(image_bytes))
-        
+
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ValueError(f"Image has too many pixels: {width}x{height}, limit {max_pixels}")
+
+        # No-op for formats other than JPEG
+        image.draft("RGB", (min_size, min_size))
+
         # Convert to RGB
         if image.mode != "RGB":
             image = image.convert("RGB")
-        
+        else:
+            image.load()
+
         return image
-    
+
+    except (ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Rejected image: {e}")
+        raise ValueError(f"Failed to load image: {str(e)}")
     except Exception as e:
         logger.error(f"Error loading image from bytes: {e}")
         raise ValueError(f"Failed to load image: {str(e)}")
 
+
+class ClipPreprocessor:
+    """
+    CLIP preprocessing without transformers: resize the shortest side to size
+    (bicubic) and center crop in one resample, then scale to [0, 1] and
+    normalize per channel for the whole batch at once.
+
+    The output is a view of a buffer reused by the next call from the same
+    thread: consume it (run the model) before preprocessing another batch.
+    """
+
+    def __init__(
+        self,
+        size: int = CLIP_IMAGE_SIZE,
+        mean: Sequence[float] = CLIP_MEAN,
+        std: Sequence[float] = CLIP_STD
+    ):
+        import numpy as np
+
+        self.size = size
+        std = np.asarray(std, dtype=np.float32)
+        # (x / 255 - mean) / std == x * scale + offset
+        self._scale = (1 / (255 * std))[:, None, None]
+        self._offset = (-np.asarray(mean, dtype=np.float32) / std)[:, None, None]
+        self._local = threading.local()
+
+    def _buffers(self, count: int):
+        import numpy as np
+
+        local = self._local
+        if getattr(local, "capacity", 0) < count:
+            local.capacity = count
+            local.pixels = np.empty((count, self.size, self.size, 3), dtype=np.uint8)
+            local.batch = np.empty((count, 3, self.size, self.size), dtype=np.float32)
+        return local.pixels[:count], local.batch[:count]
+
+    def __call__(self, images: List[Image.Image]) -> "np.ndarray":
+        """
+        Args:
+            images: list of PIL.Image
+
+        Returns:
+            float32 array of shape (len(images), 3, size, size)
+        """
+        import numpy as np
+
+        size = self.size
+        pixels, batch = self._buffers(len(images))
+        for i, image in enumerate(images):
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            width, height = image.size
+            side = min(width, height)
+            left = (width - side) / 2
+            top = (height - side) / 2
+            pixels[i] = np.asarray(image.resize(
+                (size, size),
+                Image.BICUBIC,
+                box=(left, top, left + side, top + side),
+                reducing_gap=3.0
+            ))
+
+        np.multiply(pixels.transpose(0, 3, 1, 2), self._scale, out=batch)
+        batch += self._offset
+        return batch
+
+
+def clip_pixel_values(
+    images: List[Image.Image],
+    size: int = CLIP_IMAGE_SIZE,
+    mean: Sequence[float] = CLIP_MEAN,
+    std: Sequence[float] = CLIP_STD
+) -> "np.ndarray":
+    """
+    One-off CLIP preprocessing into a new array of shape (len(images), 3, size, size).
+    """
+    return ClipPreprocessor(size, mean, std)(images).copy()
@@ -6,12 +6,17 @@ from app.core.database import get_db
 from app.models.user import User as UserModel, UserRole
 from app.schemas.user import User as UserSchema, UserUpdate
 from app.api.v1.endpoints.auth import get_current_user
+from app.core.auth_cache import invalidate_principal
 
 
 class RoleUpdate(BaseModel):
     role: UserRole
 
 
+class StatusUpdate(BaseModel):
+    is_active: bool
+
+
 router = APIRouter()
 
 
@@ -66,7 +71,35 @@ def update_user_role(
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
     user.role = role_update.role
+    # Старые токены пользователя перестают действовать во всех процессах
+    user.auth_version += 1
+    db.commit()
+    invalidate_principal(user.id)
+    db.refresh(user)
+    return user
+
+
+@router.put("/users/{user_id}/status", response_model=UserSchema)
+def update_user_status(
+    user_id: int,
+    status_update: StatusUpdate = Body(...),
+    current_user: UserModel = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    if user_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Нельзя деактивировать свой собственный аккаунт"
+        )
+    
+    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    
+    user.is_active = status_update.is_active
+    user.auth_version += 1
     db.commit()
+    invalidate_principal(user.id)
     db.refresh(user)
     return user
 
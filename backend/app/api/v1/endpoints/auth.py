@@ -2,55 +2,135 @@ from datetime import timedelta
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.core.auth_cache import (
+    cache_payload,
+    cache_principal,
+    get_cached_payload,
+    get_principal,
+    invalidate_principal,
+    is_session_revoked,
+)
 from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import (
+    PasswordHasherBusy,
+    create_access_token,
+    decode_access_token,
+    get_password_hash,
+    password_needs_rehash,
+    verify_password,
+)
 from app.core.config import settings
 from app.models.user import User as UserModel
-from app.schemas.user import UserCreate, User as UserSchema, Token
+from app.schemas.user import UserCreate, User as UserSchema, Token, RefreshRequest
+from app.services.session_service import (
+    RefreshTokenSuperseded,
+    create_session,
+    revoke_session_by_token,
+    revoke_sessions,
+    rotate_session,
+)
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
 
+def _decode_token(token: str) -> Optional[dict]:
+    """Проверяет JWT; уже проверенные токены берутся из кэша до истечения exp"""
+    payload = get_cached_payload(token)
+    if payload is None:
+        payload = decode_access_token(token)
+        if payload is not None:
+            cache_payload(token, payload)
+    return payload
+
+
+def _user_snapshot(user: UserModel) -> dict:
+    return {column.key: getattr(user, column.key) for column in UserModel.__table__.columns}
+
+
+def _attach_user(db: Session, snapshot: dict) -> UserModel:
+    """Возвращает пользователя из снимка как загруженный объект сессии без запроса к БД"""
+    user = db.identity_map.get(db.identity_key(UserModel, snapshot["id"]))
+    if user is None:
+        user = UserModel(**snapshot)
+        make_transient_to_detached(user)
+        user = db.merge(user, load=False)
+    return user
+
+
+def create_user_token(user: UserModel, session_id: Optional[int] = None) -> str:
+    """Выдает access-токен с id пользователя, версией авторизации и id сессии входа"""
+    data = {"sub": user.username, "uid": user.id, "ver": user.auth_version}
+    if session_id is not None:
+        data["sid"] = session_id
+    return create_access_token(
+        data=data,
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+
+def _resolve_user(token: str, db: Session) -> Optional[UserModel]:
+    payload = _decode_token(token)
+    if payload is None:
+        return None
+    session_id = payload.get("sid")
+    if session_id is not None and is_session_revoked(session_id):
+        return None
+
+    user_id = payload.get("uid")
+    if user_id is None:
+        # Токены, выданные до появления uid
+        username = payload.get("sub")
+        if username is None:
+            return None
+        return db.query(UserModel).filter(UserModel.username == username).first()
+
+    version = payload.get("ver", 1)
+    snapshot = get_principal(user_id)
+    if snapshot is not None:
+        if snapshot["auth_version"] == version:
+            return _attach_user(db, snapshot)
+        if snapshot["auth_version"] > version:
+            return None
+
+    # Снимка нет или токен выдан после повышения версии в другом процессе
+    user = db.get(UserModel, user_id)
+    if user is None or user.auth_version != version:
+        return None
+    cache_principal(user_id, _user_snapshot(user))
+    return user
+
+
 def get_current_user_optional(token: Optional[str] = Depends(oauth2_scheme_optional), db: Session = Depends(get_db)) -> Optional[UserModel]:
     """Получить текущего пользователя, если он авторизован. Возвращает None, если не авторизован."""
     if token is None:
         return None
-    from app.core.security import decode_access_token
-    payload = decode_access_token(token)
-    if payload is None:
-        return None
-    username: str = payload.get("sub")
-    if username is None:
+    user = _resolve_user(token, db)
+    if user is None or not user.is_active:
         return None
-    user = db.query(UserModel).filter(UserModel.username == username).first()
     return user
 
 
+def get_current_session_id(token: str = Depends(oauth2_scheme)) -> Optional[int]:
+    """id сессии входа из access-токена (токен уже проверен в get_current_user)"""
+    payload = _decode_token(token) or {}
+    return payload.get("sid")
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserModel:
-    from app.core.security import decode_access_token
-    payload = decode_access_token(token)
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    username: str = payload.get("sub")
-    if username is None:
+    user = _resolve_user(token, db)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(UserModel).filter(UserModel.username == username).first()
-    if user is None:
+    if not user.is_active:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Аккаунт пользователя деактивирован"
         )
     return user
 
@@ -148,8 +228,8 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(db_user)
         return db_user
-    except HTTPException:
-        # Пробрасываем HTTPException без изменений
+    except (HTTPException, PasswordHasherBusy):
+        # Пробрасываем HTTPException и перегрузку хеширования (429) без изменений
         db.rollback()
         raise
     except Exception as e:
@@ -194,11 +274,59 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             detail="Аккаунт пользователя деактивирован"
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Пароль известен только при входе: пересчитываем хеш, если сменилась стоимость bcrypt
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = get_password_hash(form_data.password)
+        invalidate_principal(user.id)
+    
+    session, refresh_token = create_session(db, user.id)
+    db.commit()
+    access_token = create_user_token(user, session.id)
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Выдает новую пару токенов по refresh-токену (без проверки пароля)"""
+    try:
+        rotated = rotate_session(db, request.refresh_token)
+    except RefreshTokenSuperseded:
+        # Другая вкладка только что обновила токен: клиент берет новый из хранилища
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Токен уже обновлен, используйте новый",
+        )
+    if rotated is None:
+        # Коммит фиксирует отзыв сессии, если токен был использован повторно
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Сессия истекла, войдите снова",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    session, refresh_token = rotated
+    
+    user = db.get(UserModel, session.user_id)
+    if user is None or not user.is_active:
+        revoke_sessions(db, [session.id])
+        db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Сессия истекла, войдите снова",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    db.commit()
+    access_token = create_user_token(user, session.id)
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Завершает сессию: refresh-токен и выданные по ней access-токены перестают действовать"""
+    revoke_session_by_token(db, request.refresh_token)
+    db.commit()
 
 
 @router.get("/me", response_model=UserSchema)
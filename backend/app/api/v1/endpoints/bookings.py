@@ -162,26 +162,20 @@ def create_booking(
         status=BookingStatus.PENDING,
     )
     db.add(db_booking)
+    db.flush()
+    
+    # Уведомление владельцу записывается в outbox в той же транзакции
+    create_new_booking_notification(
+        db=db,
+        owner_id=item.owner_id,
+        booking_id=db_booking.id,
+        item_id=item.id,
+        item_title=item.title,
+        renter_username=current_user.username
+    )
     db.commit()
     db.refresh(db_booking)
     
-    # Создаем уведомление владельцу о новом бронировании
-    try:
-        create_new_booking_notification(
-            db=db,
-            owner_id=item.owner_id,
-            booking_id=db_booking.id,
-            item_id=item.id,
-            item_title=item.title,
-            renter_username=current_user.username
-        )
-        db.commit()
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Ошибка при создании уведомления о новом бронировании: {str(e)}")
-        db.rollback()
-    
     return db_booking
 
 
@@ -273,60 +267,51 @@ def update_booking(
         
         booking.status = new_status
     
-    db.commit()
-    
-    # Создаем уведомления при изменении статуса бронирования
+    # Уведомления об изменении статуса записываются в outbox в той же транзакции
     if booking_update.status and old_status != booking.status:
-        try:
-            renter = booking.renter
-            
-            if booking.status == BookingStatus.CONFIRMED:
-                # Владелец подтвердил бронирование
-                create_booking_confirmed_notification(
+        renter = booking.renter
+        
+        if booking.status == BookingStatus.CONFIRMED:
+            # Владелец подтвердил бронирование
+            create_booking_confirmed_notification(
+                db=db,
+                renter_id=booking.renter_id,
+                booking_id=booking.id,
+                item_id=item.id,
+                item_title=item.title
+            )
+        elif booking.status == BookingStatus.CANCELLED:
+            if is_renter and not is_owner:
+                # Арендатор отменил бронирование
+                create_booking_cancelled_by_renter_notification(
                     db=db,
-                    renter_id=booking.renter_id,
+                    owner_id=item.owner_id,
                     booking_id=booking.id,
                     item_id=item.id,
-                    item_title=item.title
+                    item_title=item.title,
+                    renter_username=renter.username
                 )
-            elif booking.status == BookingStatus.CANCELLED:
-                if is_renter and not is_owner:
-                    # Арендатор отменил бронирование
-                    create_booking_cancelled_by_renter_notification(
+            elif is_owner:
+                # Владелец отменил бронирование
+                if old_status == BookingStatus.PENDING:
+                    # Если владелец отменяет pending бронирование, это считается отклонением
+                    create_booking_rejected_notification(
+                        db=db,
+                        renter_id=booking.renter_id,
+                        booking_id=booking.id,
+                        item_id=item.id,
+                        item_title=item.title
+                    )
+                elif old_status == BookingStatus.CONFIRMED:
+                    # Если владелец отменяет подтвержденное бронирование
+                    create_booking_cancelled_by_owner_notification(
                         db=db,
-                        owner_id=item.owner_id,
+                        renter_id=booking.renter_id,
                         booking_id=booking.id,
                         item_id=item.id,
-                        item_title=item.title,
-                        renter_username=renter.username
+                        item_title=item.title
                     )
-                elif is_owner:
-                    # Владелец отменил бронирование
-                    if old_status == BookingStatus.PENDING:
-                        # Если владелец отменяет pending бронирование, это считается отклонением
-                        create_booking_rejected_notification(
-                            db=db,
-                            renter_id=booking.renter_id,
-                            booking_id=booking.id,
-                            item_id=item.id,
-                            item_title=item.title
-                        )
-                    elif old_status == BookingStatus.CONFIRMED:
-                        # Если владелец отменяет подтвержденное бронирование
-                        create_booking_cancelled_by_owner_notification(
-                            db=db,
-                            renter_id=booking.renter_id,
-                            booking_id=booking.id,
-                            item_id=item.id,
-                            item_title=item.title
-                        )
-            
-            db.commit()
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Ошибка при создании уведомления об изменении статуса бронирования: {str(e)}")
-            db.rollback()
     
+    db.commit()
     db.refresh(booking)
     return booking
@@ -8,8 +8,11 @@ from app.models.availability import Availability
 from app.models.notification import Notification as NotificationModel
 from app.models.booking import Booking as BookingModel
 from app.models.report import Report as ReportModel
+from app.models.item_embedding import ItemEmbedding
 from app.schemas.item import ItemCreate, ItemUpdate, Item as ItemSchema
 from app.api.v1.endpoints.auth import get_current_user, get_current_user_optional
+from app.services.moderation_jobs import enqueue_moderation_job
+from app.services.text_moderation import apply_text_moderation
 from app.core.config import settings
 from datetime import datetime
 import logging
@@ -98,7 +101,7 @@ def read_item(
 
 
 @router.post("/", response_model=ItemSchema, status_code=status.HTTP_201_CREATED)
-async def create_item(
+def create_item(
     item: ItemCreate,
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -112,34 +115,6 @@ async def create_item(
     elif not isinstance(item_type_value, ItemType):
         item_type_value = ItemType(str(item_type_value).lower())
     
-    moderation_status = ModerationStatus.PENDING
-    if settings.AI_MODERATION_ENABLED and item.image_url:
-        try:
-            from app.core.ai_service import moderate_image_auto
-            
-            moderation_result = await moderate_image_auto(
-                image_url=item.image_url,
-                category=item.category.value if item.category else None,
-                min_confidence_for_rejection=settings.AI_MODERATION_AUTO_REJECT_CONFIDENCE
-            )
-            
-            if (
-                moderation_result["status"] == "approved" and
-                moderation_result["auto_action"] and
-                moderation_result["confidence"] >= settings.AI_MODERATION_AUTO_APPROVE_CONFIDENCE
-            ):
-                moderation_status = ModerationStatus.APPROVED
-            
-            elif (
-                moderation_result["status"] == "rejected" and
-                moderation_result["auto_action"] and
-                moderation_result["confidence"] >= settings.AI_MODERATION_AUTO_REJECT_CONFIDENCE
-            ):
-                moderation_status = ModerationStatus.REJECTED
-        
-        except Exception as mod_error:
-            logger.warning(f"AI moderation check failed during item creation: {mod_error}", exc_info=True)
-    
     if item_type_value == ItemType.RENT:
         if not item.price_per_hour and not item.price_per_day:
             raise HTTPException(
@@ -164,11 +139,22 @@ async def create_item(
         category=item.category,
         owner_id=current_user.id,
         dormitory=current_user.dormitory,
-        moderation_status=moderation_status,
+        moderation_status=ModerationStatus.PENDING,
     )
     db.add(db_item)
     db.flush()
     
+    # Текст проверяется сразу; отклоненному по тексту объявлению AI-проверка не нужна
+    apply_text_moderation(db, db_item)
+    
+    # Проверка изображения не задерживает ответ: задача коммитится вместе с объявлением
+    if (
+        settings.AI_MODERATION_ENABLED and
+        db_item.image_url and
+        db_item.moderation_status == ModerationStatus.PENDING
+    ):
+        enqueue_moderation_job(db, db_item)
+    
     if item.availabilities:
         for avail in item.availabilities:
             day_of_week = avail.start_date.weekday() if avail.start_date else None
@@ -204,8 +190,10 @@ def update_item(
     update_data = item_update.model_dump(exclude_unset=True)
     availabilities = update_data.pop("availabilities", None)
     
+    resubmitted = False
     if 'is_active' in update_data and update_data['is_active'] is True:
         if db_item.moderation_status == ModerationStatus.REJECTED:
+            resubmitted = True
             db_item.moderation_status = ModerationStatus.PENDING
             db_item.moderation_comment = None
             db_item.moderated_by_id = None
@@ -222,6 +210,18 @@ def update_item(
     for field, value in update_data.items():
         setattr(db_item, field, value)
     
+    if resubmitted or 'title' in update_data or 'description' in update_data:
+        apply_text_moderation(db, db_item)
+    
+    # Повторно поданное после отклонения объявление снова проверяется моделью
+    if (
+        resubmitted and
+        settings.AI_MODERATION_ENABLED and
+        db_item.image_url and
+        db_item.moderation_status == ModerationStatus.PENDING
+    ):
+        enqueue_moderation_job(db, db_item)
+    
     if availabilities is not None:
         db.query(Availability).filter(Availability.item_id == item_id).delete()
         for avail in availabilities:
@@ -265,6 +265,13 @@ def delete_item(
     
     db.query(ReportModel).filter(ReportModel.item_id == item_id).delete(synchronize_session=False)
     
+    db.query(ItemEmbedding).filter(ItemEmbedding.item_id == item_id).delete(synchronize_session=False)
+    
+    db.query(ItemModel).filter(ItemModel.duplicate_of_id == item_id).update(
+        {ItemModel.duplicate_of_id: None},
+        synchronize_session=False
+    )
+    
     db.delete(db_item)
     db.commit()
     return None
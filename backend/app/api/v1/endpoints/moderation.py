@@ -56,25 +56,16 @@ def approve_item(
     item.moderated_by_id = current_user.id
     item.moderated_at = datetime.utcnow()
     item.moderation_comment = None
-    
+
+    # Уведомление владельцу записывается в outbox в той же транзакции
+    create_item_approved_notification(
+        db=db,
+        owner_id=item.owner_id,
+        item_id=item.id,
+        item_title=item.title
+    )
     db.commit()
-    
-    # Создаем уведомление владельцу объявления (после коммита, чтобы не блокировать одобрение)
-    try:
-        create_item_approved_notification(
-            db=db,
-            owner_id=item.owner_id,
-            item_id=item.id,
-            item_title=item.title
-        )
-        db.commit()
-    except Exception as e:
-        # Логируем ошибку, но не прерываем выполнение (уведомления - это дополнительная функция)
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Ошибка при создании уведомления: {str(e)}")
-        db.rollback()
-    
+
     db.refresh(item)
     return item
 
@@ -97,26 +88,17 @@ def reject_item(
     item.moderated_at = datetime.utcnow()
     item.moderation_comment = comment
     item.is_active = False
-    
+
+    # Уведомление владельцу записывается в outbox в той же транзакции
+    create_item_rejected_notification(
+        db=db,
+        owner_id=item.owner_id,
+        item_id=item.id,
+        item_title=item.title,
+        comment=comment
+    )
     db.commit()
-    
-    # Создаем уведомление владельцу объявления (после коммита, чтобы не блокировать отклонение)
-    try:
-        create_item_rejected_notification(
-            db=db,
-            owner_id=item.owner_id,
-            item_id=item.id,
-            item_title=item.title,
-            comment=comment
-        )
-        db.commit()
-    except Exception as e:
-        # Логируем ошибку, но не прерываем выполнение (уведомления - это дополнительная функция)
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Ошибка при создании уведомления: {str(e)}")
-        db.rollback()
-    
+
     db.refresh(item)
     return item
 
@@ -2,10 +2,25 @@
 API endpoints for AI-powered image moderation
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, HttpUrl
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime
 from typing import Optional, List, Dict, Any
+import asyncio
+import json
 import logging
+import time
+
+from app.ai_moderation.batcher import InferenceQueueFull
+from app.api.v1.endpoints.moderation import require_moderator
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.moderation_job import ModerationJob, ModerationJobStatus
+from app.models.user import User as UserModel
+from app.services.moderation_jobs import requeue_dead_job
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +42,31 @@ class ModerationResponse(BaseModel):
     auto_action: bool = False
 
 
+class ModerationJobInfo(BaseModel):
+    id: int
+    item_id: int
+    image_url: str
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ModerationJobsResponse(BaseModel):
+    pending: int
+    dead: int
+    dead_jobs: List[ModerationJobInfo]
+
+
+class BatchImage(BaseModel):
+    url: HttpUrl
+    category: Optional[str] = None
+
+
 class BatchModerationRequest(BaseModel):
-    images: List[Dict[str, Any]]  # [{"url": "...", "category": "..."}]
+    images: List[BatchImage] = Field(..., min_length=1, max_length=settings.AI_MODERATION_BATCH_MAX_IMAGES)
 
 
 class BatchModerationResponse(BaseModel):
@@ -49,7 +87,7 @@ async def moderate_image(request: ModerationRequest):
     """
     # Lazy import to avoid requiring torch when AI moderation is disabled
     try:
-        from app.core.ai_service import get_predictor
+        from app.core.ai_service import get_predictor, predict_image_url
     except ImportError as e:
         raise HTTPException(
             status_code=503,
@@ -65,7 +103,7 @@ async def moderate_image(request: ModerationRequest):
     
     try:
         # Get prediction
-        prediction = await predictor.predict_from_url(str(request.image_url))
+        prediction = await predict_image_url(str(request.image_url))
         
         # Format for API
         result = predictor.format_prediction_for_api(prediction)
@@ -77,6 +115,12 @@ async def moderate_image(request: ModerationRequest):
         
         return ModerationResponse(**result)
     
+    except InferenceQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="AI moderation is overloaded, try again later",
+            headers={"Retry-After": "1"},
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -84,18 +128,59 @@ async def moderate_image(request: ModerationRequest):
         raise HTTPException(status_code=500, detail=f"Error moderating image: {str(e)}")
 
 
+def _error_result(reason: str, error: Optional[str] = None) -> Dict[str, Any]:
+    result = {
+        "status": "pending",
+        "reason": reason,
+        "confidence": 0.0,
+        "probabilities": {},
+        "processing_time_ms": 0,
+        "model": "error",
+        "auto_action": False,
+    }
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+async def _moderate_batch_image(predictor, image: BatchImage, download_limit: asyncio.Semaphore) -> Dict[str, Any]:
+    """One image of a batch: never raises, errors become a pending result"""
+    from app.core.ai_service import predict_image_url
+    
+    try:
+        prediction = await predict_image_url(str(image.url), download_limit)
+    except InferenceQueueFull:
+        return _error_result("queue_full")
+    except Exception as e:
+        logger.error(f"Error moderating image {image.url}: {e}")
+        return _error_result("error", str(e))
+    
+    result = predictor.format_prediction_for_api(prediction)
+    result["auto_action"] = False
+    if image.category:
+        result["category"] = image.category
+    return result
+
+
 @router.post("/batch", response_model=BatchModerationResponse)
-async def moderate_images_batch(request: BatchModerationRequest):
+async def moderate_images_batch(
+    request: BatchModerationRequest,
+    stream: bool = Query(False, description="Return NDJSON lines as soon as each image is ready"),
+):
     """
     Moderate multiple images in batch.
     
+    Images are downloaded concurrently (at most AI_MODERATION_DOWNLOAD_CONCURRENCY
+    at a time) and classified through the inference batcher.
+    
     Args:
         request: BatchModerationRequest with list of image URLs
+        stream: if true, respond with application/x-ndjson: one line per image
+            (with its "index" in the request) in completion order
     
     Returns:
-        BatchModerationResponse with results for all images
+        BatchModerationResponse with results for all images (in request order)
     """
-    import time
     start_time = time.time()
     
     # Lazy import to avoid requiring torch when AI moderation is disabled
@@ -114,51 +199,99 @@ async def moderate_images_batch(request: BatchModerationRequest):
             detail="AI moderation model is not available"
         )
     
-    results = []
+    download_limit = asyncio.Semaphore(settings.AI_MODERATION_DOWNLOAD_CONCURRENCY)
     
-    for image_data in request.images:
-        image_url = image_data.get("url")
-        category = image_data.get("category")
-        
-        if not image_url:
-            results.append({
-                "status": "pending",
-                "reason": "invalid_url",
-                "confidence": 0.0,
-                "probabilities": {},
-                "processing_time_ms": 0,
-                "model": "error",
-                "auto_action": False,
-            })
-            continue
-        
+    if not stream:
+        results = await asyncio.gather(*(
+            _moderate_batch_image(predictor, image, download_limit) for image in request.images
+        ))
+        return BatchModerationResponse(
+            results=[ModerationResponse(**r) for r in results],
+            total_time_ms=int((time.time() - start_time) * 1000)
+        )
+    
+    async def indexed(index: int, image: BatchImage):
+        return index, await _moderate_batch_image(predictor, image, download_limit)
+    
+    async def lines():
+        tasks = [asyncio.ensure_future(indexed(i, image)) for i, image in enumerate(request.images)]
         try:
-            prediction = await predictor.predict_from_url(str(image_url))
-            result = predictor.format_prediction_for_api(prediction)
-            result["auto_action"] = False
-            
-            if category:
-                result["category"] = category
-            
-            results.append(result)
-        
-        except Exception as e:
-            logger.error(f"Error moderating image {image_url}: {e}")
-            results.append({
-                "status": "pending",
-                "reason": "error",
-                "confidence": 0.0,
-                "probabilities": {},
-                "processing_time_ms": 0,
-                "model": "error",
-                "auto_action": False,
-                "error": str(e),
-            })
-    
-    total_time_ms = int((time.time() - start_time) * 1000)
-    
-    return BatchModerationResponse(
-        results=[ModerationResponse(**r) for r in results],
-        total_time_ms=total_time_ms
+            for next_done in asyncio.as_completed(tasks):
+                index, result = await next_done
+                line = {"index": index, **ModerationResponse(**result).model_dump()}
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        finally:
+            # Client went away: do not keep downloading for nobody
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/metrics")
+async def get_inference_metrics(current_user: UserModel = Depends(require_moderator)):
+    """
+    Inference metrics of the batcher (batch sizes, p50/p99 latency, queue depth),
+    result cache hit counts and memory of the worker.
+    """
+    from app.core.ai_service import get_batcher, get_cache, get_memory_report
+    
+    batcher = get_batcher()
+    if batcher is None:
+        raise HTTPException(
+            status_code=503,
+            detail="AI moderation model is not available"
+        )
+    metrics = batcher.stats()
+    cache = get_cache()
+    if cache is not None:
+        metrics["cache"] = cache.stats()
+    metrics["memory"] = get_memory_report()
+    return metrics
+
+
+@router.get("/jobs", response_model=ModerationJobsResponse)
+def get_moderation_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: UserModel = Depends(require_moderator),
+    db: Session = Depends(get_db)
+):
+    """
+    Background moderation queue: job counts and the dead-letter jobs
+    (attempts exhausted, their items wait for manual moderation).
+    """
+    counts = dict(
+        db.query(ModerationJob.status, func.count(ModerationJob.id))
+        .group_by(ModerationJob.status)
+        .all()
     )
+    dead_jobs = (
+        db.query(ModerationJob)
+        .filter(ModerationJob.status == ModerationJobStatus.DEAD)
+        .order_by(ModerationJob.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return {
+        "pending": counts.get(ModerationJobStatus.PENDING, 0),
+        "dead": counts.get(ModerationJobStatus.DEAD, 0),
+        "dead_jobs": dead_jobs,
+    }
+
 
+@router.post("/jobs/{job_id}/retry", response_model=ModerationJobInfo)
+def retry_moderation_job(
+    job_id: int,
+    current_user: UserModel = Depends(require_moderator),
+    db: Session = Depends(get_db)
+):
+    """Return a dead-letter job to the queue"""
+    job = db.get(ModerationJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Moderation job not found")
+    if job.status != ModerationJobStatus.DEAD:
+        raise HTTPException(status_code=409, detail="Moderation job is not in the dead-letter queue")
+    requeue_dead_job(db, job)
+    db.commit()
+    db.refresh(job)
+    return job
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
@@ -6,6 +6,7 @@ from app.models.user import User as UserModel
 from app.models.notification import Notification as NotificationModel
 from app.schemas.notification import Notification as NotificationSchema, NotificationUpdate
 from app.api.v1.endpoints.auth import get_current_user
+from app.services.notification_templates import render_notifications, resolve_locale
 from datetime import datetime
 
 router = APIRouter()
@@ -16,6 +17,7 @@ def get_notifications(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     unread_only: bool = Query(False),
+    accept_language: Optional[str] = Header(None),
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -26,7 +28,7 @@ def get_notifications(
         query = query.filter(NotificationModel.is_read == False)
     
     notifications = query.order_by(NotificationModel.created_at.desc()).offset(skip).limit(limit).all()
-    return notifications
+    return render_notifications(db, notifications, resolve_locale(accept_language))
 
 
 @router.get("/unread/count")
@@ -66,6 +68,7 @@ def mark_all_as_read(
 @router.get("/{notification_id}", response_model=NotificationSchema)
 def get_notification(
     notification_id: int,
+    accept_language: Optional[str] = Header(None),
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -78,13 +81,14 @@ def get_notification(
     if not notification:
         raise HTTPException(status_code=404, detail="Уведомление не найдено")
     
-    return notification
+    return render_notifications(db, [notification], resolve_locale(accept_language))[0]
 
 
 @router.patch("/{notification_id}", response_model=NotificationSchema)
 def update_notification(
     notification_id: int,
     notification_update: NotificationUpdate,
+    accept_language: Optional[str] = Header(None),
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -106,7 +110,7 @@ def update_notification(
     
     db.commit()
     db.refresh(notification)
-    return notification
+    return render_notifications(db, [notification], resolve_locale(accept_language))[0]
 
 
 @router.delete("/{notification_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -7,7 +8,9 @@ from app.models.item import Item as ItemModel
 from app.models.booking import Booking as BookingModel
 from app.models.favorite import Favorite as FavoriteModel
 from app.schemas.user import UserUpdate, User as UserSchema
-from app.api.v1.endpoints.auth import get_current_user
+from app.api.v1.endpoints.auth import get_current_session_id, get_current_user
+from app.core.auth_cache import invalidate_principal
+from app.services.session_service import revoke_user_sessions
 from app.models.booking import BookingStatus
 from app.models.item import ItemType
 
@@ -23,6 +26,7 @@ def read_user_me(current_user: UserModel = Depends(get_current_user)):
 def update_user_me(
     user_update: UserUpdate,
     current_user: UserModel = Depends(get_current_user),
+    session_id: Optional[int] = Depends(get_current_session_id),
     db: Session = Depends(get_db)
 ):
     from app.core.security import get_password_hash
@@ -30,11 +34,14 @@ def update_user_me(
     update_data = user_update.model_dump(exclude_unset=True)
     if "password" in update_data:
         update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
+        # Смена пароля завершает все остальные сессии пользователя
+        revoke_user_sessions(db, current_user.id, except_session_id=session_id)
     
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
     db.commit()
+    invalidate_principal(current_user.id)
     db.refresh(current_user)
     return current_user
 
@@ -2,9 +2,14 @@
 AI Service for integrating image moderation into existing codebase
 """
 
-from typing import Optional, Dict, Any, TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, Awaitable, Callable, TYPE_CHECKING
+import asyncio
 import logging
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
@@ -12,11 +17,37 @@ if TYPE_CHECKING:
 
 _predictor: Optional[Any] = None
 
+# "disabled", "loading", "ready" or "failed"; reported by /ready
+_model_state: str = "disabled"
+
+
+_batcher: Optional[Any] = None
+# One inference thread: the engine parallelizes each forward pass internally
+_executor: Optional[ThreadPoolExecutor] = None
+# Results by image content hash (None when disabled)
+_cache: Optional[Any] = None
+
 
 def initialize_predictor(predictor):
-    """Initialize global predictor instance"""
-    global _predictor
+    """Initialize global predictor instance and the batcher in front of it"""
+    global _predictor, _batcher, _executor, _cache
+    from app.ai_moderation.batcher import InferenceBatcher
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
     _predictor = predictor
+    _batcher = InferenceBatcher(
+        predictor.predict_batch,
+        max_batch_size=settings.AI_MODERATION_MAX_BATCH_SIZE,
+        max_wait_ms=settings.AI_MODERATION_MAX_BATCH_WAIT_MS,
+        max_queue=settings.AI_MODERATION_MAX_QUEUE,
+        executor=_executor,
+    )
+    _cache = None
+    if settings.AI_MODERATION_CACHE_ENABLED:
+        from app.services.moderation_cache import ModerationCache
+
+        _cache = ModerationCache(getattr(predictor, "model_version", "unknown"))
     logger.info("AI moderation predictor initialized")
 
 
@@ -25,10 +56,202 @@ def get_predictor():
     return _predictor
 
 
+def get_batcher():
+    """Get the inference batcher (None until the predictor is initialized)"""
+    return _batcher
+
+
+def get_cache():
+    """Get the moderation result cache (None when disabled or before initialization)"""
+    return _cache
+
+
+def get_memory_report() -> Dict[str, Any]:
+    """Process RSS plus the size and dtype of the loaded weights, when the predictor reports them"""
+    from app.core.memory import peak_rss_mb, rss_mb
+
+    report_fn = getattr(_predictor, "memory_report", None)
+    if report_fn is not None:
+        return report_fn()
+    return {"rss_mb": round(rss_mb(), 1), "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+async def predict_image_url(image_url: str, download_limit: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+    """Classify the image behind a URL (raises ValueError for bad images).
+
+    A URL already seen (and its content hash) is answered from the cache
+    without downloading. download_limit bounds concurrent downloads of one
+    caller; inference is not held under it, so downloaded images join the
+    batcher queue right away.
+    """
+    from app.ai_moderation.preprocessor import download_image_bytes_async
+
+    if _cache is not None:
+        cached = await _cache.get_by_url(image_url)
+        if cached is not None:
+            return cached
+
+    if download_limit is None:
+        data = await download_image_bytes_async(image_url)
+    else:
+        async with download_limit:
+            data = await download_image_bytes_async(image_url)
+    return await predict_image_bytes(data, image_url)
+
+
+async def predict_image_bytes(data: bytes, image_url: Optional[str] = None) -> Dict[str, Any]:
+    """Classify image bytes through the cache and the batcher (raises ValueError for bad images)"""
+    from app.ai_moderation.preprocessor import load_image_from_bytes
+
+    image_hash = None
+    if _cache is not None:
+        from app.services.moderation_cache import hash_image
+
+        image_hash = hash_image(data)
+        cached = await _cache.get(image_hash)
+        if cached is not None:
+            if image_url is not None:
+                await _cache.put(image_hash, None, image_url)
+            return cached
+
+    # Decoding (draft mode, limits) runs in a thread, not on the loop or the inference thread
+    image = await asyncio.to_thread(load_image_from_bytes, data)
+    prediction = await _batcher.submit(image)
+    if _cache is not None:
+        await _cache.put(image_hash, prediction, image_url)
+    return prediction
+
+
+async def close_batcher() -> None:
+    global _executor
+    if _batcher is not None:
+        await _batcher.close()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _load_torch_predictor(model_dir: Path, threads: Optional[int]):
+    import torch
+    from app.ai_moderation.model import CLIPModerationModel
+    from app.ai_moderation.predictor import ImageModerationPredictor
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    model = CLIPModerationModel(
+        model_dir=model_dir,
+        model_name=settings.AI_MODERATION_MODEL_NAME,
+        device=settings.AI_MODERATION_DEVICE,
+        dtype=settings.AI_MODERATION_DTYPE
+    )
+    model.load_config()
+    model.load_models()
+    return ImageModerationPredictor(model)
+
+
+def _load_onnx_predictor(model_dir: Path, threads: Optional[int]):
+    from app.ai_moderation.onnx_engine import OnnxModerationPredictor, default_onnx_path
+
+    if settings.AI_MODERATION_ONNX_PATH:
+        onnx_path = Path(settings.AI_MODERATION_ONNX_PATH)
+    else:
+        onnx_path = default_onnx_path(model_dir, int8=settings.AI_MODERATION_ONNX_INT8)
+    return OnnxModerationPredictor(onnx_path, threads=threads)
+
+
+_ENGINES = {
+    "torch": _load_torch_predictor,
+    "onnx": _load_onnx_predictor,
+}
+
+
+def create_predictor(engine: str, model_dir: Path, threads: Optional[int] = None):
+    """Build a predictor for an engine ("torch" or "onnx") without installing it.
+
+    Model name, device, dtype and ONNX file come from settings; threads is the
+    intra-op thread count (None: engine default). Raises ValueError for an
+    unknown engine, ImportError if its dependencies are missing.
+    """
+    loader = _ENGINES.get(engine.lower())
+    if loader is None:
+        raise ValueError(f"Unknown AI moderation engine {engine!r}, expected one of {sorted(_ENGINES)}")
+    return loader(Path(model_dir), threads)
+
+
+def load_predictor_from_settings() -> bool:
+    """Load the CLIP moderation model configured in settings and install it as the global predictor.
+
+    AI_MODERATION_ENGINE selects PyTorch ("torch") or ONNX Runtime ("onnx").
+    Returns True if a predictor is available afterwards. Failures are logged and
+    leave the service in manual-moderation mode.
+    """
+    if not (settings.AI_MODERATION_ENABLED and settings.AI_MODERATION_MODEL_DIR):
+        return False
+    engine = settings.AI_MODERATION_ENGINE.lower()
+    try:
+        logger.info(f"Initializing AI moderation model (engine: {engine})...")
+
+        model_dir = Path(settings.AI_MODERATION_MODEL_DIR)
+        if not model_dir.exists():
+            logger.warning(f"AI moderation model directory not found: {model_dir}")
+            return False
+
+        # Lazy imports inside the loaders: torch/onnxruntime only when AI moderation is enabled
+        initialize_predictor(create_predictor(engine, model_dir, settings.AI_MODERATION_INFERENCE_THREADS))
+        logger.info("✓ AI moderation model loaded successfully")
+        logger.info(f"AI moderation memory: {get_memory_report()}")
+        return True
+
+    except ImportError as import_error:
+        logger.warning(f"AI moderation dependencies not available: {import_error}")
+        logger.warning("Install requirements-ai.txt to enable AI moderation")
+    except Exception as e:
+        logger.error(f"Failed to initialize AI moderation model: {e}", exc_info=True)
+        logger.warning("AI moderation will be unavailable, falling back to manual moderation")
+    return False
+
+
+def get_model_state() -> str:
+    return _model_state
+
+
+async def prepare_predictor() -> None:
+    """Load the model (unless it was preloaded) and run a warm-up inference, off the event loop.
+
+    The app serves traffic meanwhile; until the predictor is installed, images
+    go to manual moderation.
+    """
+    global _model_state
+    if not settings.AI_MODERATION_ENABLED:
+        _model_state = "disabled"
+        return
+
+    _model_state = "loading"
+    if _predictor is None and not await asyncio.to_thread(load_predictor_from_settings):
+        _model_state = "failed"
+        return
+
+    if _cache is not None:
+        try:
+            purged = await asyncio.to_thread(_cache.purge_other_versions)
+            if purged:
+                logger.info(f"Dropped {purged} cached moderation results of previous model versions")
+        except Exception as e:
+            logger.warning(f"Could not purge the moderation cache: {e}")
+
+    if settings.AI_MODERATION_WARMUP:
+        try:
+            await asyncio.get_running_loop().run_in_executor(_executor, _predictor.warmup)
+        except Exception as e:
+            logger.warning(f"AI moderation warm-up failed: {e}")
+    _model_state = "ready"
+
+
 async def moderate_image_auto(
     image_url: str,
     category: Optional[str] = None,
-    min_confidence_for_rejection: float = 0.7
+    min_confidence_for_rejection: Optional[float] = None
 ) -> Dict[str, Any]:
     """
     Automatically moderate image using AI model.
@@ -36,7 +259,8 @@ async def moderate_image_auto(
     Args:
         image_url: URL of the image to moderate
         category: Optional item category (for logging/future use)
-        min_confidence_for_rejection: Minimum confidence to reject (default: 0.7)
+        min_confidence_for_rejection: Minimum confidence to reject
+            (default: AI_MODERATION_AUTO_REJECT_CONFIDENCE)
     
     Returns:
         dict with fields:
@@ -47,9 +271,65 @@ async def moderate_image_auto(
         - processing_time_ms: int
         - model: "trained"
         - auto_action: bool - whether automatic action was taken
+        - embedding: normalized CLIP image embedding (if the model produced one)
     
     Returns default "pending" if predictor is not available.
     """
+    return await _moderate(lambda: predict_image_url(image_url), image_url, category, min_confidence_for_rejection)
+
+
+async def moderate_image_bytes_auto(
+    data: bytes,
+    image_url: Optional[str] = None,
+    category: Optional[str] = None,
+    min_confidence_for_rejection: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Automatically moderate an image the caller already holds in memory
+    (no download). Same result format as moderate_image_auto().
+    
+    Args:
+        data: Image bytes
+        image_url: URL the image is (being) stored under; remembered in the
+            cache so later checks of this URL need no download
+        category: Optional item category
+        min_confidence_for_rejection: Minimum confidence to reject
+            (default: AI_MODERATION_AUTO_REJECT_CONFIDENCE)
+    """
+    label = image_url or f"<{len(data)} bytes>"
+    return await _moderate(lambda: predict_image_bytes(data, image_url), label, category, min_confidence_for_rejection)
+
+
+def auto_moderation_status(
+    predicted_class: str,
+    confidence: float,
+    approve_confidence: Optional[float] = None,
+    reject_confidence: Optional[float] = None
+) -> str:
+    """
+    What automatic moderation does with a prediction: "approved", "rejected"
+    or "pending" (left to a moderator).
+
+    The one decision rule, used both by live moderation and by the offline
+    evaluation harness, so benchmarked thresholds mean the same in production.
+    Thresholds default to AI_MODERATION_AUTO_APPROVE_CONFIDENCE and
+    AI_MODERATION_AUTO_REJECT_CONFIDENCE.
+    """
+    if approve_confidence is None:
+        approve_confidence = settings.AI_MODERATION_AUTO_APPROVE_CONFIDENCE
+    if reject_confidence is None:
+        reject_confidence = settings.AI_MODERATION_AUTO_REJECT_CONFIDENCE
+    if predicted_class == "approved":
+        return "approved" if confidence >= approve_confidence else "pending"
+    return "rejected" if confidence >= reject_confidence else "pending"
+
+
+async def _moderate(
+    predict: Callable[[], Awaitable[Dict[str, Any]]],
+    label: str,
+    category: Optional[str],
+    min_confidence_for_rejection: Optional[float]
+) -> Dict[str, Any]:
     if _predictor is None:
         logger.warning("AI moderation predictor not initialized, returning pending")
         return {
@@ -62,45 +342,49 @@ async def moderate_image_auto(
             "auto_action": False,
         }
     
+    from app.ai_moderation.batcher import InferenceQueueFull
+
     try:
-        prediction = await _predictor.predict_from_url(image_url)
+        prediction = await predict()
         
         result = _predictor.format_prediction_for_api(prediction)
+        # Not part of API responses; the moderation worker keeps it for duplicate search
+        result["embedding"] = prediction.get("embedding")
         
         predicted_class = prediction["predicted_class"]
         confidence = prediction["confidence"]
         
-        auto_action = False
-        
-        if predicted_class == "approved" and confidence > 0.85:
-            result["status"] = "approved"
-            result["auto_action"] = True
-        
-        elif predicted_class != "approved" and confidence > min_confidence_for_rejection:
-            if confidence > 0.9:
-                result["status"] = "rejected"
-                result["auto_action"] = True
-            else:
-                result["status"] = "pending"
-                result["auto_action"] = False
-        
-        else:
-            result["status"] = "pending"
-            result["auto_action"] = False
+        result["status"] = auto_moderation_status(
+            predicted_class, confidence, reject_confidence=min_confidence_for_rejection
+        )
+        result["auto_action"] = result["status"] != "pending"
         
         if category:
             result["category"] = category
         
         logger.info(
-            f"Image moderation: {image_url[:50]}... -> {result['status']} "
+            f"Image moderation: {label[:50]}... -> {result['status']} "
             f"(class: {predicted_class}, confidence: {confidence:.4f}, "
             f"probabilities: {prediction.get('probabilities', {})})"
         )
         
         return result
     
+    except InferenceQueueFull as e:
+        # Do not wait behind a full queue: the image goes to manual moderation
+        logger.warning(f"AI moderation queue is full, image left pending: {e}")
+        return {
+            "status": "pending",
+            "reason": "queue_full",
+            "confidence": 0.0,
+            "probabilities": {},
+            "processing_time_ms": 0,
+            "model": "busy",
+            "auto_action": False,
+        }
+    
     except Exception as e:
-        logger.error(f"Error moderating image {image_url}: {e}", exc_info=True)
+        logger.error(f"Error moderating image {label}: {e}", exc_info=True)
         return {
             "status": "pending",
             "reason": "error",
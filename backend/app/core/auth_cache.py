@@ -0,0 +1,132 @@
+"""
+In-process caches for request authentication.
+
+The verified-token cache skips JWT signature checks for tokens seen before
+(entries live until the token's exp). The principal cache keeps a snapshot of
+the user row for a few seconds, so most authenticated requests need no query.
+
+Caches are per process. Changes that must take effect everywhere (role change,
+deactivation) bump users.auth_version: tokens carry the version they were
+issued for, and any worker that reloads the user rejects older tokens. A
+password change does not bump the version; it revokes the user's other login
+sessions through the deny-list below instead. Within
+the worker that made the change, invalidate_principal() drops the snapshot at
+once; other workers keep accepting older tokens until their snapshot expires,
+i.e. for up to AUTH_PRINCIPAL_CACHE_TTL_SECONDS. Snapshots of moderators and
+admins use the shorter AUTH_PRIVILEGED_PRINCIPAL_CACHE_TTL_SECONDS, so a
+revoked privilege stops working sooner.
+
+Revoked login sessions are kept in a small deny-list of session ids, so access
+tokens (which carry sid) are checked without touching the database. An id only
+has to stay listed for the lifetime of an access token.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from app.core.config import settings
+
+
+class LRUCache:
+    """Thread-safe LRU mapping where every entry has its own expiry (monotonic seconds)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[Any]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, now: Optional[float] = None) -> None:
+        if ttl <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._data[key] = (value, now + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# token -> decoded payload
+token_cache = LRUCache(settings.AUTH_TOKEN_CACHE_SIZE)
+# user id -> column values of the user row
+principal_cache = LRUCache(settings.AUTH_PRINCIPAL_CACHE_SIZE)
+
+
+def get_cached_payload(token: str) -> Optional[Dict[str, Any]]:
+    return token_cache.get(token)
+
+
+def cache_payload(token: str, payload: Dict[str, Any]) -> None:
+    """Remember a verified token until its exp claim."""
+    exp = payload.get("exp")
+    if exp is None:
+        return
+    token_cache.set(token, payload, float(exp) - time.time())
+
+
+def get_principal(user_id: int) -> Optional[Dict[str, Any]]:
+    return principal_cache.get(user_id)
+
+
+def cache_principal(user_id: int, snapshot: Dict[str, Any]) -> None:
+    if snapshot.get("role") in (None, "user"):
+        ttl = settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS
+    else:
+        ttl = settings.AUTH_PRIVILEGED_PRINCIPAL_CACHE_TTL_SECONDS
+    principal_cache.set(user_id, snapshot, ttl)
+
+
+def invalidate_principal(user_id: int) -> None:
+    principal_cache.pop(user_id)
+
+
+# session id -> monotonic time after which no access token for it can be valid
+_revoked_sessions: Dict[int, float] = {}
+_revoked_lock = threading.Lock()
+
+
+def is_session_revoked(session_id: int) -> bool:
+    return session_id in _revoked_sessions
+
+
+def add_revoked_sessions(session_ids: Iterable[int]) -> None:
+    """Add ids to the deny-list and drop entries that outlived every access token."""
+    now = time.monotonic()
+    expires_at = now + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    with _revoked_lock:
+        for session_id in session_ids:
+            _revoked_sessions[session_id] = expires_at
+        for session_id in [sid for sid, until in _revoked_sessions.items() if until <= now]:
+            del _revoked_sessions[session_id]
+
+
+def clear_auth_caches() -> None:
+    token_cache.clear()
+    principal_cache.clear()
+    with _revoked_lock:
+        _revoked_sessions.clear()
@@ -7,7 +7,34 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+
+    # Auth caches: verified tokens and short-lived user snapshots (app.core.auth_cache)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_PRINCIPAL_CACHE_SIZE: int = 10000
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0
+    AUTH_PRIVILEGED_PRINCIPAL_CACHE_TTL_SECONDS: float = 5.0  # moderators and admins
+
+    # Refresh tokens: server-side sessions and the in-memory deny-list of revoked ones
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: float = 10.0  # concurrent refreshes from several tabs
+    SESSION_DENYLIST_SYNC_ENABLED: bool = True
+    SESSION_DENYLIST_SYNC_INTERVAL_SECONDS: float = 30.0
+
+    # Rate limiting of expensive endpoints (app.core.rate_limit); requests per minute per user or IP
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # shared store for multi-worker setups, in-process if unset
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_AUTH_PER_MINUTE: int = 10
+    RATE_LIMIT_UPLOAD_PER_MINUTE: int = 30
+    RATE_LIMIT_AI_BATCH_PER_MINUTE: int = 5
+    RATE_LIMIT_WRITE_PER_MINUTE: int = 20
+
+    # Password hashing: bcrypt cost and the process pool it runs in (0 workers = inline)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16
     CORS_ORIGINS: str = "http://localhost:3000"
+    CORS_ALLOW_DEV_ORIGINS: bool = False  # any port on localhost / 127.0.0.1 / 0.0.0.0, never in production
     
     AWS_ACCESS_KEY_ID: Optional[str] = None
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
@@ -20,9 +47,98 @@ class Settings(BaseSettings):
     AI_MODERATION_MODEL_DIR: Optional[str] = None  # Path to model directory, e.g., "/home/gera/clip"
     AI_MODERATION_MODEL_NAME: str = "openai/clip-vit-base-patch32"
     AI_MODERATION_DEVICE: Optional[str] = None  # "cuda" or "cpu", auto-detects if None
+    # Weights of the CLIP vision tower (torch engine): "float32", "bfloat16" or "float16"
+    AI_MODERATION_DTYPE: str = "float32"
     AI_MODERATION_MIN_CONFIDENCE_REJECT: float = 0.7
     AI_MODERATION_AUTO_APPROVE_CONFIDENCE: float = 0.85
     AI_MODERATION_AUTO_REJECT_CONFIDENCE: float = 0.90
+    # One inference on a blank image after loading, so the first real request is not slow
+    AI_MODERATION_WARMUP: bool = True
+    # Dynamic batching: concurrent images share one forward pass
+    AI_MODERATION_MAX_BATCH_SIZE: int = 16
+    AI_MODERATION_MAX_BATCH_WAIT_MS: float = 5.0
+    # Images waiting for inference beyond this go to manual moderation at once
+    AI_MODERATION_MAX_QUEUE: int = 64
+    # Intra-op threads of the inference engine (None: engine default)
+    AI_MODERATION_INFERENCE_THREADS: Optional[int] = None
+    # Inference engine: "torch" or "onnx" (ONNX Runtime, model exported by scripts/onnx_moderation.py)
+    AI_MODERATION_ENGINE: str = "torch"
+    # Exported model; default: moderation.onnx (moderation.int8.onnx with INT8) in the model directory
+    AI_MODERATION_ONNX_PATH: Optional[str] = None
+    AI_MODERATION_ONNX_INT8: bool = False
+    # /moderation/ai/batch: images per request and parallel downloads per request
+    AI_MODERATION_BATCH_MAX_IMAGES: int = 100
+    AI_MODERATION_DOWNLOAD_CONCURRENCY: int = 8
+    # Images above these limits are not moderated (downloads are cut off at the byte limit)
+    AI_MODERATION_MAX_DOWNLOAD_BYTES: int = 10 * 1024 * 1024
+    AI_MODERATION_MAX_IMAGE_PIXELS: int = 40_000_000
+    # Results cached by sha256 of image bytes: in memory (LRU) and in the database
+    AI_MODERATION_CACHE_ENABLED: bool = True
+    AI_MODERATION_CACHE_SIZE: int = 10000
+    AI_MODERATION_CACHE_TTL_SECONDS: float = 86400.0
+    # URL -> image hash entries are trusted for this long (content behind a URL may change)
+    AI_MODERATION_CACHE_URL_TTL_SECONDS: float = 86400.0
+    # Results of another model version are purged only once that version has written nothing
+    # for this long: during a rolling deploy old and new workers share the table
+    AI_MODERATION_CACHE_PURGE_AFTER_SECONDS: float = 3600.0
+
+    # Shared outgoing HTTP client (image downloads)
+    HTTP_CLIENT_TIMEOUT_SECONDS: float = 30.0
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 100
+
+    # /ready: dependency checks are cached for this long
+    READINESS_CACHE_SECONDS: float = 5.0
+    READINESS_CHECK_TIMEOUT_SECONDS: float = 2.0
+
+    # Notification outbox dispatcher
+    NOTIFICATION_DISPATCHER_ENABLED: bool = True
+    NOTIFICATION_DISPATCH_INTERVAL_SECONDS: float = 1.0
+    NOTIFICATION_DISPATCH_BATCH_SIZE: int = 500
+    # Same-type notifications about one item within this window merge into one row (0 disables)
+    NOTIFICATION_COALESCE_WINDOW_SECONDS: float = 60.0
+
+    # Notification retention: read notifications older than this move to the archive
+    NOTIFICATION_RETENTION_ENABLED: bool = True
+    NOTIFICATION_RETENTION_DAYS: int = 30
+    NOTIFICATION_RETENTION_BATCH_SIZE: int = 1000
+    NOTIFICATION_RETENTION_INTERVAL_SECONDS: float = 3600.0
+
+    # Background AI moderation of new listings (runs when AI_MODERATION_ENABLED)
+    MODERATION_JOBS_ENABLED: bool = True
+    MODERATION_JOB_BATCH_SIZE: int = 16
+    MODERATION_JOB_INTERVAL_SECONDS: float = 1.0
+    MODERATION_JOB_LEASE_SECONDS: float = 300.0
+    MODERATION_JOB_MAX_ATTEMPTS: int = 5
+    MODERATION_JOB_RETRY_BASE_SECONDS: float = 10.0
+    MODERATION_JOB_RETRY_MAX_SECONDS: float = 1800.0
+
+    # Blocklist pre-filter of listing titles and descriptions (app.core.text_filter)
+    TEXT_MODERATION_ENABLED: bool = True
+    TEXT_MODERATION_BLOCKLIST_PATH: Optional[str] = None  # JSON file, re-read on change; built-in lists if unset
+    TEXT_MODERATION_RELOAD_INTERVAL_SECONDS: float = 5.0
+    # Score from which a listing is never approved automatically, and from which it is rejected at once
+    TEXT_MODERATION_REVIEW_SCORE: float = 0.5
+    TEXT_MODERATION_REJECT_SCORE: float = 3.0  # above the sum of the soft categories (2.5)
+
+    # Near-duplicate listings of one owner, by the CLIP embedding from AI moderation (app.services.duplicates)
+    DUPLICATE_DETECTION_ENABLED: bool = True
+    DUPLICATE_SIMILARITY_THRESHOLD: float = 0.95
+    DUPLICATE_ACTION: str = "flag"  # "flag": moderators decide, "reject": the repost is rejected
+    DUPLICATE_INDEX_PATH: Optional[str] = None  # .npz snapshot for fast restart; rebuilt from the database if unset
+    DUPLICATE_INDEX_SAVE_INTERVAL_SECONDS: float = 60.0
+
+    # Telegram delivery of notifications (enabled when a bot token is set)
+    TELEGRAM_BOT_TOKEN: Optional[str] = None
+    TELEGRAM_API_BASE_URL: str = "https://api.telegram.org"
+    TELEGRAM_DELIVERY_BATCH_SIZE: int = 100
+    TELEGRAM_DELIVERY_INTERVAL_SECONDS: float = 2.0
+    TELEGRAM_DELIVERY_LEASE_SECONDS: float = 60.0  # margin on top of the batch's worst-case send time
+    TELEGRAM_SEND_TIMEOUT_SECONDS: float = 10.0
+    TELEGRAM_MAX_ATTEMPTS: int = 5
+    TELEGRAM_RETRY_BASE_SECONDS: float = 5.0
+    TELEGRAM_RETRY_MAX_SECONDS: float = 3600.0
+    TELEGRAM_PER_CHAT_RATE: float = 1.0  # messages per second to one chat
+    TELEGRAM_GLOBAL_RATE: float = 25.0  # messages per second for the whole bot
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,134 @@
+"""
+CORS as a single pure ASGI layer.
+
+Allowed origins are computed once: every configured origin and, for an
+origin on localhost / 127.0.0.1 / 0.0.0.0, the same origin on the other two
+host names. With CORS_ALLOW_DEV_ORIGINS (local development only) any port on
+those hosts is allowed too.
+
+Decisions are memoized per origin, preflight answers are prebuilt header
+blocks, and requests without an Origin header go straight to the app.
+"""
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+Headers = List[Tuple[bytes, bytes]]
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "0.0.0.0")
+DEV_ORIGIN_PREFIXES = tuple(f"http://{host}:" for host in LOCAL_HOSTS)
+ALLOW_METHODS = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
+
+
+def expand_origins(origins: Iterable[str]) -> FrozenSet[str]:
+    """Configured origins plus their variants for the other local host names."""
+    expanded = set()
+    for origin in origins:
+        origin = origin.strip()
+        if not origin:
+            continue
+        expanded.add(origin)
+        try:
+            parts = urlsplit(origin)
+            port = parts.port
+        except ValueError:
+            continue
+        if parts.hostname not in LOCAL_HOSTS:
+            continue
+        suffix = f":{port}" if port is not None else ""
+        expanded.update(f"{parts.scheme}://{host}{suffix}" for host in LOCAL_HOSTS)
+    return frozenset(expanded)
+
+
+class CORSMiddleware:
+    def __init__(
+        self,
+        app,
+        allow_origins: Iterable[str],
+        allow_dev_origins: bool = False,
+        max_age: int = 3600,
+        max_cached_origins: int = 1024,
+    ):
+        self.app = app
+        self.allowed = expand_origins(allow_origins)
+        self.allow_dev_origins = allow_dev_origins
+        self.max_cached_origins = max_cached_origins
+        self._preflight_base: Headers = [
+            (b"access-control-allow-methods", ALLOW_METHODS.encode()),
+            (b"access-control-allow-headers", b"*"),
+            (b"access-control-max-age", str(max_age).encode()),
+            (b"content-length", b"0"),
+        ]
+        # origin -> prebuilt headers (None: origin not allowed)
+        self._preflight: Dict[bytes, Headers] = {}
+        self._simple: Dict[bytes, Optional[Headers]] = {}
+
+    def is_allowed(self, origin: str) -> bool:
+        if origin in self.allowed:
+            return True
+        return self.allow_dev_origins and origin.startswith(DEV_ORIGIN_PREFIXES)
+
+    def _simple_headers(self, origin: bytes) -> Optional[Headers]:
+        try:
+            return self._simple[origin]
+        except KeyError:
+            pass
+        headers = None
+        if self.is_allowed(origin.decode("latin-1")):
+            headers = [
+                (b"access-control-allow-origin", origin),
+                (b"access-control-allow-credentials", b"true"),
+                (b"access-control-expose-headers", b"*"),
+                (b"vary", b"Origin"),
+            ]
+        # Произвольные Origin от клиентов не должны раздувать кэш
+        if len(self._simple) < self.max_cached_origins:
+            self._simple[origin] = headers
+        return headers
+
+    def _preflight_headers(self, origin: Optional[bytes]) -> Headers:
+        if origin is None:
+            return self._preflight_base
+        try:
+            return self._preflight[origin]
+        except KeyError:
+            pass
+        headers = self._preflight_base
+        if self.is_allowed(origin.decode("latin-1")):
+            headers = [
+                (b"access-control-allow-origin", origin),
+                (b"access-control-allow-credentials", b"true"),
+                (b"vary", b"Origin"),
+                *self._preflight_base,
+            ]
+        if len(self._preflight) < self.max_cached_origins:
+            self._preflight[origin] = headers
+        return headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        origin = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+                break
+
+        # OPTIONS всегда отвечаем сами: 200 с заголовками preflight
+        if scope["method"] == "OPTIONS":
+            await send({"type": "http.response.start", "status": 200, "headers": self._preflight_headers(origin)})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if origin is None:
+            return await self.app(scope, receive, send)
+        cors_headers = self._simple_headers(origin)
+        if cors_headers is None:
+            return await self.app(scope, receive, send)
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *cors_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
@@ -0,0 +1,35 @@
+"""
+Shared aiohttp session for outgoing requests.
+
+The session is created on first use and closed by the application lifespan
+on shutdown, so connections (and DNS lookups) are reused across requests.
+"""
+from typing import Optional
+
+import aiohttp
+
+from app.core.config import settings
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def _create_session() -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=settings.HTTP_CLIENT_TIMEOUT_SECONDS),
+        connector=aiohttp.TCPConnector(limit=settings.HTTP_CLIENT_MAX_CONNECTIONS, ttl_dns_cache=300),
+    )
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Session of the running application (created lazily; must be called inside an event loop)."""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+
+async def close_http_session() -> None:
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
@@ -0,0 +1,27 @@
+"""
+Resident memory of the current process.
+
+Used for the moderation model memory report: how much a worker holds after
+loading the model decides how many workers fit on a node.
+"""
+import resource
+import sys
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is not available)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
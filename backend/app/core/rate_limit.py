@@ -0,0 +1,229 @@
+"""
+Rate limiting for expensive endpoints.
+
+A pure ASGI middleware: each limited route belongs to a route class with its
+own token bucket, keyed by user id (from a verified access token) or by client
+IP. Routes are matched with a single dict lookup on (method, path), so
+unlimited requests pay one lookup and nothing else.
+
+Anonymous clients are keyed by scope["client"]. uvicorn fills it from
+X-Forwarded-For only for peers listed in FORWARDED_ALLOW_IPS (see
+gunicorn.conf.py); behind a reverse proxy that is not listed, every client
+gets the proxy's address and all of them share one bucket.
+
+Buckets live in-process by default. With RATE_LIMIT_REDIS_URL set they are
+kept in Redis (one atomic script call per limited request), so all workers
+share the same limits.
+"""
+import json
+import logging
+import math
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Tuple
+
+from app.core.auth_cache import cache_payload, get_cached_payload
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.core.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitRule(NamedTuple):
+    name: str
+    per_minute: int
+    routes: Tuple[Tuple[str, str], ...]
+    # Route classes used before login (or for login itself) are keyed by IP only
+    per_user: bool = True
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60.0
+
+    @property
+    def capacity(self) -> float:
+        return float(self.per_minute)
+
+
+def default_rules() -> List[RateLimitRule]:
+    api = "/api/v1"
+    return [
+        RateLimitRule(
+            "auth",
+            settings.RATE_LIMIT_AUTH_PER_MINUTE,
+            (("POST", f"{api}/auth/login"), ("POST", f"{api}/auth/register")),
+            per_user=False,
+        ),
+        RateLimitRule("upload", settings.RATE_LIMIT_UPLOAD_PER_MINUTE, (("POST", f"{api}/upload/image"),)),
+        RateLimitRule("ai_batch", settings.RATE_LIMIT_AI_BATCH_PER_MINUTE, (("POST", f"{api}/moderation/ai/batch"),)),
+        RateLimitRule(
+            "write",
+            settings.RATE_LIMIT_WRITE_PER_MINUTE,
+            (
+                ("POST", f"{api}/bookings/"),
+                ("POST", f"{api}/bookings"),
+                ("POST", f"{api}/reports/"),
+                ("POST", f"{api}/reports"),
+            ),
+        ),
+    ]
+
+
+class MemoryStore:
+    """In-process buckets, least recently used keys are evicted beyond max_keys."""
+
+    def __init__(self, max_keys: int = None):
+        self.max_keys = max_keys or settings.RATE_LIMIT_MAX_KEYS
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def hit(self, key: str, rate: float, capacity: float) -> Tuple[bool, float, float]:
+        """Take one token. Returns (allowed, tokens left, seconds until the next token)."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, capacity)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.acquire()
+        return wait == 0.0, bucket.tokens, wait
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+# Token bucket in one round trip; redis TIME keeps workers on the same clock
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens), tostring(wait)}
+"""
+
+
+class RedisStore:
+    """Buckets shared by all workers. Fails open if Redis is unreachable."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def hit(self, key: str, rate: float, capacity: float) -> Tuple[bool, float, float]:
+        try:
+            allowed, tokens, wait = await self._script(keys=[f"ratelimit:{key}"], args=[rate, capacity])
+        except Exception as e:
+            logger.error(f"Rate limit store unavailable, request allowed: {e}")
+            return True, capacity, 0.0
+        return bool(int(allowed)), float(tokens), float(wait)
+
+    def clear(self) -> None:
+        pass
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if settings.RATE_LIMIT_REDIS_URL:
+            try:
+                _store = RedisStore(settings.RATE_LIMIT_REDIS_URL)
+            except ImportError:
+                logger.warning("redis is not installed, falling back to in-process rate limits")
+                _store = MemoryStore()
+        else:
+            _store = MemoryStore()
+    return _store
+
+
+def reset_rate_limits() -> None:
+    if _store is not None:
+        _store.clear()
+
+
+def _client_key(scope, rule: RateLimitRule) -> str:
+    if rule.per_user:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    payload = get_cached_payload(token)
+                    if payload is None:
+                        payload = decode_access_token(token)
+                        if payload is not None:
+                            cache_payload(token, payload)
+                    if payload and payload.get("uid") is not None:
+                        return f"user:{payload['uid']}"
+                break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, rules: Iterable[RateLimitRule] = None, store=None):
+        self.app = app
+        self.store = store
+        self.routes = {
+            route: rule
+            for rule in (default_rules() if rules is None else rules)
+            for route in rule.routes
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rule = self.routes.get((scope["method"], scope["path"]))
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        store = self.store or get_store()
+        allowed, tokens, wait = await store.hit(f"{rule.name}:{_client_key(scope, rule)}", rule.rate, rule.capacity)
+        headers = [
+            (b"ratelimit-limit", str(rule.per_minute).encode()),
+            (b"ratelimit-remaining", str(max(0, math.floor(tokens))).encode()),
+            (b"ratelimit-reset", str(math.ceil((rule.capacity - tokens) / rule.rate)).encode()),
+        ]
+
+        if not allowed:
+            body = json.dumps(
+                {"detail": "Слишком много запросов. Пожалуйста, повторите позже."},
+                ensure_ascii=False,
+            ).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+                    *headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
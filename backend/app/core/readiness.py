@@ -0,0 +1,86 @@
+"""
+Readiness probe for /ready.
+
+Unlike /health (the process is alive), /ready reports whether the dependencies
+answer: the database and, if configured, the S3 bucket. Check results are
+cached for READINESS_CACHE_SECONDS, so frequent probes from an orchestrator or
+load balancer do not turn into database and S3 traffic. The moderation model
+state is reported but does not affect readiness: until the model is loaded,
+images go to manual moderation.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+
+
+def check_database() -> None:
+    from app.core.database import engine
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def check_storage() -> None:
+    from app.core.s3 import check_s3_bucket
+
+    check_s3_bucket()
+
+
+def default_checks() -> Dict[str, Optional[Callable[[], None]]]:
+    """name -> blocking check (None: not configured, reported as skipped)"""
+    return {
+        "database": check_database,
+        "storage": check_storage if settings.AWS_S3_BUCKET else None,
+    }
+
+
+class ReadinessProbe:
+    def __init__(
+        self,
+        checks: Dict[str, Optional[Callable[[], None]]] = None,
+        cache_seconds: float = None,
+        timeout: float = None,
+    ):
+        self.checks = default_checks() if checks is None else checks
+        self.cache_seconds = settings.READINESS_CACHE_SECONDS if cache_seconds is None else cache_seconds
+        self.timeout = settings.READINESS_CHECK_TIMEOUT_SECONDS if timeout is None else timeout
+        self._results: Optional[Dict[str, str]] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _run(self, check: Optional[Callable[[], None]]) -> str:
+        if check is None:
+            return "skipped"
+        try:
+            await asyncio.wait_for(asyncio.to_thread(check), self.timeout)
+            return "ok"
+        except asyncio.TimeoutError:
+            return "timeout"
+        except Exception as e:
+            return f"error: {e}"
+
+    async def results(self) -> Dict[str, str]:
+        """Check results, re-run at most once per cache period (concurrent callers share one run)"""
+        if self._results is None or time.monotonic() - self._checked_at >= self.cache_seconds:
+            async with self._lock:
+                if self._results is None or time.monotonic() - self._checked_at >= self.cache_seconds:
+                    names = list(self.checks)
+                    values = await asyncio.gather(*(self._run(self.checks[name]) for name in names))
+                    self._results = dict(zip(names, values))
+                    self._checked_at = time.monotonic()
+        return self._results
+
+    async def status(self) -> Dict[str, Any]:
+        from app.core.ai_service import get_model_state
+
+        checks = await self.results()
+        ready = all(result in ("ok", "skipped") for result in checks.values())
+        return {
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "model": get_model_state(),
+        }
@@ -1,5 +1,3 @@
-import boto3
-from botocore.exceptions import ClientError
 from app.core.config import settings
 import uuid
 from typing import Optional
@@ -10,6 +8,9 @@ s3_client = None
 def get_s3_client():
     global s3_client
     if s3_client is None:
+        # boto3 импортируется при первом обращении к S3, а не при старте воркера
+        import boto3
+
         client_config = {
             'aws_access_key_id': settings.AWS_ACCESS_KEY_ID,
             'aws_secret_access_key': settings.AWS_SECRET_ACCESS_KEY,
@@ -23,11 +24,38 @@ def get_s3_client():
     return s3_client
 
 
-def upload_file_to_s3(file_content: bytes, filename: str, content_type: str) -> str:
+def close_s3_client() -> None:
+    """Закрывает пул соединений клиента (при остановке приложения)"""
+    global s3_client
+    if s3_client is not None:
+        s3_client.close()
+        s3_client = None
+
+
+def check_s3_bucket() -> None:
+    """Проверка доступности бакета для /ready (исключение - бакет недоступен)"""
+    get_s3_client().head_bucket(Bucket=settings.AWS_S3_BUCKET)
+
+
+def new_image_key(filename: str) -> str:
+    """Уникальный ключ объекта для загружаемого изображения"""
+    file_extension = filename.split('.')[-1] if '.' in filename else 'jpg'
+    return f"items/{uuid.uuid4()}.{file_extension}"
+
+
+def public_url(s3_key: str) -> str:
+    """Публичный URL объекта (тот, что сохраняется в объявлении)"""
+    if settings.AWS_S3_ENDPOINT_URL:
+        endpoint = settings.AWS_S3_ENDPOINT_URL.replace('http://minio:', 'http://localhost:')
+        return f"{endpoint}/{settings.AWS_S3_BUCKET}/{s3_key}"
+    return f"https://{settings.AWS_S3_BUCKET}.s3.{settings.AWS_REGION}.amazonaws.com/{s3_key}"
+
+
+def upload_file_to_s3(file_content: bytes, filename: str, content_type: str, s3_key: Optional[str] = None) -> str:
+    from botocore.exceptions import ClientError
+
     try:
-        file_extension = filename.split('.')[-1] if '.' in filename else 'jpg'
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        s3_key = f"items/{unique_filename}"
+        s3_key = s3_key or new_image_key(filename)
         
         s3_client = get_s3_client()
         
@@ -43,17 +71,14 @@ def upload_file_to_s3(file_content: bytes, filename: str, content_type: str) ->
         
         s3_client.put_object(**put_params)
         
-        if settings.AWS_S3_ENDPOINT_URL:
-            endpoint = settings.AWS_S3_ENDPOINT_URL.replace('http://minio:', 'http://localhost:')
-            url = f"{endpoint}/{settings.AWS_S3_BUCKET}/{s3_key}"
-        else:
-            url = f"https://{settings.AWS_S3_BUCKET}.s3.{settings.AWS_REGION}.amazonaws.com/{s3_key}"
-        return url
+        return public_url(s3_key)
     except ClientError as e:
         raise Exception(f"Ошибка загрузки файла в S3: {str(e)}")
 
 
 def delete_file_from_s3(s3_key: str) -> bool:
+    from botocore.exceptions import ClientError
+
     try:
         if s3_key.startswith('http'):
             if '/bazaar-images/' in s3_key:
@@ -1,11 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from typing import Optional
+import multiprocessing
+import threading
 from jose import JWTError, jwt
 import bcrypt
 from app.core.config import settings
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashing jobs are already queued."""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # spawn: the server process has threads, forking it is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown_password_hasher() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _run_bcrypt(fn, *args):
+    """Run a bcrypt call in the process pool, bounded by PASSWORD_HASH_MAX_PENDING.
+
+    Callers are request threads: they wait on the result, but bcrypt itself
+    never occupies the server's thread pool. When the queue is full the call
+    fails fast with PasswordHasherBusy instead of piling up.
+    """
+    global _executor
+    if not _pending.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        executor = _get_executor()
+        if executor is None:
+            return fn(*args)
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            with _executor_lock:
+                if _executor is executor:
+                    _executor = None
+            raise
+    finally:
+        _pending.release()
+
+
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
     try:
         return bcrypt.checkpw(
             plain_password.encode('utf-8'),
@@ -15,12 +75,28 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return False
 
 
-def get_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt()
+def _hashpw(password: str, rounds: int) -> str:
+    salt = bcrypt.gensalt(rounds=rounds)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _run_bcrypt(_checkpw, plain_password, hashed_password)
+
+
+def get_password_hash(password: str) -> str:
+    return _run_bcrypt(_hashpw, password, settings.BCRYPT_ROUNDS)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different cost than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -38,4 +114,3 @@ def decode_access_token(token: str) -> Optional[dict]:
         return payload
     except JWTError:
         return None
-
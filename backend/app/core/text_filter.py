@@ -0,0 +1,298 @@
+"""
+Blocklist pre-filter for listing titles and descriptions.
+
+All patterns of all categories are compiled into one Aho-Corasick automaton,
+so a text is scanned once, in time linear in its length, however long the
+blocklists are. Text and patterns go through the same normalization:
+NFKC, casefolding, ё -> е, invisible characters dropped and Latin letters and
+digits that look like Cyrillic ones mapped to them, so "кaзинo" written with
+Latin a and o, or "KA3ИHO", still match.
+
+Phone numbers are found by a regular expression on the raw text (their
+digits would not survive normalization). Each matched category adds its
+weight to the score once; the score is what the moderation decision uses.
+
+Blocklists come from DEFAULT_BLOCKLISTS or, if TEXT_MODERATION_BLOCKLIST_PATH
+is set, from a JSON file of the same shape. The file is re-read when its
+mtime changes (checked at most every TEXT_MODERATION_RELOAD_INTERVAL_SECONDS);
+a broken file is logged and the previous automaton is kept.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PHONE_CATEGORY = "phone_numbers"
+
+# category -> weight, whole_words (a pattern ending with "*" matches as a prefix) and patterns.
+# Banned words alone reach TEXT_MODERATION_REJECT_SCORE, so they hold only phrases
+# that have no innocent reading. Single words that also occur in normal listings
+# ("поддельная кожа", "книга про оружие", "закладка для книг") are restricted goods:
+# they, like links, phones and spam, only send a listing to review. The soft
+# categories add up to 2.5 at most.
+DEFAULT_BLOCKLISTS: Dict[str, Dict[str, Any]] = {
+    "banned_words": {
+        "weight": 3.0,
+        "whole_words": True,
+        "patterns": [
+            "ставки на спорт", "онлайн казино", "продам наркотики", "купить диплом",
+            "документы на заказ",
+        ],
+    },
+    "restricted_goods": {
+        "weight": 1.0,
+        "whole_words": True,
+        "patterns": [
+            "казино", "букмекер*", "наркотик*", "закладк*", "оружие", "поддельн*", "фальшив*",
+        ],
+    },
+    "spam": {
+        "weight": 0.5,
+        "whole_words": True,
+        "patterns": [
+            "заработок", "пассивный доход", "инвестиц*", "криптовалют*",
+            "без вложений", "быстрые деньги", "пиши в лс", "реферальн*", "промокод*",
+        ],
+    },
+    "external_links": {
+        "weight": 0.5,
+        "whole_words": False,
+        "patterns": [
+            "http://", "https://", "www.", ".ru/", ".com/", "t.me/", "wa.me/", "vk.com", "vk.cc",
+            "bit.ly", "clck.ru", "telegram", "телеграм", "whatsapp", "ватсап", "вотсап",
+        ],
+    },
+    PHONE_CATEGORY: {
+        "weight": 0.5,
+    },
+}
+
+_HOMOGLYPHS = (
+    ("a", "а"), ("b", "в"), ("c", "с"), ("e", "е"), ("h", "н"), ("k", "к"), ("m", "м"),
+    ("o", "о"), ("p", "р"), ("t", "т"), ("x", "х"), ("y", "у"), ("0", "о"), ("3", "з"),
+    ("ё", "е"),
+    # Zero-width characters and soft hyphens are used to split words
+    ("\u200b", ""), ("\u200c", ""), ("\u200d", ""), ("\u2060", ""), ("\ufeff", ""), ("\u00ad", ""),
+)
+
+# Russian mobile numbers: +7 / 7 / 8 or nothing, then 9XX and seven more digits, any separators.
+# The lookahead lets the regex engine skip positions that cannot start a number.
+_PHONE_RE = re.compile(r"(?=[+789])(?<![\d+])(?:(?:\+7|7|8)[\s\-().]*)?9(?:[\s\-().]*\d){9}(?!\d)")
+
+
+def normalize(text: str) -> str:
+    """Canonical form used for matching (the same for text and patterns)."""
+    if not unicodedata.is_normalized("NFKC", text):
+        text = unicodedata.normalize("NFKC", text)
+    text = text.casefold()
+    # str.translate with a mapping is slow on non-Latin-1 text; a few replaces are not
+    for char, replacement in _HOMOGLYPHS:
+        if char in text:
+            text = text.replace(char, replacement)
+    return text
+
+
+class Match(NamedTuple):
+    """Offsets are in the normalized text (in the raw text for phone numbers)."""
+
+    category: str
+    pattern: str
+    start: int
+    end: int
+
+
+class TextCheck(NamedTuple):
+    score: float
+    categories: Tuple[str, ...]
+    matches: Tuple[Match, ...]
+
+
+class _Pattern(NamedTuple):
+    category: str
+    pattern: str
+    # Normalized form, without the trailing "*"
+    text: str
+    # Boundaries that must not touch a letter or digit
+    word_start: bool
+    word_end: bool
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over normalized patterns."""
+
+    def __init__(self, patterns: Iterable[_Pattern]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[_Pattern, ...]] = [()]
+
+        for pattern in patterns:
+            state = 0
+            for char in pattern.text:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            if state:
+                self._out[state] += (pattern,)
+
+        # Breadth-first: the failure state of a node is always shallower, and
+        # its outputs and transitions are already complete when the node is reached.
+        # _delta[state] holds every transition of the state that differs from the
+        # root's, so matching is one dict lookup per character, without walking
+        # failure links.
+        self._delta: List[Dict[str, int]] = [{} for _ in self._goto]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    @property
+    def states(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str):
+        """Yield (end index, pattern) for every occurrence in an already normalized text."""
+        root, delta, out = self._goto[0], self._delta, self._out
+        state = 0
+        for index, char in enumerate(text):
+            state = delta[state].get(char) or root.get(char, 0)
+            if out[state]:
+                for pattern in out[state]:
+                    yield index + 1, pattern
+
+
+def _is_word_char(text: str, index: int) -> bool:
+    return 0 <= index < len(text) and text[index].isalnum()
+
+
+class TextFilter:
+    """Compiled blocklists: one automaton plus category weights."""
+
+    def __init__(self, blocklists: Dict[str, Dict[str, Any]]):
+        self.weights = {name: float(rules.get("weight", 1.0)) for name, rules in blocklists.items()}
+        patterns = []
+        for name, rules in blocklists.items():
+            whole_words = rules.get("whole_words", False)
+            for raw in rules.get("patterns", []):
+                prefix = raw.endswith("*")
+                text = normalize(raw.rstrip("*").strip())
+                if text:
+                    patterns.append(_Pattern(name, raw, text, whole_words, whole_words and not prefix))
+        self.patterns = len(patterns)
+        self._automaton = AhoCorasick(patterns)
+
+    def check(self, *texts: Optional[str]) -> TextCheck:
+        matches = []
+        for raw in texts:
+            if not raw:
+                continue
+            text = normalize(raw)
+            for end, pattern in self._automaton.iter_matches(text):
+                start = end - len(pattern.text)
+                if pattern.word_start and _is_word_char(text, start - 1):
+                    continue
+                if pattern.word_end and _is_word_char(text, end):
+                    continue
+                matches.append(Match(pattern.category, pattern.pattern, start, end))
+            if PHONE_CATEGORY in self.weights:
+                matches.extend(
+                    Match(PHONE_CATEGORY, found.group(), found.start(), found.end())
+                    for found in _PHONE_RE.finditer(raw)
+                )
+
+        categories = tuple(sorted({match.category for match in matches}))
+        score = round(sum(self.weights[category] for category in categories), 4)
+        return TextCheck(score, categories, tuple(matches))
+
+
+class _ReloadingFilter:
+    """Current TextFilter; recompiled when the blocklist file changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter: Optional[TextFilter] = None
+        self._source: Optional[Tuple[Optional[str], Optional[float]]] = None
+        self._checked_at = 0.0
+
+    def _stat(self, path: Optional[str]) -> Tuple[Optional[str], Optional[float]]:
+        if not path:
+            return None, None
+        try:
+            return path, os.stat(path).st_mtime
+        except OSError:
+            return path, None
+
+    def _compile(self, source: Tuple[Optional[str], Optional[float]]) -> TextFilter:
+        path, mtime = source
+        if path is None:
+            return TextFilter(DEFAULT_BLOCKLISTS)
+        if mtime is None:
+            raise FileNotFoundError(path)
+        with open(path, encoding="utf-8") as f:
+            return TextFilter(json.load(f))
+
+    def get(self, force: bool = False) -> TextFilter:
+        now = time.monotonic()
+        current = self._filter
+        if current is not None and not force and now - self._checked_at < settings.TEXT_MODERATION_RELOAD_INTERVAL_SECONDS:
+            return current
+
+        with self._lock:
+            self._checked_at = now
+            source = self._stat(settings.TEXT_MODERATION_BLOCKLIST_PATH)
+            if self._filter is not None and source == self._source and not force:
+                return self._filter
+            try:
+                started = time.perf_counter()
+                compiled = self._compile(source)
+            except Exception as e:
+                if self._filter is None:
+                    logger.error(f"Failed to load text blocklists from {source[0]}: {e}, using defaults")
+                    self._filter = TextFilter(DEFAULT_BLOCKLISTS)
+                else:
+                    logger.error(f"Failed to reload text blocklists from {source[0]}: {e}, keeping the previous ones")
+                self._source = source
+                return self._filter
+            logger.info(
+                f"Text blocklists compiled: {compiled.patterns} patterns, {compiled._automaton.states} states "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            self._filter, self._source = compiled, source
+            return compiled
+
+
+_current = _ReloadingFilter()
+
+
+def get_text_filter() -> TextFilter:
+    return _current.get()
+
+
+def reload_text_filter() -> TextFilter:
+    """Recompile the blocklists now, whether or not the file changed."""
+    return _current.get(force=True)
+
+
+def check_text(*texts: Optional[str]) -> TextCheck:
+    """Check texts (e.g. title and description) against the current blocklists."""
+    return get_text_filter().check(*texts)
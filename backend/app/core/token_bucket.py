@@ -0,0 +1,43 @@
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket: rate tokens per second, up to capacity tokens in reserve."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def acquire(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
+        """Take tokens if available.
+
+        Returns 0.0 on success, otherwise the number of seconds until enough
+        tokens will be available (nothing is taken in that case).
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def reserve(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
+        """Take tokens unconditionally, going into debt if needed.
+
+        Returns the number of seconds the caller has to wait before acting.
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= tokens
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
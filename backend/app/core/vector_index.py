@@ -0,0 +1,235 @@
+"""
+In-process index of L2-normalized embeddings for similarity search.
+
+Vectors live in one float32 matrix that grows by doubling, so adding an
+item is amortized O(1) and a query is a single matrix-vector product
+(cosine similarity, since vectors are normalized). Queries restricted to one
+owner touch only that owner's rows, which is what near-duplicate detection of
+listings needs; an unrestricted query scans the whole matrix and stays exact.
+Approximate partitioning (IVF) would only pay off far beyond the size of this
+marketplace.
+
+The index can be saved to an .npz file and loaded back on restart. The
+file records the model version, because embeddings of different models are not
+comparable. It also records a high-water mark of the source rows already
+indexed, so only newer rows need to be read.
+"""
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 1024
+
+
+def normalize_vector(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+class VectorIndex:
+    """Embeddings by item id, with the owner of each item. Thread-safe."""
+
+    def __init__(self, model_version: str = "unknown", dim: Optional[int] = None):
+        self.model_version = model_version
+        # Highest source row id whose embedding is known to be indexed
+        self.last_id = 0
+        self._dim = dim
+        self._vectors: Optional[np.ndarray] = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._owners = np.empty(0, dtype=np.int64)
+        self._size = 0
+        self._rows: Dict[int, int] = {}
+        self._owner_items: Dict[int, set] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._rows
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._dim
+
+    def ids(self) -> List[int]:
+        with self._lock:
+            return list(self._rows)
+
+    def _reserve(self, count: int) -> None:
+        capacity = 0 if self._vectors is None else len(self._vectors)
+        if count <= capacity:
+            return
+        capacity = max(_INITIAL_CAPACITY, capacity * 2, count)
+        vectors = np.empty((capacity, self._dim), dtype=np.float32)
+        ids = np.empty(capacity, dtype=np.int64)
+        owners = np.empty(capacity, dtype=np.int64)
+        if self._size:
+            vectors[:self._size] = self._vectors[:self._size]
+            ids[:self._size] = self._ids[:self._size]
+            owners[:self._size] = self._owners[:self._size]
+        self._vectors, self._ids, self._owners = vectors, ids, owners
+
+    def add(self, item_id: int, owner_id: int, vector: Sequence[float]) -> None:
+        """Insert or replace the embedding of an item."""
+        vector = normalize_vector(vector)
+        with self._lock:
+            if self._dim is None:
+                self._dim = len(vector)
+            elif len(vector) != self._dim:
+                raise ValueError(f"Embedding has {len(vector)} dimensions, index has {self._dim}")
+
+            row = self._rows.get(item_id)
+            if row is None:
+                self._reserve(self._size + 1)
+                row = self._size
+                self._size += 1
+                self._rows[item_id] = row
+                self._ids[row] = item_id
+            else:
+                self._owner_items[int(self._owners[row])].discard(item_id)
+            self._vectors[row] = vector
+            self._owners[row] = owner_id
+            self._owner_items.setdefault(owner_id, set()).add(item_id)
+
+    def remove(self, item_id: int) -> bool:
+        """Drop an item; the last row moves into its place."""
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return False
+            owner_items = self._owner_items[int(self._owners[row])]
+            owner_items.discard(item_id)
+            if not owner_items:
+                del self._owner_items[int(self._owners[row])]
+
+            last = self._size - 1
+            if row != last:
+                moved = int(self._ids[last])
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = moved
+                self._owners[row] = self._owners[last]
+                self._rows[moved] = row
+            self._size = last
+            return True
+
+    def search(
+        self,
+        vector: Sequence[float],
+        owner_id: Optional[int] = None,
+        threshold: float = -1.0,
+        k: int = 10,
+        exclude: Iterable[int] = ()
+    ) -> List[Tuple[int, float]]:
+        """
+        Most similar items, as (item_id, cosine similarity), best first.
+
+        Args:
+            vector: query embedding (normalized here)
+            owner_id: only items of this owner
+            threshold: minimum similarity
+            k: maximum number of results
+            exclude: item ids to skip (e.g. the query item itself)
+        """
+        query = normalize_vector(vector)
+        excluded = set(exclude)
+        with self._lock:
+            if not self._size or len(query) != self._dim:
+                return []
+            if owner_id is None:
+                rows = np.arange(self._size)
+            else:
+                rows = np.fromiter(
+                    (self._rows[item_id] for item_id in self._owner_items.get(owner_id, ())),
+                    dtype=np.int64,
+                )
+                if not len(rows):
+                    return []
+            similarities = self._vectors[rows] @ query
+            ids = self._ids[rows]
+
+        candidates = np.flatnonzero(similarities >= threshold)
+        if len(candidates) > k + len(excluded):
+            top = np.argpartition(-similarities[candidates], k + len(excluded) - 1)[:k + len(excluded)]
+            candidates = candidates[top]
+        ranked = sorted(
+            ((int(ids[i]), float(similarities[i])) for i in candidates if int(ids[i]) not in excluded),
+            key=lambda pair: pair[1],
+            reverse=True,
+        )
+        return ranked[:k]
+
+    def save(self, path) -> None:
+        """
+        Write the index atomically (temporary file + rename). Each call writes
+        its own temporary file, so concurrent saves never interleave.
+        """
+        path = Path(path)
+        with self._lock:
+            size = self._size
+            dim = self._dim or 0
+            vectors = self._vectors[:size].copy() if size else np.empty((0, dim), dtype=np.float32)
+            ids = self._ids[:size].copy()
+            owners = self._owners[:size].copy()
+            last_id = self.last_id
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    vectors=vectors,
+                    ids=ids,
+                    owners=owners,
+                    last_id=np.int64(last_id),
+                    model_version=np.array(self.model_version),
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path, model_version: Optional[str] = None) -> Optional["VectorIndex"]:
+        """
+        Read a saved index. Returns None if the file is missing, unreadable or
+        was built for another model version.
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                saved_version = str(data["model_version"])
+                if model_version is not None and saved_version != model_version:
+                    logger.info(f"Ignoring vector index {path}: built for model {saved_version}, current is {model_version}")
+                    return None
+                vectors, ids, owners = data["vectors"], data["ids"], data["owners"]
+                index = cls(saved_version, dim=vectors.shape[1] if len(vectors) else None)
+                index.last_id = int(data["last_id"])
+        except Exception as e:
+            logger.warning(f"Could not load vector index {path}: {e}")
+            return None
+
+        if len(ids):
+            index._reserve(len(ids))
+            index._vectors[:len(ids)] = vectors
+            index._ids[:len(ids)] = ids
+            index._owners[:len(ids)] = owners
+            index._size = len(ids)
+            for row, (item_id, owner_id) in enumerate(zip(ids.tolist(), owners.tolist())):
+                index._rows[item_id] = row
+                index._owner_items.setdefault(owner_id, set()).add(item_id)
+        return index
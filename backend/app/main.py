@@ -1,80 +1,89 @@
 from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, JSONResponse
+from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from app.core.config import settings
+from app.core.cors import CORSMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.security import PasswordHasherBusy, shutdown_password_hasher
 from app.api.v1.api import api_router
-from pathlib import Path
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 import traceback
 
+
+def start_background_tasks():
+    """Notification dispatcher, retention job, session deny-list sync, Telegram delivery and moderation jobs"""
+    tasks = []
+    if settings.NOTIFICATION_DISPATCHER_ENABLED:
+        from app.services.notification_dispatcher import run_dispatcher
+        tasks.append(asyncio.create_task(run_dispatcher()))
+    if settings.NOTIFICATION_RETENTION_ENABLED:
+        from app.services.notification_retention import run_retention_job
+        tasks.append(asyncio.create_task(run_retention_job()))
+    if settings.SESSION_DENYLIST_SYNC_ENABLED:
+        from app.services.session_service import run_session_sync
+        tasks.append(asyncio.create_task(run_session_sync()))
+    if settings.TELEGRAM_BOT_TOKEN:
+        from app.services.telegram_delivery import run_telegram_delivery
+        tasks.append(asyncio.create_task(run_telegram_delivery()))
+    if settings.AI_MODERATION_ENABLED and settings.MODERATION_JOBS_ENABLED:
+        from app.services.moderation_jobs import run_moderation_jobs
+        tasks.append(asyncio.create_task(run_moderation_jobs()))
+    return tasks
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Общие клиенты (HTTP, S3, БД), фоновые задачи и загрузка модели модерации.
+
+    Модель загружается и прогревается в фоне: приложение принимает запросы сразу,
+    готовность зависимостей показывает /ready.
+    """
+    from app.core.ai_service import close_batcher, prepare_predictor
+    from app.core.database import engine
+    from app.core.http_client import close_http_session
+    from app.core.readiness import ReadinessProbe
+    from app.core.s3 import close_s3_client, get_s3_client
+    from app.services.duplicates import save_duplicate_index
+
+    if settings.AWS_S3_BUCKET:
+        await asyncio.to_thread(get_s3_client)
+    app.state.readiness = ReadinessProbe()
+    app.state.background_tasks = start_background_tasks()
+    app.state.background_tasks.append(asyncio.create_task(prepare_predictor()))
+    try:
+        yield
+    finally:
+        for task in app.state.background_tasks:
+            task.cancel()
+        await asyncio.gather(*app.state.background_tasks, return_exceptions=True)
+        await asyncio.to_thread(save_duplicate_index, True)
+        await close_batcher()
+        await close_http_session()
+        close_s3_client()
+        shutdown_password_hasher()
+        engine.dispose()
+
+
 app = FastAPI(
     title="Bazaar MTUCI API",
     description="Сервис аренды вещей для общежития МТУСИ",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Расширяем список разрешенных origins для поддержки localhost, 0.0.0.0 и 127.0.0.1
-cors_origins_extended = list(settings.cors_origins_list)
-for origin in list(settings.cors_origins_list):
-    # Добавляем варианты с 0.0.0.0 и 127.0.0.1 для каждого localhost origin
-    if "localhost" in origin:
-        cors_origins_extended.append(origin.replace("localhost", "0.0.0.0"))
-        cors_origins_extended.append(origin.replace("localhost", "127.0.0.1"))
-    elif "0.0.0.0" in origin:
-        cors_origins_extended.append(origin.replace("0.0.0.0", "localhost"))
-        cors_origins_extended.append(origin.replace("0.0.0.0", "127.0.0.1"))
-    elif "127.0.0.1" in origin:
-        cors_origins_extended.append(origin.replace("127.0.0.1", "localhost"))
-        cors_origins_extended.append(origin.replace("127.0.0.1", "0.0.0.0"))
+# Внутренний слой: ответы 429 проходят через CORS, как и остальные
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
 
+# Варианты localhost / 127.0.0.1 / 0.0.0.0; любые порты этих хостов - только с CORS_ALLOW_DEV_ORIGINS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=cors_origins_extended,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-    allow_headers=["*"],
-    expose_headers=["*"],
+    allow_origins=settings.cors_origins_list,
+    allow_dev_origins=settings.CORS_ALLOW_DEV_ORIGINS,
 )
 
-@app.middleware("http")
-async def cors_handler(request: Request, call_next):
-    if request.method == "OPTIONS":
-        # Always return 200 for OPTIONS preflight requests
-        origin = request.headers.get("origin")
-        response = Response(status_code=200)
-        
-        # Нормализуем origin (0.0.0.0 и 127.0.0.1 эквивалентны localhost)
-        normalized_origin = None
-        if origin:
-            # Заменяем 0.0.0.0 и 127.0.0.1 на localhost для проверки
-            normalized_origin = origin.replace("0.0.0.0", "localhost").replace("127.0.0.1", "localhost")
-        
-        # Проверяем, разрешен ли origin (прямо или после нормализации)
-        is_allowed = False
-        if origin:
-            is_allowed = origin in settings.cors_origins_list
-            if not is_allowed and normalized_origin:
-                is_allowed = normalized_origin in settings.cors_origins_list
-        
-        # Если origin разрешен, устанавливаем заголовки
-        if is_allowed and origin:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-        elif origin and (origin.startswith("http://localhost:") or 
-                        origin.startswith("http://0.0.0.0:") or 
-                        origin.startswith("http://127.0.0.1:")):
-            # Разрешаем localhost, 0.0.0.0 и 127.0.0.1 на любых портах для разработки
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        response.headers["Access-Control-Max-Age"] = "3600"
-        return response
-    response = await call_next(request)
-    return response
-
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     import json
@@ -90,6 +99,15 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors()}
     )
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """Очередь хеширования паролей переполнена - просим клиента повторить позже"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Слишком много попыток входа. Пожалуйста, повторите через несколько секунд."},
+        headers={"Retry-After": "1"},
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Глобальный обработчик исключений для предотвращения падения сервера"""
@@ -115,57 +133,6 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.include_router(api_router, prefix="/api/v1")
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize AI moderation model on startup if enabled"""
-    if settings.AI_MODERATION_ENABLED and settings.AI_MODERATION_MODEL_DIR:
-        try:
-            # Lazy import to avoid requiring torch when AI moderation is disabled
-            try:
-                from app.ai_moderation.model import CLIPModerationModel
-                from app.ai_moderation.predictor import ImageModerationPredictor
-                from app.core.ai_service import initialize_predictor
-            except ImportError as import_error:
-                logger = logging.getLogger(__name__)
-                logger.warning(f"AI moderation dependencies not available: {import_error}")
-                logger.warning("Install torch, transformers, and aiohttp to enable AI moderation")
-                return
-            
-            logger = logging.getLogger(__name__)
-            logger.info("Initializing AI moderation model...")
-            
-            model_dir = Path(settings.AI_MODERATION_MODEL_DIR)
-            if not model_dir.exists():
-                logger.warning(f"AI moderation model directory not found: {model_dir}")
-                return
-            
-            # Initialize model
-            model = CLIPModerationModel(
-                model_dir=model_dir,
-                model_name=settings.AI_MODERATION_MODEL_NAME,
-                device=settings.AI_MODERATION_DEVICE
-            )
-            
-            # Load models
-            model.load_config()
-            model.load_models()
-            
-            # Create predictor and initialize service
-            predictor = ImageModerationPredictor(model)
-            initialize_predictor(predictor)
-            
-            logger.info("✓ AI moderation model loaded successfully")
-        
-        except ImportError as import_error:
-            logger = logging.getLogger(__name__)
-            logger.warning(f"AI moderation dependencies not available: {import_error}")
-            logger.warning("Install torch, transformers, and aiohttp to enable AI moderation")
-        except Exception as e:
-            logger = logging.getLogger(__name__)
-            logger.error(f"Failed to initialize AI moderation model: {e}", exc_info=True)
-            logger.warning("AI moderation will be unavailable, falling back to manual moderation")
-
-
 @app.get("/")
 async def root():
     return {"message": "Bazaar MTUCI API", "version": "1.0.0"}
@@ -175,3 +142,9 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+
+@app.get("/ready")
+async def ready(request: Request):
+    """Готовность к приему трафика: БД и S3 (результаты проверок кэшируются), состояние модели"""
+    result = await request.app.state.readiness.status()
+    return JSONResponse(status_code=200 if result["status"] == "ready" else 503, content=result)
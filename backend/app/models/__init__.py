@@ -3,10 +3,14 @@ from app.models.item import Item
 from app.models.booking import Booking
 from app.models.availability import Availability
 from app.models.report import Report
-from app.models.notification import Notification
+from app.models.notification import Notification, NotificationOutbox, NotificationArchive
 from app.models.favorite import Favorite
+from app.models.user_session import UserSession
+from app.models.moderation_cache import ModerationResult, ModerationImageUrl
+from app.models.moderation_job import ModerationJob
+from app.models.item_embedding import ItemEmbedding
 
-__all__ = ["User", "Item", "Booking", "Availability", "Report", "Notification", "Favorite"]
+__all__ = ["User", "Item", "Booking", "Availability", "Report", "Notification", "NotificationOutbox", "NotificationArchive", "Favorite", "UserSession", "ModerationResult", "ModerationImageUrl", "ModerationJob", "ItemEmbedding"]
 
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Numeric, ForeignKey, Boolean, DateTime, Enum, TypeDecorator
+from sqlalchemy import Column, Integer, String, Text, Numeric, Float, ForeignKey, Boolean, DateTime, Enum, TypeDecorator
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -109,6 +109,11 @@ class Item(Base):
     moderation_comment = Column(Text, nullable=True)
     moderated_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     moderated_at = Column(DateTime(timezone=True), nullable=True)
+    # Результат текстового фильтра (app.core.text_filter): сумма весов и сработавшие категории
+    text_moderation_score = Column(Float, nullable=True)
+    text_moderation_flags = Column(String, nullable=True)
+    # Похоже на другое активное объявление того же владельца (app.services.duplicates)
+    duplicate_of_id = Column(Integer, ForeignKey("items.id", ondelete="SET NULL"), nullable=True)
     view_count = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ItemEmbedding(Base):
+    """Эмбеддинг CLIP изображения объявления (из прогона AI-модерации).
+
+    Источник данных для индекса похожих объявлений (app.services.duplicates):
+    индекс догоняет таблицу по возрастанию id, поэтому при смене изображения
+    строка пересоздается, а не обновляется.
+    """
+    __tablename__ = "item_embeddings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), nullable=False, unique=True)
+    owner_id = Column(Integer, nullable=False, index=True)
+    model_version = Column(String(64), nullable=False, index=True)
+    # Нормализованный эмбеддинг, float32
+    embedding = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Float, DateTime, JSON, LargeBinary
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ModerationResult(Base):
+    """Результат AI-модерации изображения по sha256 его содержимого.
+
+    Действителен только для версии модели, которая его получила, поэтому
+    ключ составной: во время выкатки новой модели строки старой и новой
+    версий для одного изображения живут рядом.
+    """
+    __tablename__ = "moderation_results"
+
+    image_hash = Column(String(64), primary_key=True)
+    model_version = Column(String(64), primary_key=True, index=True)
+    predicted_class = Column(String(50), nullable=False)
+    confidence = Column(Float, nullable=False)
+    probabilities = Column(JSON, nullable=False)
+    # Нормализованный эмбеддинг CLIP, float32
+    embedding = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class ModerationImageUrl(Base):
+    """Индекс URL -> sha256 изображения (ключ - sha256 самого URL)"""
+    __tablename__ = "moderation_image_urls"
+
+    url_hash = Column(String(64), primary_key=True)
+    image_hash = Column(String(64), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
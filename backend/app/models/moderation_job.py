@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Enum, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+import enum
+
+
+class ModerationJobStatus(str, enum.Enum):
+    PENDING = "pending"
+    # Попытки исчерпаны: объявление остается на ручной модерации
+    DEAD = "dead"
+
+
+class ModerationJob(Base):
+    """Задача AI-модерации изображения объявления.
+
+    Создается в одной транзакции с объявлением и удаляется после обработки;
+    в таблице остаются только ожидающие и dead-letter задачи.
+    """
+    __tablename__ = "moderation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="CASCADE"), nullable=False, index=True)
+    image_url = Column(String, nullable=False)
+    category = Column(String(50), nullable=True)
+    status = Column(Enum(ModerationJobStatus), default=ModerationJobStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    # Когда задачу можно взять: время повтора или конец аренды воркером
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_moderation_jobs_status_next_attempt_at", "status", "next_attempt_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -25,9 +25,14 @@ class Notification(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     type = Column(Enum(NotificationType), nullable=False)
-    title = Column(String, nullable=False)
-    message = Column(Text, nullable=False)
+    # Параметры шаблона (компактный JSON); текст собирается при чтении
+    params = Column(Text, nullable=True)
+    # Готовый текст хранится только у записей, созданных до перехода на шаблоны
+    title = Column(String, nullable=True)
+    message = Column(Text, nullable=True)
     is_read = Column(Boolean, default=False, nullable=False, index=True)
+    # Сколько событий объединено в это уведомление (см. notification_service.coalesce_notifications)
+    count = Column(Integer, default=1, nullable=False)
     
     # Связи с другими сущностями (опциональные)
     related_item_id = Column(Integer, ForeignKey("items.id"), nullable=True)
@@ -37,9 +42,65 @@ class Notification(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     read_at = Column(DateTime(timezone=True), nullable=True)
 
+    # Доставка в Telegram (app.services.telegram_delivery)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+    delivery_attempts = Column(Integer, default=0, nullable=False)
+    next_delivery_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Основной запрос: уведомления пользователя (непрочитанные) по убыванию даты
+    __table_args__ = (
+        Index('ix_notifications_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+        Index(
+            'ix_notifications_undelivered',
+            'next_delivery_at',
+            postgresql_where=delivered_at.is_(None),
+        ),
+    )
+
     user = relationship("User", back_populates="notifications")
     related_item = relationship("Item", foreign_keys=[related_item_id])
     related_booking = relationship("Booking", foreign_keys=[related_booking_id])
     related_report = relationship("Report", foreign_keys=[related_report_id])
 
 
+class NotificationOutbox(Base):
+    """Намерение отправить уведомление, записанное в одной транзакции с изменением состояния.
+
+    Диспетчер (app.services.notification_dispatcher) пачками переносит записи
+    в таблицу notifications и удаляет их из outbox.
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    type = Column(Enum(NotificationType), nullable=False)
+    params = Column(Text, nullable=False, default="{}")
+    related_item_id = Column(Integer, nullable=True)
+    related_booking_id = Column(Integer, nullable=True)
+    related_report_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class NotificationArchive(Base):
+    """Холодное хранилище прочитанных уведомлений старше срока хранения.
+
+    В PostgreSQL таблица секционирована по месяцам created_at (секции создает
+    задача архивации), поэтому первичный ключ включает created_at.
+    Внешних ключей нет: связанные сущности могут быть удалены раньше архива.
+    """
+    __tablename__ = "notifications_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime(timezone=True), primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    type = Column(Enum(NotificationType), nullable=False)
+    params = Column(Text, nullable=True)
+    title = Column(String, nullable=True)
+    message = Column(Text, nullable=True)
+    is_read = Column(Boolean, nullable=False)
+    count = Column(Integer, nullable=False, default=1)
+    related_item_id = Column(Integer, nullable=True)
+    related_booking_id = Column(Integer, nullable=True)
+    related_report_id = Column(Integer, nullable=True)
+    read_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -25,6 +25,8 @@ class User(Base):
     telegram_id = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     role = Column(Enum(UserRole), default=UserRole.USER, nullable=False)
+    # Повышается при смене роли и деактивации: токены со старой версией отклоняются
+    auth_version = Column(Integer, default=1, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -32,5 +34,6 @@ class User(Base):
     bookings = relationship("Booking", back_populates="renter", foreign_keys="Booking.renter_id")
     notifications = relationship("Notification", back_populates="user", cascade="all, delete-orphan")
     favorites = relationship("Favorite", back_populates="user", cascade="all, delete-orphan")
+    sessions = relationship("UserSession", back_populates="user", cascade="all, delete-orphan")
 
 
@@ -47,6 +47,9 @@ class ItemInDB(ItemBase):
     moderation_comment: Optional[str] = None
     moderated_by_id: Optional[int] = None
     moderated_at: Optional[datetime] = None
+    text_moderation_score: Optional[float] = None
+    text_moderation_flags: Optional[str] = None
+    duplicate_of_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
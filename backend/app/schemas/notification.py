@@ -21,6 +21,7 @@ class NotificationInDB(NotificationBase):
     id: int
     user_id: int
     is_read: bool
+    count: int = 1
     related_item_id: Optional[int] = None
     related_booking_id: Optional[int] = None
     related_report_id: Optional[int] = None
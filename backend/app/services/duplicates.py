@@ -0,0 +1,219 @@
+"""
+Поиск повторно выложенных объявлений по изображению.
+
+Прогон AI-модерации уже дает нормализованный эмбеддинг CLIP изображения;
+воркер модерации сохраняет его в item_embeddings и ищет в индексе
+(app.core.vector_index) похожие активные объявления того же владельца.
+Найденное повторение записывается в items.duplicate_of_id и, в зависимости
+от DUPLICATE_ACTION, либо оставляет объявление модератору (flag), либо
+отклоняет его (reject).
+
+Индекс живет в памяти процесса воркера. Таблица item_embeddings - источник
+истины: индекс догоняет ее по возрастанию id (так в нем оказываются и
+эмбеддинги, записанные воркерами других процессов) и периодически
+сохраняется в DUPLICATE_INDEX_PATH, чтобы после перезапуска дочитывать только
+новые строки. Файл общий для воркеров gunicorn, поэтому на PostgreSQL снимок
+пишет только процесс, получивший advisory-блокировку. Удаленные и деактивированные объявления отсеиваются проверкой
+по базе.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.item import Item as ItemModel, ModerationStatus
+from app.models.item_embedding import ItemEmbedding
+from app.services.moderation_cache import pack_embedding
+
+logger = logging.getLogger(__name__)
+
+# Строки моложе этого могли закоммититься не в порядке id: отметка синхронизации их не перешагивает
+_SYNC_LAG_SECONDS = 30.0
+_SYNC_CHUNK = 1000
+_CANDIDATES = 5
+# Ключ advisory-блокировки PostgreSQL на запись снимка индекса
+_SAVE_LOCK_KEY = 7012050
+
+_lock = threading.Lock()
+_index = None
+_dirty = False
+_saved_at = 0.0
+
+
+def _model_version() -> str:
+    from app.core.ai_service import get_predictor
+
+    return getattr(get_predictor(), "model_version", "unknown")
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _load_index(db: Session, model_version: str):
+    from app.core.vector_index import VectorIndex
+
+    index = None
+    if settings.DUPLICATE_INDEX_PATH:
+        index = VectorIndex.load(settings.DUPLICATE_INDEX_PATH, model_version)
+    if index is None:
+        logger.info("Индекс похожих объявлений строится из базы")
+        return VectorIndex(model_version)
+
+    # Объявления, удаленные после сохранения снимка
+    known = set(db.execute(
+        select(ItemEmbedding.item_id).where(ItemEmbedding.model_version == model_version)
+    ).scalars())
+    stale = [item_id for item_id in index.ids() if item_id not in known]
+    for item_id in stale:
+        index.remove(item_id)
+    logger.info(f"Индекс похожих объявлений загружен: {len(index)} объявлений, удалено устаревших {len(stale)}")
+    return index
+
+
+def _sync(db: Session, index) -> None:
+    """Добавляет в индекс строки item_embeddings, появившиеся после index.last_id"""
+    import numpy as np
+
+    global _dirty
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=_SYNC_LAG_SECONDS)
+    after = index.last_id
+    watermark = True
+    while True:
+        rows = db.execute(
+            select(
+                ItemEmbedding.id,
+                ItemEmbedding.item_id,
+                ItemEmbedding.owner_id,
+                ItemEmbedding.embedding,
+                ItemEmbedding.created_at,
+            )
+            .where(ItemEmbedding.model_version == index.model_version, ItemEmbedding.id > after)
+            .order_by(ItemEmbedding.id)
+            .limit(_SYNC_CHUNK)
+        ).all()
+        for row in rows:
+            index.add(row.item_id, row.owner_id, np.frombuffer(row.embedding, dtype=np.float32))
+            if watermark and _as_utc(row.created_at) <= cutoff:
+                index.last_id = row.id
+            else:
+                watermark = False
+        if rows:
+            _dirty = True
+        if len(rows) < _SYNC_CHUNK:
+            return
+        after = rows[-1].id
+
+
+def get_duplicate_index(db: Session):
+    """Индекс текущей версии модели, догнанный до таблицы item_embeddings"""
+    global _index
+    version = _model_version()
+    with _lock:
+        if _index is None or _index.model_version != version:
+            _index = _load_index(db, version)
+        _sync(db, _index)
+        return _index
+
+
+def reset_duplicate_index() -> None:
+    global _index, _dirty
+    with _lock:
+        _index = None
+        _dirty = False
+
+
+def store_item_embedding(db: Session, item: ItemModel, embedding: Sequence[float]) -> None:
+    """Сохраняет эмбеддинг изображения объявления (в текущей транзакции)"""
+    db.execute(delete(ItemEmbedding).where(ItemEmbedding.item_id == item.id))
+    db.add(ItemEmbedding(
+        item_id=item.id,
+        owner_id=item.owner_id,
+        model_version=_model_version(),
+        embedding=pack_embedding(embedding),
+    ))
+
+
+def find_duplicate(db: Session, item: ItemModel, embedding: Sequence[float]) -> Optional[Tuple[ItemModel, float]]:
+    """Самое похожее активное объявление того же владельца выше порога и сходство с ним"""
+    matches = get_duplicate_index(db).search(
+        embedding,
+        owner_id=item.owner_id,
+        threshold=settings.DUPLICATE_SIMILARITY_THRESHOLD,
+        k=_CANDIDATES,
+        exclude=(item.id,),
+    )
+    if not matches:
+        return None
+
+    similarity = dict(matches)
+    candidates = db.query(ItemModel).filter(
+        ItemModel.id.in_(list(similarity)),
+        ItemModel.owner_id == item.owner_id,
+        ItemModel.is_active.is_(True),
+        ItemModel.moderation_status != ModerationStatus.REJECTED,
+    ).all()
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda candidate: similarity[candidate.id])
+    return best, similarity[best.id]
+
+
+def remember_embedding(item_id: int, owner_id: int, embedding: Sequence[float]) -> None:
+    """Сразу добавляет закоммиченный эмбеддинг в индекс, не дожидаясь синхронизации"""
+    global _dirty
+    index = _index
+    if index is not None and index.model_version == _model_version():
+        index.add(item_id, owner_id, embedding)
+        _dirty = True
+
+
+def duplicate_comment(original: ItemModel) -> str:
+    return f"Повтор объявления «{original.title}»"
+
+
+def _write_snapshot(index) -> bool:
+    """Пишет снимок, если его сейчас не пишет другой процесс"""
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            locked = db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _SAVE_LOCK_KEY}
+            ).scalar()
+            if not locked:
+                return False
+        index.save(settings.DUPLICATE_INDEX_PATH)
+        return True
+    finally:
+        # Конец транзакции снимает блокировку
+        db.rollback()
+        db.close()
+
+
+def save_duplicate_index(force: bool = False) -> bool:
+    """Сохраняет снимок индекса, если он изменился (не чаще DUPLICATE_INDEX_SAVE_INTERVAL_SECONDS)"""
+    global _dirty, _saved_at
+    index = _index
+    if not settings.DUPLICATE_INDEX_PATH or index is None or not _dirty:
+        return False
+    if not force and time.monotonic() - _saved_at < settings.DUPLICATE_INDEX_SAVE_INTERVAL_SECONDS:
+        return False
+
+    _dirty = False
+    _saved_at = time.monotonic()
+    try:
+        saved = _write_snapshot(index)
+    except Exception as e:
+        _dirty = True
+        logger.error(f"Не удалось сохранить индекс похожих объявлений: {e}")
+        return False
+    if not saved:
+        # Снимок пишет другой процесс; свой попробуем сохранить в следующий раз
+        _dirty = True
+    return saved
@@ -0,0 +1,210 @@
+"""
+Кэш результатов AI-модерации по содержимому изображения.
+
+Ключ - sha256 байтов изображения, поэтому повторная загрузка той же
+фотографии и повторная проверка при создании объявления не требуют
+инференса. Дополнительный индекс URL -> sha256 позволяет не скачивать
+изображение повторно.
+
+Два уровня: LRU в памяти процесса и таблицы moderation_results /
+moderation_image_urls, общие для всех воркеров. Результат хранится вместе с
+эмбеддингом CLIP и версией модели (ключ строки - хэш и версия); записи другой
+версии не используются, а purge_other_versions() при загрузке новой модели
+удаляет записи версий, которые больше не работают. Ошибки базы не ломают
+модерацию: кэш просто пропускается.
+"""
+import asyncio
+import hashlib
+import logging
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.auth_cache import LRUCache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.moderation_cache import ModerationImageUrl, ModerationResult
+
+logger = logging.getLogger(__name__)
+
+
+def hash_image(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hash_url(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def pack_embedding(embedding) -> Optional[bytes]:
+    return array("f", embedding).tobytes() if embedding is not None else None
+
+
+def unpack_embedding(data: Optional[bytes]):
+    if data is None:
+        return None
+    values = array("f")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class ModerationCache:
+    """Кэш предсказаний для одной версии модели"""
+
+    def __init__(
+        self,
+        model_version: str,
+        session_factory: Callable[[], Session] = SessionLocal,
+        maxsize: int = None,
+        ttl: float = None,
+        url_ttl: float = None,
+    ):
+        self.model_version = model_version
+        self.session_factory = session_factory
+        self.ttl = settings.AI_MODERATION_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.url_ttl = settings.AI_MODERATION_CACHE_URL_TTL_SECONDS if url_ttl is None else url_ttl
+        maxsize = maxsize or settings.AI_MODERATION_CACHE_SIZE
+        # image hash -> prediction
+        self._results = LRUCache(maxsize)
+        # url -> image hash
+        self._urls = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    # --- уровень базы данных (вызывается в потоке) ---
+
+    def _load(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            row = db.execute(
+                select(ModerationResult).where(
+                    ModerationResult.image_hash == image_hash,
+                    ModerationResult.model_version == self.model_version,
+                )
+            ).scalar_one_or_none()
+            if row is None:
+                return None
+            return {
+                "predicted_class": row.predicted_class,
+                "confidence": row.confidence,
+                "probabilities": row.probabilities,
+                "processing_time_ms": 0,
+                "embedding": unpack_embedding(row.embedding),
+            }
+        finally:
+            db.close()
+
+    def _load_url(self, url: str) -> Optional[str]:
+        db = self.session_factory()
+        try:
+            since = datetime.now(timezone.utc) - timedelta(seconds=self.url_ttl)
+            return db.execute(
+                select(ModerationImageUrl.image_hash).where(
+                    ModerationImageUrl.url_hash == _hash_url(url),
+                    ModerationImageUrl.created_at >= since,
+                )
+            ).scalar_one_or_none()
+        finally:
+            db.close()
+
+    def _store(self, image_hash: str, prediction: Dict[str, Any], url: Optional[str]) -> None:
+        db = self.session_factory()
+        try:
+            if prediction is not None:
+                db.merge(ModerationResult(
+                    image_hash=image_hash,
+                    model_version=self.model_version,
+                    predicted_class=prediction["predicted_class"],
+                    confidence=prediction["confidence"],
+                    probabilities=prediction["probabilities"],
+                    embedding=pack_embedding(prediction.get("embedding")),
+                    created_at=datetime.now(timezone.utc),
+                ))
+            if url is not None:
+                db.merge(ModerationImageUrl(
+                    url_hash=_hash_url(url),
+                    image_hash=image_hash,
+                    created_at=datetime.now(timezone.utc),
+                ))
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_other_versions(self) -> int:
+        """Удаляет результаты других версий модели, которые больше не используются.
+
+        Версия считается выведенной, если она ничего не записывала
+        AI_MODERATION_CACHE_PURGE_AFTER_SECONDS: пока идет выкатка, воркеры
+        со старой моделью продолжают пользоваться своими строками.
+        Возвращает число удаленных строк.
+        """
+        db = self.session_factory()
+        try:
+            since = datetime.now(timezone.utc) - timedelta(seconds=settings.AI_MODERATION_CACHE_PURGE_AFTER_SECONDS)
+            retired = (
+                select(ModerationResult.model_version)
+                .where(ModerationResult.model_version != self.model_version)
+                .group_by(ModerationResult.model_version)
+                .having(func.max(ModerationResult.created_at) < since)
+            )
+            result = db.execute(
+                delete(ModerationResult).where(ModerationResult.model_version.in_(retired))
+            )
+            db.commit()
+            return result.rowcount or 0
+        finally:
+            db.close()
+
+    # --- асинхронный интерфейс ---
+
+    async def get(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        prediction = self._results.get(image_hash)
+        if prediction is None:
+            try:
+                prediction = await asyncio.to_thread(self._load, image_hash)
+            except Exception as e:
+                logger.warning(f"Кэш модерации недоступен: {e}")
+                prediction = None
+            if prediction is not None:
+                self._results.set(image_hash, prediction, self.ttl)
+        if prediction is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(prediction)
+
+    async def get_by_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """Результат для изображения по URL, если это изображение уже проверялось"""
+        image_hash = self._urls.get(url)
+        if image_hash is None:
+            try:
+                image_hash = await asyncio.to_thread(self._load_url, url)
+            except Exception as e:
+                logger.warning(f"Кэш модерации недоступен: {e}")
+                return None
+            if image_hash is None:
+                return None
+            self._urls.set(url, image_hash, self.url_ttl)
+        return await self.get(image_hash)
+
+    async def put(self, image_hash: str, prediction: Optional[Dict[str, Any]], url: Optional[str] = None) -> None:
+        """Сохраняет предсказание и/или связь URL -> hash (prediction=None - только связь)"""
+        if prediction is not None:
+            self._results.set(image_hash, prediction, self.ttl)
+        if url is not None:
+            self._urls.set(url, image_hash, self.url_ttl)
+        try:
+            await asyncio.to_thread(self._store, image_hash, prediction, url)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить результат модерации в кэш: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self._results),
+            "model_version": self.model_version[:12],
+        }
@@ -0,0 +1,295 @@
+"""
+Фоновая AI-модерация объявлений.
+
+Объявление сохраняется сразу со статусом PENDING, а в той же транзакции
+создается задача moderation_jobs. Воркер пачками забирает задачи (аренда
+через next_attempt_at, на PostgreSQL - SKIP LOCKED), проверяет изображения
+через ai_service (запросы одной пачки объединяются батчером в общий прогон
+модели) и применяет те же правила, что и раньше при создании объявления:
+уверенное одобрение или отклонение меняет статус и создает уведомление
+владельцу, остальное остается ручной модерации. Объявление с подозрительным
+текстом (app.services.text_moderation) автоматически не одобряется, как и
+повтор другого объявления того же владельца (app.services.duplicates) -
+эмбеддинг изображения из того же прогона модели сохраняется для этого поиска.
+
+Ошибки (недоступное изображение, сбой модели) повторяются с экспоненциальной
+задержкой; после MODERATION_JOB_MAX_ATTEMPTS задача переходит в DEAD и
+объявление ждет модератора. Пока модель не готова или ее очередь переполнена,
+задачи откладываются без траты попыток.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.item import Item as ItemModel, ModerationStatus
+from app.models.moderation_job import ModerationJob, ModerationJobStatus
+from app.services.notification_service import create_item_approved_notification, create_item_rejected_notification
+from app.services.duplicates import (
+    duplicate_comment,
+    find_duplicate,
+    remember_embedding,
+    save_duplicate_index,
+    store_item_embedding,
+)
+from app.services.text_moderation import needs_manual_review
+
+logger = logging.getLogger(__name__)
+
+REJECTION_REASONS = {
+    "rejected_nsfw": "Неприемлемое содержимое (NSFW)",
+    "rejected_violence": "Насилие или оружие",
+    "rejected_spam": "Спам или реклама",
+}
+
+# Модель не готова или занята: задача не виновата, попытка не засчитывается
+_POSTPONE_REASONS = ("model_not_loaded", "queue_full")
+_POSTPONE_SECONDS = 5.0
+
+Moderate = Callable[..., Awaitable[Dict[str, Any]]]
+
+
+def rejection_reason(reason: str) -> str:
+    return REJECTION_REASONS.get(reason, "Неприемлемое содержимое")
+
+
+def decide_moderation_status(result: Dict[str, Any]) -> Optional[ModerationStatus]:
+    """Статус по результату AI-модерации; None - решение за модератором.
+
+    Пороги уже применены в ai_service.auto_moderation_status, здесь решение
+    только переводится в статус объявления.
+    """
+    if not result.get("auto_action"):
+        return None
+    if result["status"] == "approved":
+        return ModerationStatus.APPROVED
+    if result["status"] == "rejected":
+        return ModerationStatus.REJECTED
+    return None
+
+
+def enqueue_moderation_job(db: Session, item: ItemModel) -> ModerationJob:
+    """Добавляет задачу модерации изображения объявления в текущую транзакцию"""
+    job = ModerationJob(
+        item_id=item.id,
+        image_url=item.image_url,
+        category=item.category.value if item.category else None,
+        status=ModerationJobStatus.PENDING,
+        attempts=0,
+    )
+    db.add(job)
+    return job
+
+
+def requeue_dead_job(db: Session, job: ModerationJob) -> None:
+    """Возвращает задачу из dead-letter в очередь с чистым счетчиком попыток"""
+    job.status = ModerationJobStatus.PENDING
+    job.attempts = 0
+    job.next_attempt_at = None
+    job.last_error = None
+
+
+def retry_delay(attempts: int) -> float:
+    """Экспоненциальная задержка перед повтором (с небольшим разбросом)"""
+    delay = min(
+        settings.MODERATION_JOB_RETRY_BASE_SECONDS * (2 ** attempts),
+        settings.MODERATION_JOB_RETRY_MAX_SECONDS,
+    )
+    return delay * random.uniform(1.0, 1.2)
+
+
+class ModerationJobWorker:
+    """Пакетная обработка задач модерации"""
+
+    def __init__(self, moderate: Optional[Moderate] = None, session_factory: Callable[[], Session] = SessionLocal):
+        if moderate is None:
+            from app.core.ai_service import moderate_image_auto
+            moderate = moderate_image_auto
+        self.moderate = moderate
+        self.session_factory = session_factory
+
+    def _claim(self, now: datetime) -> List[Tuple[int, int, str, Optional[str]]]:
+        """Забирает пачку задач и продлевает их аренду на время проверки.
+
+        Возвращает (id, attempts, image_url, category).
+        """
+        db = self.session_factory()
+        try:
+            query = (
+                select(ModerationJob)
+                .where(
+                    ModerationJob.status == ModerationJobStatus.PENDING,
+                    (ModerationJob.next_attempt_at.is_(None)) | (ModerationJob.next_attempt_at <= now),
+                )
+                .order_by(ModerationJob.id)
+                .limit(settings.MODERATION_JOB_BATCH_SIZE)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+            jobs = db.execute(query).scalars().all()
+            if not jobs:
+                db.rollback()
+                return []
+
+            batch = [(job.id, job.attempts, job.image_url, job.category) for job in jobs]
+            db.execute(
+                update(ModerationJob)
+                .where(ModerationJob.id.in_([job.id for job in jobs]))
+                .values(next_attempt_at=now + timedelta(seconds=settings.MODERATION_JOB_LEASE_SECONDS)),
+                execution_options={"synchronize_session": False},
+            )
+            db.commit()
+            return batch
+        finally:
+            db.close()
+
+    def _apply(
+        self,
+        job_id: int,
+        image_url: str,
+        decision: Optional[ModerationStatus],
+        reason: str,
+        embedding: Optional[List[float]] = None
+    ) -> None:
+        """Применяет решение к объявлению и удаляет задачу (одна транзакция с уведомлением)"""
+        db = self.session_factory()
+        try:
+            job = db.get(ModerationJob, job_id)
+            if job is None:
+                return
+            item = db.get(ItemModel, job.item_id)
+            # Объявление удалено или сменило изображение
+            same_image = item is not None and item.image_url == image_url
+            # ... или уже проверено модератором
+            current = same_image and item.moderation_status == ModerationStatus.PENDING
+            # Чистое изображение не перекрывает подозрительный текст
+            if current and decision == ModerationStatus.APPROVED and needs_manual_review(item):
+                decision = None
+
+            comment = None
+            indexed = None
+            if same_image and embedding is not None and settings.DUPLICATE_DETECTION_ENABLED:
+                # Одобренные модератором объявления тоже попадают в индекс: их повторы ищутся
+                store_item_embedding(db, item, embedding)
+                indexed = (item.id, item.owner_id)
+                duplicate = find_duplicate(db, item, embedding) if current else None
+                if duplicate is not None:
+                    original, similarity = duplicate
+                    logger.info(f"Объявление {item.id} похоже на {original.id} (сходство {similarity:.3f})")
+                    item.duplicate_of_id = original.id
+                    if settings.DUPLICATE_ACTION == "reject":
+                        decision, comment = ModerationStatus.REJECTED, duplicate_comment(original)
+                    elif decision == ModerationStatus.APPROVED:
+                        decision = None
+            if current and decision == ModerationStatus.APPROVED:
+                item.moderation_status = ModerationStatus.APPROVED
+                item.moderated_by_id = None
+                item.moderated_at = datetime.utcnow()
+                item.moderation_comment = None
+                create_item_approved_notification(
+                    db=db,
+                    owner_id=item.owner_id,
+                    item_id=item.id,
+                    item_title=item.title,
+                )
+            elif current and decision == ModerationStatus.REJECTED:
+                comment = comment or rejection_reason(reason)
+                item.moderation_status = ModerationStatus.REJECTED
+                item.moderated_by_id = None
+                item.moderated_at = datetime.utcnow()
+                item.moderation_comment = comment
+                item.is_active = False
+                create_item_rejected_notification(
+                    db=db,
+                    owner_id=item.owner_id,
+                    item_id=item.id,
+                    item_title=item.title,
+                    comment=comment,
+                )
+            db.delete(job)
+            db.commit()
+            if indexed is not None:
+                remember_embedding(*indexed, embedding)
+        finally:
+            db.close()
+
+    def _reschedule(self, job_id: int, attempts: int, error: Optional[str], delay: float) -> None:
+        """Переносит задачу; attempts - новое число попыток, по исчерпании задача уходит в DEAD"""
+        db = self.session_factory()
+        try:
+            values: Dict[str, Any] = {"attempts": attempts, "last_error": error}
+            if attempts >= settings.MODERATION_JOB_MAX_ATTEMPTS:
+                logger.warning(f"Задача модерации {job_id} переведена в dead-letter после {attempts} попыток: {error}")
+                values.update(status=ModerationJobStatus.DEAD, next_attempt_at=None)
+            else:
+                values["next_attempt_at"] = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            db.execute(
+                update(ModerationJob).where(ModerationJob.id == job_id).values(**values),
+                execution_options={"synchronize_session": False},
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _process(self, job: Tuple[int, int, str, Optional[str]]) -> None:
+        job_id, attempts, image_url, category = job
+        try:
+            result = await self.moderate(
+                image_url=image_url,
+                category=category,
+                min_confidence_for_rejection=settings.AI_MODERATION_AUTO_REJECT_CONFIDENCE,
+            )
+        except Exception as e:
+            result = {"status": "pending", "reason": "error", "error": str(e)}
+
+        reason = result.get("reason")
+        if reason in _POSTPONE_REASONS:
+            await asyncio.to_thread(self._reschedule, job_id, attempts, None, _POSTPONE_SECONDS)
+        elif reason == "error":
+            await asyncio.to_thread(self._reschedule, job_id, attempts + 1, result.get("error"), retry_delay(attempts))
+        else:
+            try:
+                await asyncio.to_thread(
+                    self._apply, job_id, image_url, decide_moderation_status(result), reason, result.get("embedding")
+                )
+            except Exception as e:
+                # Ошибка записи решения тратит попытку, иначе задача возвращалась бы после каждой аренды
+                logger.error(f"Не удалось применить решение по задаче модерации {job_id}: {e}", exc_info=True)
+                await asyncio.to_thread(self._reschedule, job_id, attempts + 1, str(e), retry_delay(attempts))
+
+    async def process_once(self) -> int:
+        """Обрабатывает одну пачку. Возвращает размер пачки."""
+        batch = await asyncio.to_thread(self._claim, datetime.now(timezone.utc))
+        if batch:
+            results = await asyncio.gather(*(self._process(job) for job in batch), return_exceptions=True)
+            for (job_id, *_), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Ошибка обработки задачи модерации {job_id}: {result}")
+        return len(batch)
+
+    async def run(self) -> None:
+        """Фоновый цикл; пока модель загружается, задачи не берутся"""
+        from app.core.ai_service import get_model_state
+
+        while True:
+            try:
+                if get_model_state() == "ready":
+                    processed = await self.process_once()
+                    await asyncio.to_thread(save_duplicate_index)
+                    if processed >= settings.MODERATION_JOB_BATCH_SIZE:
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка воркера модерации: {str(e)}", exc_info=True)
+            await asyncio.sleep(settings.MODERATION_JOB_INTERVAL_SECONDS)
+
+
+async def run_moderation_jobs() -> None:
+    await ModerationJobWorker().run()
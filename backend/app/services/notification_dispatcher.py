@@ -0,0 +1,113 @@
+"""
+Диспетчер outbox-уведомлений.
+
+Переносит записи из notification_outbox в notifications пачками (одним
+многострочным INSERT). Всплески однотипных событий по одному объявлению
+перед вставкой объединяются (notification_service.coalesce_notifications).
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.notification import Notification as NotificationModel, NotificationOutbox
+from app.services.notification_service import coalesce_notifications
+
+logger = logging.getLogger(__name__)
+
+_NOTIFICATION_FIELDS = (
+    "id",
+    "user_id",
+    "type",
+    "params",
+    "is_read",
+    "count",
+    "related_item_id",
+    "related_booking_id",
+    "related_report_id",
+    "created_at",
+    "read_at",
+)
+
+
+class DispatchResult(NamedTuple):
+    """consumed - разобрано записей outbox; notifications - созданные и дополненные уведомления"""
+    consumed: int
+    notifications: List[Dict[str, Any]]
+
+
+def dispatch_pending(db: Session, batch_size: int = None) -> DispatchResult:
+    """Материализует одну пачку записей outbox в уведомления.
+
+    Уведомления возвращаются словарями (данные сняты до коммита, дополнительных
+    запросов не нужно). После объединения их может быть меньше, чем разобранных
+    записей: продолжать ли разбор, решает consumed.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_DISPATCH_BATCH_SIZE
+
+    query = select(NotificationOutbox).order_by(NotificationOutbox.id).limit(batch_size)
+    if db.get_bind().dialect.name == "postgresql":
+        # Несколько воркеров могут разбирать outbox параллельно
+        query = query.with_for_update(skip_locked=True)
+    entries = db.scalars(query).all()
+    if not entries:
+        db.rollback()
+        return DispatchResult(0, [])
+
+    rows = [
+        {
+            "user_id": entry.user_id,
+            "type": entry.type,
+            "params": entry.params,
+            "related_item_id": entry.related_item_id,
+            "related_booking_id": entry.related_booking_id,
+            "related_report_id": entry.related_report_id,
+            "created_at": entry.created_at,
+            "is_read": False,
+            "count": 1,
+        }
+        for entry in entries
+    ]
+    rows, merged = coalesce_notifications(db, rows)
+    created = []
+    if rows:
+        created = db.scalars(insert(NotificationModel).returning(NotificationModel), rows).all()
+    db.execute(
+        delete(NotificationOutbox).where(NotificationOutbox.id.in_([entry.id for entry in entries])),
+        execution_options={"synchronize_session": False},
+    )
+    db.flush()
+    dispatched = [
+        {field: getattr(notification, field) for field in _NOTIFICATION_FIELDS}
+        for notification in [*merged, *created]
+    ]
+    db.commit()
+    return DispatchResult(len(entries), dispatched)
+
+
+def _dispatch_once(session_factory: Callable[[], Session]) -> DispatchResult:
+    db = session_factory()
+    try:
+        return dispatch_pending(db)
+    finally:
+        db.close()
+
+
+async def run_dispatcher(session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """Фоновый цикл диспетчера: разбирает outbox, пока он не опустеет, затем ждет"""
+    interval = settings.NOTIFICATION_DISPATCH_INTERVAL_SECONDS
+    batch_size = settings.NOTIFICATION_DISPATCH_BATCH_SIZE
+    while True:
+        try:
+            result = await asyncio.to_thread(_dispatch_once, session_factory)
+            if result.consumed >= batch_size:
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка диспетчера уведомлений: {str(e)}", exc_info=True)
+        await asyncio.sleep(interval)
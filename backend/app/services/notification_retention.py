@@ -0,0 +1,146 @@
+"""
+Архивация уведомлений.
+
+Прочитанные уведомления старше NOTIFICATION_RETENTION_DAYS переносятся пачками
+в notifications_archive, чтобы рабочая таблица содержала только свежие данные.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterable, Set
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.notification import Notification as NotificationModel, NotificationArchive
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVED_COLUMNS = (
+    "id",
+    "created_at",
+    "user_id",
+    "type",
+    "params",
+    "title",
+    "message",
+    "is_read",
+    "count",
+    "related_item_id",
+    "related_booking_id",
+    "related_report_id",
+    "read_at",
+)
+
+# Секции архива, уже созданные этим процессом
+_known_partitions: Set[str] = set()
+
+
+def _month_start(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def ensure_archive_partitions(db: Session, months: Iterable[date]) -> Set[str]:
+    """Создает месячные секции notifications_archive (только PostgreSQL).
+
+    Возвращает имена затронутых секций. В _known_partitions их добавляет
+    вызывающий код после коммита: при откате транзакции секции не останется.
+    """
+    created: Set[str] = set()
+    if db.get_bind().dialect.name != "postgresql":
+        return created
+    for month in months:
+        name = f"notifications_archive_y{month.year:04d}m{month.month:02d}"
+        if name in _known_partitions:
+            continue
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF notifications_archive "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_next_month(month).isoformat()} 00:00:00+00')"
+        ))
+        created.add(name)
+    return created
+
+
+def archive_read_notifications(
+    db: Session,
+    older_than: timedelta = None,
+    batch_size: int = None,
+) -> int:
+    """Переносит прочитанные уведомления старше older_than в архив.
+
+    Каждая пачка - отдельная транзакция (INSERT ... SELECT + DELETE по id),
+    поэтому блокировки короткие, а прерванный запуск просто продолжится
+    при следующем. Возвращает количество перенесенных уведомлений.
+    """
+    older_than = older_than or timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    batch_size = batch_size or settings.NOTIFICATION_RETENTION_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - older_than
+    is_postgres = db.get_bind().dialect.name == "postgresql"
+
+    archived = 0
+    while True:
+        query = (
+            select(NotificationModel.id, NotificationModel.created_at)
+            .where(NotificationModel.is_read == True, NotificationModel.created_at < cutoff)
+            .order_by(NotificationModel.id)
+            .limit(batch_size)
+        )
+        if is_postgres:
+            query = query.with_for_update(skip_locked=True)
+        rows = db.execute(query).all()
+        if not rows:
+            db.rollback()
+            break
+
+        ids = [row.id for row in rows]
+        partitions = ensure_archive_partitions(db, {_month_start(row.created_at) for row in rows})
+
+        columns = [getattr(NotificationModel, column) for column in _ARCHIVED_COLUMNS]
+        db.execute(
+            insert(NotificationArchive).from_select(
+                list(_ARCHIVED_COLUMNS),
+                select(*columns).where(NotificationModel.id.in_(ids)),
+            )
+        )
+        db.execute(
+            delete(NotificationModel).where(NotificationModel.id.in_(ids)),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        _known_partitions.update(partitions)
+        archived += len(ids)
+
+        if len(ids) < batch_size:
+            break
+
+    if archived:
+        logger.info(f"Перенесено в архив уведомлений: {archived}")
+    return archived
+
+
+def _archive_once(session_factory: Callable[[], Session]) -> int:
+    db = session_factory()
+    try:
+        return archive_read_notifications(db)
+    finally:
+        db.close()
+
+
+async def run_retention_job(session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """Периодически запускает архивацию уведомлений"""
+    while True:
+        try:
+            await asyncio.to_thread(_archive_once, session_factory)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка архивации уведомлений: {str(e)}", exc_info=True)
+        await asyncio.sleep(settings.NOTIFICATION_RETENTION_INTERVAL_SECONDS)
@@ -1,36 +1,126 @@
 """
 Сервис для создания уведомлений
 """
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.models.notification import Notification as NotificationModel, NotificationType
-from datetime import datetime
+from app.core.config import settings
+from app.models.notification import Notification as NotificationModel, NotificationOutbox, NotificationType
+from app.services.notification_templates import dump_params
+
+# Типы, которые при всплеске событий по одному объявлению объединяются в одно уведомление
+COALESCED_TYPES = frozenset({
+    NotificationType.NEW_BOOKING_REQUEST,
+    NotificationType.BOOKING_CANCELLED_BY_RENTER,
+})
 
 
 def create_notification(
     db: Session,
     user_id: int,
     notification_type: NotificationType,
-    title: str,
-    message: str,
+    params: Dict[str, Any],
     related_item_id: int = None,
     related_booking_id: int = None,
     related_report_id: int = None,
 ):
-    """Создает новое уведомление"""
-    notification = NotificationModel(
+    """Записывает намерение создать уведомление в outbox.
+
+    Коммит не выполняется: запись фиксируется вместе с изменением состояния
+    в транзакции вызывающего кода, а сами уведомления создает диспетчер.
+    Текст не хранится: params подставляются в шаблон при чтении.
+    """
+    entry = NotificationOutbox(
         user_id=user_id,
         type=notification_type,
-        title=title,
-        message=message,
+        params=dump_params(params),
         related_item_id=related_item_id,
         related_booking_id=related_booking_id,
         related_report_id=related_report_id,
-        is_read=False,
     )
-    db.add(notification)
-    db.commit()
-    db.refresh(notification)
-    return notification
+    db.add(entry)
+    return entry
+
+
+def _coalesce_key(user_id: int, notification_type: NotificationType, related_item_id: Optional[int]):
+    if notification_type in COALESCED_TYPES and related_item_id is not None:
+        return user_id, notification_type, related_item_id
+    return None
+
+
+def coalesce_notifications(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    window_seconds: float = None,
+) -> Tuple[List[Dict[str, Any]], List[NotificationModel]]:
+    """Объединяет однотипные уведомления об одном объявлении в пределах окна.
+
+    rows - уведомления, готовые к вставке (по порядку создания). Событие
+    присоединяется к непрочитанному уведомлению того же пользователя, типа и
+    объявления, созданному не раньше чем за window_seconds до него: счетчик
+    count растет, params и related_booking_id берутся от последнего события.
+    Окно отсчитывается от первого события, поэтому поток событий не
+    склеивается бесконечно. Уже доставленное в Telegram уведомление повторно
+    не отправляется - новые события видны в приложении.
+
+    Возвращает (строки для вставки, обновленные существующие уведомления).
+    Коммит не выполняется.
+    """
+    window_seconds = settings.NOTIFICATION_COALESCE_WINDOW_SECONDS if window_seconds is None else window_seconds
+    keyed = [row for row in rows if _coalesce_key(row["user_id"], row["type"], row["related_item_id"])]
+    if window_seconds <= 0 or not keyed:
+        return rows, []
+    window = timedelta(seconds=window_seconds)
+
+    query = (
+        select(NotificationModel)
+        .where(
+            NotificationModel.user_id.in_({row["user_id"] for row in keyed}),
+            NotificationModel.type.in_(COALESCED_TYPES),
+            NotificationModel.related_item_id.in_({row["related_item_id"] for row in keyed}),
+            NotificationModel.is_read == False,
+            NotificationModel.created_at >= min(row["created_at"] for row in keyed) - window,
+        )
+        .order_by(NotificationModel.created_at)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update()
+
+    # Открытая группа по ключу: существующее уведомление или строка из этой пачки
+    groups: Dict[tuple, Any] = {}
+    for notification in db.scalars(query):
+        groups[_coalesce_key(notification.user_id, notification.type, notification.related_item_id)] = notification
+
+    remaining: List[Dict[str, Any]] = []
+    updated: Dict[int, NotificationModel] = {}
+    for row in rows:
+        key = _coalesce_key(row["user_id"], row["type"], row["related_item_id"])
+        group = groups.get(key) if key else None
+        if group is None:
+            remaining.append(row)
+            if key:
+                groups[key] = row
+            continue
+
+        if isinstance(group, dict):
+            if row["created_at"] - group["created_at"] <= window:
+                group["count"] += 1
+                group["params"] = row["params"]
+                group["related_booking_id"] = row["related_booking_id"]
+                continue
+        elif row["created_at"] - group.created_at <= window:
+            group.count += 1
+            group.params = row["params"]
+            group.related_booking_id = row["related_booking_id"]
+            updated[group.id] = group
+            continue
+
+        # Окно группы закрыто: событие начинает новую группу
+        remaining.append(row)
+        groups[key] = row
+
+    return remaining, list(updated.values())
 
 
 def create_item_removed_notification(
@@ -45,8 +135,7 @@ def create_item_removed_notification(
         db=db,
         user_id=owner_id,
         notification_type=NotificationType.ITEM_REMOVED_BY_REPORT,
-        title="Объявление снято из-за жалобы",
-        message=f'Ваше объявление "{item_title}" было снято с публикации из-за жалобы.',
+        params={"item": item_title},
         related_item_id=item_id,
         related_report_id=report_id,
     )
@@ -63,8 +152,7 @@ def create_item_approved_notification(
         db=db,
         user_id=owner_id,
         notification_type=NotificationType.ITEM_APPROVED,
-        title="Объявление одобрено",
-        message=f'Ваше объявление "{item_title}" было одобрено и опубликовано.',
+        params={"item": item_title},
         related_item_id=item_id,
     )
 
@@ -77,16 +165,11 @@ def create_item_rejected_notification(
     comment: str = None,
 ):
     """Создает уведомление об отклонении объявления"""
-    message = f'Ваше объявление "{item_title}" было отклонено.'
-    if comment:
-        message += f' Причина: {comment}'
-    
     return create_notification(
         db=db,
         user_id=owner_id,
         notification_type=NotificationType.ITEM_REJECTED,
-        title="Объявление отклонено",
-        message=message,
+        params={"item": item_title, "comment": comment},
         related_item_id=item_id,
     )
 
@@ -104,8 +187,7 @@ def create_new_booking_notification(
         db=db,
         user_id=owner_id,
         notification_type=NotificationType.NEW_BOOKING_REQUEST,
-        title="Новое бронирование",
-        message=f'Пользователь {renter_username} хочет забронировать ваше объявление "{item_title}".',
+        params={"item": item_title, "renter": renter_username},
         related_item_id=item_id,
         related_booking_id=booking_id,
     )
@@ -123,8 +205,7 @@ def create_booking_confirmed_notification(
         db=db,
         user_id=renter_id,
         notification_type=NotificationType.BOOKING_CONFIRMED,
-        title="Бронирование подтверждено",
-        message=f'Ваше бронирование объявления "{item_title}" было подтверждено.',
+        params={"item": item_title},
         related_item_id=item_id,
         related_booking_id=booking_id,
     )
@@ -142,8 +223,7 @@ def create_booking_rejected_notification(
         db=db,
         user_id=renter_id,
         notification_type=NotificationType.BOOKING_REJECTED,
-        title="Бронирование отклонено",
-        message=f'Ваше бронирование объявления "{item_title}" было отклонено владельцем.',
+        params={"item": item_title},
         related_item_id=item_id,
         related_booking_id=booking_id,
     )
@@ -161,8 +241,7 @@ def create_booking_cancelled_by_owner_notification(
         db=db,
         user_id=renter_id,
         notification_type=NotificationType.BOOKING_CANCELLED_BY_OWNER,
-        title="Бронирование отменено",
-        message=f'Владелец отменил ваше бронирование объявления "{item_title}".',
+        params={"item": item_title},
         related_item_id=item_id,
         related_booking_id=booking_id,
     )
@@ -181,8 +260,7 @@ def create_booking_cancelled_by_renter_notification(
         db=db,
         user_id=owner_id,
         notification_type=NotificationType.BOOKING_CANCELLED_BY_RENTER,
-        title="Бронирование отменено",
-        message=f'Пользователь {renter_username} отменил бронирование вашего объявления "{item_title}".',
+        params={"item": item_title, "renter": renter_username},
         related_item_id=item_id,
         related_booking_id=booking_id,
     )
@@ -0,0 +1,213 @@
+"""
+Шаблоны уведомлений.
+
+Уведомления хранятся как (type, params), где params - компактный JSON с
+параметрами шаблона. Заголовок и текст собираются при чтении, поэтому
+переименование объявления сразу видно в старых уведомлениях, а язык
+выбирается по запросу.
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.item import Item as ItemModel
+from app.models.notification import Notification as NotificationModel, NotificationType
+
+DEFAULT_LOCALE = "ru"
+
+
+class NotificationTemplate(NamedTuple):
+    title: str
+    message: str
+    # (параметр, шаблон) - дописывается к тексту, если параметр задан
+    suffixes: Tuple[Tuple[str, str], ...] = ()
+    # (заголовок, текст) для уведомления, объединяющего несколько событий ({count})
+    grouped: Optional[Tuple[str, str]] = None
+
+    def render(self, params: Dict[str, Any], count: int = 1) -> Tuple[str, str]:
+        values = _Params(params, count=count)
+        if count > 1 and self.grouped:
+            title, message = self.grouped
+            return title.format_map(values), message.format_map(values)
+        message = self.message.format_map(values)
+        for name, suffix in self.suffixes:
+            if params.get(name):
+                message += suffix.format_map(values)
+        return self.title.format_map(values), message
+
+
+class _Params(dict):
+    def __missing__(self, key):
+        return ""
+
+
+_TEMPLATES: Dict[str, Dict[NotificationType, NotificationTemplate]] = {
+    "ru": {
+        NotificationType.ITEM_REMOVED_BY_REPORT: NotificationTemplate(
+            "Объявление снято из-за жалобы",
+            'Ваше объявление "{item}" было снято с публикации из-за жалобы.',
+        ),
+        NotificationType.ITEM_APPROVED: NotificationTemplate(
+            "Объявление одобрено",
+            'Ваше объявление "{item}" было одобрено и опубликовано.',
+        ),
+        NotificationType.ITEM_REJECTED: NotificationTemplate(
+            "Объявление отклонено",
+            'Ваше объявление "{item}" было отклонено.',
+            (("comment", " Причина: {comment}"),),
+        ),
+        NotificationType.NEW_BOOKING_REQUEST: NotificationTemplate(
+            "Новое бронирование",
+            'Пользователь {renter} хочет забронировать ваше объявление "{item}".',
+            grouped=(
+                "Новые бронирования",
+                'Новых запросов на бронирование объявления "{item}": {count}. Последний - от пользователя {renter}.',
+            ),
+        ),
+        NotificationType.BOOKING_CONFIRMED: NotificationTemplate(
+            "Бронирование подтверждено",
+            'Ваше бронирование объявления "{item}" было подтверждено.',
+        ),
+        NotificationType.BOOKING_REJECTED: NotificationTemplate(
+            "Бронирование отклонено",
+            'Ваше бронирование объявления "{item}" было отклонено владельцем.',
+        ),
+        NotificationType.BOOKING_CANCELLED_BY_OWNER: NotificationTemplate(
+            "Бронирование отменено",
+            'Владелец отменил ваше бронирование объявления "{item}".',
+        ),
+        NotificationType.BOOKING_CANCELLED_BY_RENTER: NotificationTemplate(
+            "Бронирование отменено",
+            'Пользователь {renter} отменил бронирование вашего объявления "{item}".',
+            grouped=(
+                "Бронирования отменены",
+                'Отменено бронирований объявления "{item}": {count}. Последнее - пользователем {renter}.',
+            ),
+        ),
+    },
+    "en": {
+        NotificationType.ITEM_REMOVED_BY_REPORT: NotificationTemplate(
+            "Listing removed after a report",
+            'Your listing "{item}" was unpublished because of a report.',
+        ),
+        NotificationType.ITEM_APPROVED: NotificationTemplate(
+            "Listing approved",
+            'Your listing "{item}" was approved and published.',
+        ),
+        NotificationType.ITEM_REJECTED: NotificationTemplate(
+            "Listing rejected",
+            'Your listing "{item}" was rejected.',
+            (("comment", " Reason: {comment}"),),
+        ),
+        NotificationType.NEW_BOOKING_REQUEST: NotificationTemplate(
+            "New booking",
+            'User {renter} wants to book your listing "{item}".',
+            grouped=(
+                "New bookings",
+                'Your listing "{item}" has {count} new booking requests, the latest from {renter}.',
+            ),
+        ),
+        NotificationType.BOOKING_CONFIRMED: NotificationTemplate(
+            "Booking confirmed",
+            'Your booking of "{item}" was confirmed.',
+        ),
+        NotificationType.BOOKING_REJECTED: NotificationTemplate(
+            "Booking rejected",
+            'Your booking of "{item}" was rejected by the owner.',
+        ),
+        NotificationType.BOOKING_CANCELLED_BY_OWNER: NotificationTemplate(
+            "Booking cancelled",
+            'The owner cancelled your booking of "{item}".',
+        ),
+        NotificationType.BOOKING_CANCELLED_BY_RENTER: NotificationTemplate(
+            "Booking cancelled",
+            'User {renter} cancelled the booking of your listing "{item}".',
+            grouped=(
+                "Bookings cancelled",
+                '{count} bookings of your listing "{item}" were cancelled, the latest by {renter}.',
+            ),
+        ),
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def get_template(notification_type: NotificationType, locale: str = DEFAULT_LOCALE) -> NotificationTemplate:
+    """Возвращает шаблон для типа уведомления (с откатом на язык по умолчанию)"""
+    templates = _TEMPLATES.get(locale) or _TEMPLATES[DEFAULT_LOCALE]
+    return templates.get(notification_type) or _TEMPLATES[DEFAULT_LOCALE][notification_type]
+
+
+@lru_cache(maxsize=64)
+def resolve_locale(accept_language: Optional[str]) -> str:
+    """Выбирает язык по заголовку Accept-Language (первый поддерживаемый)"""
+    if not accept_language:
+        return DEFAULT_LOCALE
+    for part in accept_language.split(","):
+        language = part.split(";")[0].strip().lower()[:2]
+        if language in _TEMPLATES:
+            return language
+    return DEFAULT_LOCALE
+
+
+def dump_params(params: Dict[str, Any]) -> str:
+    """Сериализует параметры шаблона в компактный JSON (пустые значения отбрасываются)"""
+    return json.dumps(
+        {key: value for key, value in params.items() if value is not None and value != ""},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def load_params(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw) if raw else {}
+
+
+def render_notification(notification, locale: str = DEFAULT_LOCALE, item_title: Optional[str] = None) -> Dict[str, Any]:
+    """Собирает уведомление для ответа API.
+
+    item_title - актуальное название связанного объявления; если объявление
+    удалено, используется название, сохраненное в параметрах.
+    Записи, созданные до перехода на шаблоны (params пустой), отдаются как есть.
+    """
+    if notification.params is None:
+        title, message = notification.title, notification.message
+    else:
+        params = load_params(notification.params)
+        if item_title is not None:
+            params["item"] = item_title
+        title, message = get_template(notification.type, locale).render(params, notification.count or 1)
+
+    return {
+        "id": notification.id,
+        "user_id": notification.user_id,
+        "type": notification.type,
+        "title": title,
+        "message": message,
+        "is_read": notification.is_read,
+        "count": notification.count or 1,
+        "related_item_id": notification.related_item_id,
+        "related_booking_id": notification.related_booking_id,
+        "related_report_id": notification.related_report_id,
+        "created_at": notification.created_at,
+        "read_at": notification.read_at,
+    }
+
+
+def render_notifications(db: Session, notifications: List[NotificationModel], locale: str = DEFAULT_LOCALE) -> List[Dict[str, Any]]:
+    """Собирает текст уведомлений с актуальными названиями объявлений (один запрос на пачку)"""
+    item_ids = {
+        n.related_item_id for n in notifications
+        if n.params is not None and n.related_item_id is not None
+    }
+    item_titles = {}
+    if item_ids:
+        item_titles = dict(
+            db.query(ItemModel.id, ItemModel.title).filter(ItemModel.id.in_(item_ids)).all()
+        )
+    return [
+        render_notification(n, locale, item_titles.get(n.related_item_id))
+        for n in notifications
+    ]
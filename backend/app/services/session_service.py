@@ -0,0 +1,149 @@
+"""
+Сессии входа и refresh-токены.
+
+Refresh-токен - случайная строка; в базе хранится только его sha256, поэтому
+обновление токена не требует bcrypt. При каждом обновлении токен ротируется.
+Отозванные сессии попадают в deny-list (app.core.auth_cache), по которому
+access-токены проверяются без обращения к базе; другие процессы получают
+отзывы периодической синхронизацией.
+"""
+import asyncio
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.auth_cache import add_revoked_sessions
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.user_session import UserSession
+
+logger = logging.getLogger(__name__)
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def create_session(db: Session, user_id: int) -> Tuple[UserSession, str]:
+    """Создает сессию и возвращает ее вместе с refresh-токеном. Коммит не выполняется."""
+    token = secrets.token_urlsafe(32)
+    session = UserSession(
+        user_id=user_id,
+        refresh_token_hash=hash_refresh_token(token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(session)
+    db.flush()
+    return session, token
+
+
+class RefreshTokenSuperseded(Exception):
+    """Токен только что заменен параллельным обновлением: клиенту нужно взять новый из своего хранилища"""
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def rotate_session(db: Session, refresh_token: str) -> Optional[Tuple[UserSession, str]]:
+    """Меняет refresh-токен действующей сессии на новый.
+
+    Возвращает (сессия, новый токен) или None, если токен неизвестен, сессия
+    отозвана или истекла. Предъявление уже замененного токена означает, что
+    токен скопирован: такая сессия отзывается. Исключение - первые
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS после ротации: это, скорее всего,
+    параллельное обновление из другой вкладки, поэтому сессия не отзывается и
+    не ротируется повторно (иначе старый токен перехватил бы ее), а
+    выбрасывается RefreshTokenSuperseded. Строка сессии блокируется до конца
+    транзакции. Коммит не выполняется.
+    """
+    token_hash = hash_refresh_token(refresh_token)
+    now = datetime.now(timezone.utc)
+    query = select(UserSession).where(
+        or_(UserSession.refresh_token_hash == token_hash, UserSession.previous_token_hash == token_hash)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        # Параллельное обновление той же сессии ждет, пока эта ротация закоммитится
+        query = query.with_for_update()
+    session = db.scalars(query).first()
+    if session is None or session.revoked_at is not None:
+        return None
+
+    if session.refresh_token_hash != token_hash:
+        rotated_at = session.last_used_at
+        grace = timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+        if rotated_at is None or _as_utc(rotated_at) < now - grace:
+            logger.warning(f"Повторное использование refresh-токена сессии {session.id}, сессия отозвана")
+            revoke_sessions(db, [session.id])
+            return None
+        raise RefreshTokenSuperseded()
+    if _as_utc(session.expires_at) <= now:
+        return None
+
+    token = secrets.token_urlsafe(32)
+    session.previous_token_hash = session.refresh_token_hash
+    session.refresh_token_hash = hash_refresh_token(token)
+    session.last_used_at = now
+    return session, token
+
+
+def revoke_sessions(db: Session, session_ids: List[int]) -> None:
+    """Отзывает сессии по id. Коммит не выполняется."""
+    if not session_ids:
+        return
+    db.execute(
+        update(UserSession)
+        .where(UserSession.id.in_(session_ids), UserSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc)),
+        execution_options={"synchronize_session": False},
+    )
+    add_revoked_sessions(session_ids)
+
+
+def revoke_session_by_token(db: Session, refresh_token: str) -> None:
+    session_id = db.scalar(
+        select(UserSession.id).where(UserSession.refresh_token_hash == hash_refresh_token(refresh_token))
+    )
+    if session_id is not None:
+        revoke_sessions(db, [session_id])
+
+
+def revoke_user_sessions(db: Session, user_id: int, except_session_id: Optional[int] = None) -> None:
+    """Отзывает все действующие сессии пользователя (кроме текущей). Коммит не выполняется."""
+    query = select(UserSession.id).where(UserSession.user_id == user_id, UserSession.revoked_at.is_(None))
+    if except_session_id is not None:
+        query = query.where(UserSession.id != except_session_id)
+    revoke_sessions(db, list(db.scalars(query)))
+
+
+def sync_revoked_sessions(db: Session) -> int:
+    """Загружает в deny-list сессии, отозванные в пределах срока жизни access-токена"""
+    since = datetime.now(timezone.utc) - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    session_ids = list(db.scalars(select(UserSession.id).where(UserSession.revoked_at >= since)))
+    add_revoked_sessions(session_ids)
+    return len(session_ids)
+
+
+def _sync_once(session_factory: Callable[[], Session]) -> int:
+    db = session_factory()
+    try:
+        return sync_revoked_sessions(db)
+    finally:
+        db.close()
+
+
+async def run_session_sync(session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """Периодически подтягивает отзывы сессий, сделанные другими процессами"""
+    while True:
+        try:
+            await asyncio.to_thread(_sync_once, session_factory)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка синхронизации отозванных сессий: {str(e)}", exc_info=True)
+        await asyncio.sleep(settings.SESSION_DENYLIST_SYNC_INTERVAL_SECONDS)
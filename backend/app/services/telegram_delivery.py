@@ -0,0 +1,330 @@
+"""
+Доставка уведомлений в Telegram.
+
+Фоновый воркер пачками забирает недоставленные уведомления пользователей с
+привязанным telegram_id и отправляет их через транспорт. Запрос, создавший
+уведомление, доставку не ждет: воркер работает только с базой данных.
+Уведомления пользователей без telegram_id помечаются как обработанные.
+
+Ограничения Telegram соблюдаются token bucket'ами (на чат и на весь бот),
+неудачные отправки повторяются с экспоненциальной задержкой. Бакеты живут в
+памяти процесса, поэтому доставку ведет один процесс: на PostgreSQL воркеры
+gunicorn соревнуются за advisory-блокировку, остальные ждут и подхватывают
+доставку, если ее владелец завершится.
+"""
+import asyncio
+import logging
+import random
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+
+from sqlalchemy import or_, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.token_bucket import TokenBucket
+from app.models.notification import Notification as NotificationModel
+from app.models.user import User as UserModel
+from app.services.notification_templates import render_notifications
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки PostgreSQL, которую держит процесс, ведущий доставку
+_LEADER_LOCK_KEY = 7012029
+
+
+class DeliveryError(Exception):
+    """Ошибка отправки.
+
+    retry_after - задержка, которую запросил сервер; permanent - повторять
+    бессмысленно (например, пользователь заблокировал бота).
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, permanent: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
+
+
+class Transport(Protocol):
+    async def send(self, chat_id: str, text: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+class TelegramTransport:
+    """Отправка сообщений через Telegram Bot API (sendMessage)"""
+
+    def __init__(self, token: str, base_url: str = None, timeout: float = None):
+        self.url = f"{(base_url or settings.TELEGRAM_API_BASE_URL).rstrip('/')}/bot{token}/sendMessage"
+        self.timeout = timeout or settings.TELEGRAM_SEND_TIMEOUT_SECONDS
+        self._session = None
+
+    async def send(self, chat_id: str, text: str) -> None:
+        import aiohttp
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        try:
+            async with self._session.post(self.url, json={"chat_id": chat_id, "text": text}) as response:
+                data = await response.json(content_type=None)
+                if response.status == 200 and data.get("ok"):
+                    return
+                raise DeliveryError(
+                    data.get("description") or f"HTTP {response.status}",
+                    retry_after=(data.get("parameters") or {}).get("retry_after"),
+                    permanent=response.status in (400, 403),
+                )
+        except aiohttp.ClientError as e:
+            raise DeliveryError(str(e))
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def retry_delay(attempts: int) -> float:
+    """Экспоненциальная задержка перед повтором (с небольшим разбросом)"""
+    delay = min(settings.TELEGRAM_RETRY_BASE_SECONDS * (2 ** attempts), settings.TELEGRAM_RETRY_MAX_SECONDS)
+    return delay * random.uniform(1.0, 1.2)
+
+
+def lease_seconds(chat_ids: List[str]) -> float:
+    """Аренда пачки: худшее время ее отправки при лимитах плюс запас.
+
+    Сообщения одного чата уходят по очереди не чаще TELEGRAM_PER_CHAT_RATE и
+    каждое может ждать ответа до TELEGRAM_SEND_TIMEOUT_SECONDS, вся пачка -
+    не чаще TELEGRAM_GLOBAL_RATE.
+    """
+    if not chat_ids:
+        return settings.TELEGRAM_DELIVERY_LEASE_SECONDS
+    longest = max(Counter(chat_ids).values())
+    throttled = max(longest / settings.TELEGRAM_PER_CHAT_RATE, len(chat_ids) / settings.TELEGRAM_GLOBAL_RATE)
+    return throttled + longest * settings.TELEGRAM_SEND_TIMEOUT_SECONDS + settings.TELEGRAM_DELIVERY_LEASE_SECONDS
+
+
+class TelegramDeliveryWorker:
+    """Пакетная доставка уведомлений через транспорт"""
+
+    MAX_TRACKED_CHATS = 10000
+
+    def __init__(self, transport: Transport, session_factory: Callable[[], Session] = SessionLocal):
+        self.transport = transport
+        self.session_factory = session_factory
+        self._global_bucket = TokenBucket(settings.TELEGRAM_GLOBAL_RATE, settings.TELEGRAM_GLOBAL_RATE)
+        self._chat_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._leader = None
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(settings.TELEGRAM_PER_CHAT_RATE, 1.0)
+            self._chat_buckets[chat_id] = bucket
+            if len(self._chat_buckets) > self.MAX_TRACKED_CHATS:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _hold_leader_lock(self) -> bool:
+        """Может ли этот процесс вести доставку.
+
+        На PostgreSQL держит сессионную advisory-блокировку на отдельном
+        соединении; с другими СУБД процесс считается единственным.
+        """
+        if self._leader is not None:
+            try:
+                self._leader.execute(text("SELECT 1"))
+                self._leader.commit()
+                return True
+            except Exception as e:
+                logger.warning(f"Соединение с блокировкой доставки в Telegram потеряно: {e}")
+                self._release_leader_lock()
+
+        db = self.session_factory()
+        try:
+            bind = db.get_bind()
+        finally:
+            db.close()
+        if bind.dialect.name != "postgresql":
+            return True
+
+        connection = bind.connect()
+        try:
+            locked = connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": _LEADER_LOCK_KEY}
+            ).scalar()
+            connection.commit()
+        except Exception:
+            connection.invalidate()
+            raise
+        if not locked:
+            connection.close()
+            return False
+        logger.info("Доставка уведомлений в Telegram ведется этим процессом")
+        self._leader = connection
+        return True
+
+    def _release_leader_lock(self) -> None:
+        if self._leader is None:
+            return
+        # Закрываем само соединение, а не возвращаем его в пул: блокировка снимается вместе с ним
+        try:
+            self._leader.invalidate()
+        finally:
+            self._leader = None
+
+    def _skip_unreachable(self, db: Session, now: datetime) -> None:
+        """Помечает обработанными уведомления пользователей без telegram_id"""
+        db.execute(
+            update(NotificationModel)
+            .where(
+                NotificationModel.delivered_at.is_(None),
+                NotificationModel.user_id.in_(select(UserModel.id).where(UserModel.telegram_id.is_(None))),
+            )
+            .values(delivered_at=now, next_delivery_at=None),
+            execution_options={"synchronize_session": False},
+        )
+
+    def _claim(self, now: datetime) -> List[Tuple[int, int, str, str]]:
+        """Забирает пачку уведомлений и продлевает их аренду на время отправки.
+
+        Возвращает (id, delivery_attempts, chat_id, текст).
+        """
+        db = self.session_factory()
+        try:
+            self._skip_unreachable(db, now)
+            query = (
+                select(NotificationModel, UserModel.telegram_id)
+                .join(UserModel, UserModel.id == NotificationModel.user_id)
+                .where(
+                    NotificationModel.delivered_at.is_(None),
+                    NotificationModel.delivery_attempts < settings.TELEGRAM_MAX_ATTEMPTS,
+                    or_(NotificationModel.next_delivery_at.is_(None), NotificationModel.next_delivery_at <= now),
+                    UserModel.telegram_id.isnot(None),
+                )
+                .order_by(NotificationModel.id)
+                .limit(settings.TELEGRAM_DELIVERY_BATCH_SIZE)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True, of=NotificationModel)
+            rows = db.execute(query).all()
+            if not rows:
+                db.commit()
+                return []
+
+            notifications = [row[0] for row in rows]
+            rendered = render_notifications(db, notifications)
+            batch = [
+                (n.id, n.delivery_attempts, chat_id, f"{r['title']}\n\n{r['message']}")
+                for (n, chat_id), r in zip(rows, rendered)
+            ]
+            # Аренда: другие воркеры не возьмут эти уведомления, пока идет отправка
+            db.execute(
+                update(NotificationModel)
+                .where(NotificationModel.id.in_([n.id for n in notifications]))
+                .values(next_delivery_at=now + timedelta(seconds=lease_seconds([chat_id for _, chat_id in rows]))),
+                execution_options={"synchronize_session": False},
+            )
+            db.commit()
+            return batch
+        finally:
+            db.close()
+
+    def _record(self, delivered: List[int], failed: List[Tuple[int, int, Optional[datetime]]]) -> None:
+        """Сохраняет результаты: failed - (id, новое число попыток, время повтора)"""
+        db = self.session_factory()
+        try:
+            now = datetime.now(timezone.utc)
+            if delivered:
+                db.execute(
+                    update(NotificationModel)
+                    .where(NotificationModel.id.in_(delivered))
+                    .values(delivered_at=now, next_delivery_at=None),
+                    execution_options={"synchronize_session": False},
+                )
+            for notification_id, attempts, next_delivery_at in failed:
+                db.execute(
+                    update(NotificationModel)
+                    .where(NotificationModel.id == notification_id)
+                    .values(delivery_attempts=attempts, next_delivery_at=next_delivery_at),
+                    execution_options={"synchronize_session": False},
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _send_chat(self, chat_id: str, messages: List[Tuple[int, int, str, str]], delivered: List[int], failed: list) -> None:
+        """Отправляет сообщения одного чата по порядку с учетом лимитов"""
+        bucket = self._chat_bucket(chat_id)
+        for index, (notification_id, attempts, _, text) in enumerate(messages):
+            await asyncio.sleep(max(bucket.reserve(), self._global_bucket.reserve()))
+            try:
+                await self.transport.send(chat_id, text)
+                delivered.append(notification_id)
+            except DeliveryError as e:
+                now = datetime.now(timezone.utc)
+                if e.permanent:
+                    logger.warning(f"Доставка уведомления {notification_id} в Telegram невозможна: {e}")
+                    failed.append((notification_id, settings.TELEGRAM_MAX_ATTEMPTS, None))
+                    continue
+                delay = e.retry_after if e.retry_after is not None else retry_delay(attempts)
+                failed.append((notification_id, attempts + 1, now + timedelta(seconds=delay)))
+                if e.retry_after is not None:
+                    # Сервер попросил подождать: остальные сообщения чата переносим без штрафа
+                    for rest_id, rest_attempts, _, _ in messages[index + 1:]:
+                        failed.append((rest_id, rest_attempts, now + timedelta(seconds=delay)))
+                    return
+            except Exception as e:
+                logger.error(f"Ошибка отправки уведомления {notification_id} в Telegram: {e}")
+                delay = retry_delay(attempts)
+                failed.append((notification_id, attempts + 1, datetime.now(timezone.utc) + timedelta(seconds=delay)))
+
+    async def deliver_once(self) -> int:
+        """Доставляет одну пачку. Возвращает размер обработанной пачки."""
+        batch = await asyncio.to_thread(self._claim, datetime.now(timezone.utc))
+        if not batch:
+            return 0
+
+        chats: Dict[str, List[Tuple[int, int, str, str]]] = {}
+        for message in batch:
+            chats.setdefault(message[2], []).append(message)
+
+        delivered: List[int] = []
+        failed: List[Tuple[int, int, Optional[datetime]]] = []
+        await asyncio.gather(*(
+            self._send_chat(chat_id, messages, delivered, failed)
+            for chat_id, messages in chats.items()
+        ))
+        await asyncio.to_thread(self._record, delivered, failed)
+        return len(batch)
+
+    async def run(self) -> None:
+        """Фоновый цикл доставки"""
+        try:
+            while True:
+                try:
+                    if not await asyncio.to_thread(self._hold_leader_lock):
+                        await asyncio.sleep(settings.TELEGRAM_DELIVERY_INTERVAL_SECONDS)
+                        continue
+                    if await self.deliver_once() >= settings.TELEGRAM_DELIVERY_BATCH_SIZE:
+                        continue
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Ошибка воркера доставки в Telegram: {str(e)}", exc_info=True)
+                await asyncio.sleep(settings.TELEGRAM_DELIVERY_INTERVAL_SECONDS)
+        finally:
+            self._release_leader_lock()
+            await self.transport.close()
+
+
+async def run_telegram_delivery() -> None:
+    """Запускает доставку в Telegram с транспортом Bot API"""
+    worker = TelegramDeliveryWorker(TelegramTransport(settings.TELEGRAM_BOT_TOKEN))
+    await worker.run()
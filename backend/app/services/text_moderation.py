@@ -0,0 +1,88 @@
+"""
+Текстовая пре-модерация объявлений.
+
+Заголовок и описание проверяются блок-листами (app.core.text_filter) прямо в
+create_item/update_item - это микросекунды, без сети и модели. Результат
+сохраняется в объявлении (text_moderation_score, text_moderation_flags) и
+участвует в решении:
+
+- score >= TEXT_MODERATION_REJECT_SCORE - объявление сразу отклоняется
+  (с уведомлением владельцу, как при отклонении AI), AI-проверка изображения
+  не нужна. Со встроенными списками так бывает только из-за однозначно
+  запрещенных фраз: неоднозначные слова, ссылки, телефоны и спам вместе не
+  набирают порога отклонения;
+- score >= TEXT_MODERATION_REVIEW_SCORE - объявление не может быть одобрено
+  автоматически (даже если изображение чистое), решение за модератором;
+  одобренное объявление, в текст которого добавили такое, снова уходит на
+  модерацию.
+"""
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.text_filter import TextCheck, check_text
+from app.models.item import Item as ItemModel, ModerationStatus
+from app.services.notification_service import create_item_rejected_notification
+
+logger = logging.getLogger(__name__)
+
+TEXT_REJECTION_REASONS = {
+    "banned_words": "Запрещенные товары или услуги",
+    "restricted_goods": "Товары, продажа которых требует проверки",
+    "spam": "Спам или реклама",
+    "external_links": "Ссылки и контакты сторонних сервисов",
+    "phone_numbers": "Номер телефона в тексте объявления",
+}
+
+
+def text_rejection_reason(categories) -> str:
+    reasons = [TEXT_REJECTION_REASONS.get(category, category) for category in categories]
+    return "Текст объявления не прошел модерацию: " + "; ".join(reasons)
+
+
+def needs_manual_review(item: ItemModel) -> bool:
+    """Текст подозрительный: автоматически одобрять нельзя"""
+    return (item.text_moderation_score or 0.0) >= settings.TEXT_MODERATION_REVIEW_SCORE
+
+
+def apply_text_moderation(db: Session, item: ItemModel) -> Optional[TextCheck]:
+    """Проверяет текст объявления, сохраняет оценку и применяет решение.
+
+    Уведомление об отклонении записывается в outbox текущей транзакции.
+    Возвращает результат проверки; None, если фильтр выключен.
+    """
+    if not settings.TEXT_MODERATION_ENABLED:
+        return None
+
+    result = check_text(item.title, item.description)
+    item.text_moderation_score = result.score
+    item.text_moderation_flags = ",".join(result.categories) or None
+
+    if result.score >= settings.TEXT_MODERATION_REJECT_SCORE:
+        logger.info(f"Объявление {item.id} отклонено текстовым фильтром: {result.categories}, score {result.score}")
+        newly_rejected = item.moderation_status != ModerationStatus.REJECTED
+        comment = text_rejection_reason(result.categories)
+        item.moderation_status = ModerationStatus.REJECTED
+        item.moderated_by_id = None
+        item.moderated_at = datetime.utcnow()
+        item.moderation_comment = comment
+        item.is_active = False
+        if newly_rejected:
+            create_item_rejected_notification(
+                db=db,
+                owner_id=item.owner_id,
+                item_id=item.id,
+                item_title=item.title,
+                comment=comment,
+            )
+    elif result.score >= settings.TEXT_MODERATION_REVIEW_SCORE and item.moderation_status == ModerationStatus.APPROVED:
+        logger.info(f"Объявление {item.id} возвращено на модерацию: {result.categories}, score {result.score}")
+        item.moderation_status = ModerationStatus.PENDING
+        item.moderated_by_id = None
+        item.moderated_at = None
+        item.moderation_comment = None
+
+    return result
@@ -0,0 +1,71 @@
+"""
+Конфигурация gunicorn для продакшн-запуска:
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Воркеры uvicorn (uvloop + httptools, если установлены). С PRELOAD_APP=true
+приложение импортируется один раз в мастер-процессе до fork: настройки,
+схемы и веса модели модерации (PRELOAD_AI_MODEL=true) разделяются воркерами
+через copy-on-write. Для разработки по-прежнему используется run.py.
+"""
+import gc
+import multiprocessing
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+bind = os.getenv("BIND", f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}")
+
+# По умолчанию - по одному воркеру на ядро
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# loop="auto" и http="auto" выбирают uvloop и httptools
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Очередь входящих соединений и keep-alive
+backlog = int(os.getenv("BACKLOG", "2048"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# SIGTERM: воркеры перестают принимать соединения и дорабатывают текущие запросы
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+
+# Периодический перезапуск воркеров (0 - отключен)
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+
+preload_app = _env_bool("PRELOAD_APP", True)
+# Адреса обратного прокси, которому доверяем X-Forwarded-For: по IP клиента
+# из заголовка считаются лимиты запросов (app.core.rate_limit). Без этого все
+# клиенты за прокси получают его IP и один общий лимит.
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = os.getenv("ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """Мастер готов: загружаем модель до fork и замораживаем кучу"""
+    if not preload_app:
+        return
+    if _env_bool("PRELOAD_AI_MODEL", True):
+        from app.core.ai_service import load_predictor_from_settings
+
+        load_predictor_from_settings()
+    # Объекты мастера не попадают в сборку мусора воркеров - страницы не копируются
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Соединения с БД, открытые в мастере, воркерам не передаются"""
+    if not preload_app:
+        return
+    from app.core.database import engine
+
+    engine.dispose(close=False)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк CORS-слоя: стоимость одного запроса без сети.
+
+Сравнивает прежнюю связку (Starlette CORSMiddleware + обработчик OPTIONS на
+BaseHTTPMiddleware) с app.core.cors.CORSMiddleware на приложении с одним
+маршрутом; последний столбец - то же приложение без CORS.
+
+Использование:
+    python scripts/bench_cors.py [количество_запросов]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware as StarletteCORSMiddleware
+from starlette.responses import Response
+
+from app.core.cors import CORSMiddleware, expand_origins
+
+ORIGINS = ["http://localhost:3000"]
+
+
+async def legacy_options_handler(request, call_next):
+    # Копия удаленного main.cors_handler
+    if request.method == "OPTIONS":
+        origin = request.headers.get("origin")
+        response = Response(status_code=200)
+        normalized_origin = None
+        if origin:
+            normalized_origin = origin.replace("0.0.0.0", "localhost").replace("127.0.0.1", "localhost")
+        is_allowed = False
+        if origin:
+            is_allowed = origin in ORIGINS
+            if not is_allowed and normalized_origin:
+                is_allowed = normalized_origin in ORIGINS
+        if (is_allowed and origin) or (origin and origin.startswith(("http://localhost:", "http://0.0.0.0:", "http://127.0.0.1:"))):
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
+        response.headers["Access-Control-Allow-Headers"] = "*"
+        response.headers["Access-Control-Max-Age"] = "3600"
+        return response
+    return await call_next(request)
+
+
+def legacy_stack():
+    async def endpoint(request):
+        return Response("ok")
+
+    from starlette.routing import Route
+    return Starlette(
+        routes=[Route("/", endpoint, methods=["GET"])],
+        middleware=[
+            Middleware(BaseHTTPMiddleware, dispatch=legacy_options_handler),
+            Middleware(
+                StarletteCORSMiddleware,
+                allow_origins=sorted(expand_origins(ORIGINS)),
+                allow_credentials=True,
+                allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
+                allow_headers=["*"],
+                expose_headers=["*"],
+            ),
+        ],
+    )
+
+
+def new_stack(with_cors=True):
+    async def endpoint(request):
+        return Response("ok")
+
+    from starlette.routing import Route
+    return Starlette(
+        routes=[Route("/", endpoint, methods=["GET"])],
+        middleware=[Middleware(CORSMiddleware, allow_origins=ORIGINS)] if with_cors else [],
+    )
+
+
+def make_scope(method, headers):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": "/",
+        "raw_path": b"/",
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+
+
+def make_receive():
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Клиент не отключается: ждем, пока ответ не будет отправлен
+        await asyncio.Event().wait()
+
+    return receive
+
+
+async def send(message):
+    pass
+
+
+async def run(app, scope, n):
+    for _ in range(100):
+        await app(dict(scope), make_receive(), send)
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), make_receive(), send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def main(n):
+    cases = {
+        "GET без Origin": make_scope("GET", []),
+        "GET с Origin": make_scope("GET", [(b"origin", b"http://localhost:3000")]),
+        "preflight": make_scope("OPTIONS", [
+            (b"origin", b"http://127.0.0.1:3000"),
+            (b"access-control-request-method", b"POST"),
+        ]),
+    }
+    print(f"{'запрос':<16}{'было, мкс':>12}{'стало, мкс':>12}{'без CORS, мкс':>16}")
+    for name, scope in cases.items():
+        legacy = await run(legacy_stack(), scope, n)
+        new = await run(new_stack(), scope, n)
+        bare = await run(new_stack(with_cors=False), scope, n)
+        print(f"{name:<16}{legacy:>12.1f}{new:>12.1f}{bare:>16.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Время холодного старта: импорт app.main в отдельном процессе под -X importtime.
+
+Печатает общее время импорта, самые дорогие пакеты и
+тяжелые зависимости, которые не должны загружаться при старте воркера.
+
+Использование:
+    python scripts/importtime.py [количество_модулей]
+"""
+
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Загружаются только при первом использовании соответствующей функции
+HEAVY_MODULES = ("torch", "transformers", "boto3", "botocore", "PIL", "numpy")
+
+
+def measure(module: str = "app.main") -> Tuple[float, List[Tuple[int, int, str]], List[str]]:
+    """Возвращает (секунды, [(self_us, cumulative_us, имя)], загруженные тяжелые модули)"""
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("SECRET_KEY", "importtime")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+
+    total_us = next(cumulative for _, cumulative, name in rows if name.strip() == module)
+    heavy = [name for name in result.stdout.strip().split(",") if name]
+    return total_us / 1_000_000, rows, heavy
+
+
+def by_package(rows: List[Tuple[int, int, str]]) -> Dict[str, int]:
+    """Собственное время модулей, сложенное по пакетам верхнего уровня"""
+    totals: Dict[str, int] = {}
+    for self_us, _, name in rows:
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    seconds, rows, heavy = measure()
+
+    print(f"import app.main: {seconds * 1000:.0f} ms")
+    print()
+    print(f"{'пакет':40} {'мс':>8}")
+    for name, cumulative in sorted(by_package(rows).items(), key=lambda item: -item[1])[:limit]:
+        print(f"{name:40} {cumulative / 1000:8.1f}")
+    print()
+    print(f"Тяжелые модули при старте: {', '.join(heavy) if heavy else 'нет'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Оценка качества и скорости модели модерации на размеченном наборе изображений.
+
+Набор - каталог с подкаталогом на каждый класс модели:
+
+    dataset/approved/*.jpg
+    dataset/rejected_nsfw/*.jpg
+    dataset/rejected_violence/*.jpg
+    dataset/rejected_spam/*.jpg
+
+Отчет:
+    quality     - precision/recall по классам для каждого порога уверенности
+                  (предсказания ниже порога уходят модератору, coverage - доля
+                  оставшихся)
+    auto        - что сделала бы автомодерация с порогами одобрения/отклонения
+                  (по умолчанию AI_MODERATION_AUTO_APPROVE/REJECT_CONFIDENCE)
+    performance - p50/p90/p99 и изображений в секунду для каждой пары
+                  (число потоков, размер батча)
+    memory      - RSS и пиковый RSS процесса, размер весов
+
+Результат печатается таблицей и пишется в JSON (--output), чтобы сравнивать
+движки и настройки между запусками.
+
+Использование:
+    python scripts/moderation_benchmark.py --images /data/moderation-eval --output torch.json
+    python scripts/moderation_benchmark.py --images /data/moderation-eval --engine onnx --int8 \\
+        --threads 1 2 4 --batch-sizes 1 8 16 --output onnx-int8.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ai_moderation.evaluation import (
+    auto_moderation_report,
+    benchmark,
+    classification_report,
+    latency_stats,
+    load_image,
+    load_labelled_dataset,
+    predict_all,
+)
+from app.core.ai_service import create_predictor
+from app.core.config import settings
+from app.core.memory import peak_rss_mb, rss_mb
+
+
+def decode_images(samples):
+    images, timings = [], []
+    for path, _ in samples:
+        start = time.perf_counter()
+        images.append(load_image(path))
+        timings.append((time.perf_counter() - start) * 1000)
+    return images, latency_stats(timings)
+
+
+def predictors(args):
+    """Предиктор для каждого числа потоков.
+
+    PyTorch загружается один раз (число потоков - глобальная настройка),
+    сессия ONNX Runtime создается заново: потоки задаются при ее создании.
+    """
+    predictor = None
+    for threads in args.threads:
+        if args.engine == "torch" and predictor is not None:
+            import torch
+            torch.set_num_threads(threads)
+        else:
+            predictor = None
+            gc.collect()
+            predictor = create_predictor(args.engine, args.model_dir, threads)
+        yield threads, predictor
+
+
+def print_report(report):
+    for quality in report["quality"]:
+        print(f"\nпорог {quality['threshold']:.2f}: coverage {quality['coverage']:.1%}, accuracy {quality['accuracy']}")
+        print(f"  {'класс':<20}{'precision':>10}{'recall':>10}{'support':>9}")
+        for name, stats in quality["classes"].items():
+            precision = "-" if stats["precision"] is None else f"{stats['precision']:.3f}"
+            recall = "-" if stats["recall"] is None else f"{stats['recall']:.3f}"
+            print(f"  {name:<20}{precision:>10}{recall:>10}{stats['support']:>9}")
+
+    auto = report["auto"]
+    print(
+        f"\nавтомодерация (одобрение >= {auto['approve_confidence']}, отклонение >= {auto['reject_confidence']}): "
+        f"одобрено {auto['auto_approved']}, отклонено {auto['auto_rejected']}, модератору {auto['manual']}, "
+        f"ошибочно одобрено {auto['wrongly_approved']}, ошибочно отклонено {auto['wrongly_rejected']}"
+    )
+
+    print(f"\n{'потоки':>7}{'батч':>6}{'p50, мс':>10}{'p90, мс':>10}{'p99, мс':>10}{'изобр./с':>10}")
+    for run in report["performance"]:
+        print(
+            f"{run['threads']:>7}{run['batch_size']:>6}{run['p50_ms']:>10.1f}"
+            f"{run['p90_ms']:>10.1f}{run['p99_ms']:>10.1f}{run['images_per_second']:>10.1f}"
+        )
+    print(f"\nпиковый RSS: {report['memory']['peak_rss_mb']} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="каталог с подкаталогами по классам")
+    parser.add_argument("--model-dir", default=settings.AI_MODERATION_MODEL_DIR, required=not settings.AI_MODERATION_MODEL_DIR)
+    parser.add_argument("--engine", choices=["torch", "onnx"], default=settings.AI_MODERATION_ENGINE)
+    parser.add_argument("--int8", action="store_true", help="квантованная ONNX-модель")
+    parser.add_argument("--dtype", default=settings.AI_MODERATION_DTYPE, help="тип весов PyTorch")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.7, 0.85, 0.9, 0.95])
+    parser.add_argument("--approve-confidence", type=float, default=settings.AI_MODERATION_AUTO_APPROVE_CONFIDENCE)
+    parser.add_argument("--reject-confidence", type=float, default=settings.AI_MODERATION_AUTO_REJECT_CONFIDENCE)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--threads", type=int, nargs="+", default=[settings.AI_MODERATION_INFERENCE_THREADS or os.cpu_count()])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="путь к JSON-отчету")
+    args = parser.parse_args()
+
+    settings.AI_MODERATION_ONNX_INT8 = args.int8
+    settings.AI_MODERATION_DTYPE = args.dtype
+
+    samples = load_labelled_dataset(args.images)
+    labels = [label for _, label in samples]
+    images, decode_stats = decode_images(samples)
+    print(f"Изображений: {len(images)}, декодирование p50 {decode_stats['p50_ms']} мс")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "engine": args.engine,
+            "int8": args.int8,
+            "dtype": args.dtype,
+            "model_dir": str(args.model_dir),
+            "dataset": str(args.images),
+            "images": len(images),
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+        },
+        "decode": decode_stats,
+        "performance": [],
+    }
+
+    for threads, predictor in predictors(args):
+        if "quality" not in report:
+            unknown = sorted(set(labels) - set(predictor.classes))
+            if unknown:
+                raise SystemExit(f"Классов {unknown} нет в модели, ожидаются {predictor.classes}")
+            predictions = predict_all(predictor, images, max(args.batch_sizes))
+            report["config"]["model_version"] = predictor.model_version
+            report["config"]["classes"] = list(predictor.classes)
+            report["quality"] = [
+                classification_report(predictions, labels, predictor.classes, threshold)
+                for threshold in args.thresholds
+            ]
+            report["auto"] = auto_moderation_report(
+                predictions, labels, args.approve_confidence, args.reject_confidence
+            )
+
+        for batch_size in args.batch_sizes:
+            run = benchmark(predictor, images, batch_size, repeat=args.repeat)
+            report["performance"].append({"threads": threads, **run})
+            print(f"потоков {threads}, батч {batch_size}: {run['images_per_second']} изобр./с")
+        report["memory"] = predictor.memory_report()
+
+    report["memory"].update(rss_mb=round(rss_mb(), 1), peak_rss_mb=round(peak_rss_mb(), 1))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчет записан в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Экспорт модели модерации в ONNX, проверка точности и бенчмарк движков.
+
+Команды:
+    export  - vision tower + проекция + голова в moderation.onnx
+              (--int8: дополнительно динамически квантованная moderation.int8.onnx)
+    check   - сравнение ONNX (fp32 и int8) с PyTorch на одних и тех же изображениях:
+              доля совпадений top-1, максимальное и среднее |Δp|, минимальный
+              косинус эмбеддингов. Код возврата 1, если int8 хуже порогов.
+    bench   - задержка (p50/p99) и пропускная способность torch / onnx / onnx int8
+              на батчах разного размера
+
+Изображения берутся из --images (каталог с jpg/png/webp). В репозитории такого
+набора нет: для сверки с PyTorch на реальных данных нужен внешний каталог
+изображений. Без --images используются синтетические (шум и однотонные), что
+годится для проверки экспорта, но не для оценки точности.
+
+Использование:
+    python scripts/onnx_moderation.py export --model-dir /models/clip --int8
+    python scripts/onnx_moderation.py check --model-dir /models/clip --images /data/moderation-sample
+    python scripts/onnx_moderation.py bench --model-dir /models/clip --batch-sizes 1 8 16
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from app.ai_moderation.evaluation import IMAGE_SUFFIXES, percentile
+from app.ai_moderation.onnx_engine import (
+    OnnxModerationPredictor,
+    compare_predictions,
+    default_onnx_path,
+    export_to_onnx,
+    quantize_int8,
+)
+from app.core.config import settings
+
+
+def load_torch_predictor(model_dir):
+    from app.ai_moderation.model import CLIPModerationModel
+    from app.ai_moderation.predictor import ImageModerationPredictor
+
+    model = CLIPModerationModel(model_dir, settings.AI_MODERATION_MODEL_NAME, device="cpu")
+    model.load_config()
+    model.load_models()
+    return model, ImageModerationPredictor(model)
+
+
+def load_images(directory, count):
+    if directory:
+        paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        return [Image.open(p).convert("RGB") for p in paths[:count]]
+
+    import numpy as np
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(count):
+        if i % 2:
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            images.append(Image.new("RGB", (320, 240), color))
+        else:
+            pixels = rng.integers(0, 256, (240 + 16 * (i % 5), 320, 3), dtype=np.uint8)
+            images.append(Image.fromarray(pixels))
+    return images
+
+
+def onnx_predictors(model_dir, threads):
+    predictors = {}
+    for name, int8 in (("onnx", False), ("onnx-int8", True)):
+        path = default_onnx_path(model_dir, int8)
+        if path.exists():
+            predictors[name] = OnnxModerationPredictor(path, threads=threads)
+        else:
+            print(f"{path} не найден, {name} пропущен")
+    return predictors
+
+
+def cmd_export(args):
+    model, _ = load_torch_predictor(args.model_dir)
+    path = export_to_onnx(model, default_onnx_path(args.model_dir), opset=args.opset)
+    print(f"fp32: {path} ({path.stat().st_size / 2**20:.1f} МБ)")
+    if args.int8:
+        int8_path = quantize_int8(path, default_onnx_path(args.model_dir, int8=True))
+        print(f"int8: {int8_path} ({int8_path.stat().st_size / 2**20:.1f} МБ)")
+
+
+def cmd_check(args):
+    _, reference = load_torch_predictor(args.model_dir)
+    images = load_images(args.images, args.count)
+    expected = reference.predict_batch(images)
+
+    failed = False
+    for name, predictor in onnx_predictors(args.model_dir, args.threads).items():
+        report = compare_predictions(expected, predictor.predict_batch(images))
+        print(
+            f"{name:<10} изображений {report['images']}, top-1 {report['top1_agreement']:.2%}, "
+            f"max |Δp| {report['max_abs_prob_diff']:.4f}, mean |Δp| {report['mean_abs_prob_diff']:.5f}, "
+            f"min cos {report['min_embedding_cosine']:.5f}"
+        )
+        if name == "onnx-int8" and (
+            report["top1_agreement"] < args.min_agreement or report["max_abs_prob_diff"] > args.max_prob_diff
+        ):
+            failed = True
+            print(f"  int8 хуже порогов: top-1 >= {args.min_agreement:.2%}, max |Δp| <= {args.max_prob_diff}")
+    return 1 if failed else 0
+
+
+def cmd_bench(args):
+    predictors = {}
+    if not args.skip_torch:
+        import torch
+        if args.threads:
+            torch.set_num_threads(args.threads)
+        predictors["torch"] = load_torch_predictor(args.model_dir)[1]
+    predictors.update(onnx_predictors(args.model_dir, args.threads))
+    images = load_images(args.images, max(args.batch_sizes))
+
+    print(f"{'движок':<10}{'батч':>6}{'p50, мс':>10}{'p99, мс':>10}{'изобр./с':>10}")
+    for name, predictor in predictors.items():
+        for batch_size in args.batch_sizes:
+            batch = (images * batch_size)[:batch_size]
+            predictor.predict_batch(batch)
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                predictor.predict_batch(batch)
+                timings.append((time.perf_counter() - start) * 1000)
+            throughput = batch_size * len(timings) / (sum(timings) / 1000)
+            print(
+                f"{name:<10}{batch_size:>6}{percentile(timings, 50):>10.1f}"
+                f"{percentile(timings, 99):>10.1f}{throughput:>10.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=settings.AI_MODERATION_MODEL_DIR, required=not settings.AI_MODERATION_MODEL_DIR)
+    parser.add_argument("--threads", type=int, default=settings.AI_MODERATION_INFERENCE_THREADS)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export")
+    export.add_argument("--opset", type=int, default=17)
+    export.add_argument("--int8", action="store_true")
+    export.set_defaults(func=cmd_export)
+
+    check = commands.add_parser("check")
+    check.add_argument("--images")
+    check.add_argument("--count", type=int, default=64)
+    check.add_argument("--min-agreement", type=float, default=0.98)
+    check.add_argument("--max-prob-diff", type=float, default=0.05)
+    check.set_defaults(func=cmd_check)
+
+    bench = commands.add_parser("bench")
+    bench.add_argument("--images")
+    bench.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16])
+    bench.add_argument("--repeat", type=int, default=20)
+    bench.add_argument("--skip-torch", action="store_true")
+    bench.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
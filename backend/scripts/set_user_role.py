@@ -41,6 +41,8 @@ def set_user_role(username_or_email: str, role: str):
         
         old_role = user.role.value
         user.role = user_role
+        # Токены, выданные со старой ролью, перестают действовать
+        user.auth_version += 1
         db.commit()
         
         print(f"✅ Роль пользователя '{user.username}' изменена: {old_role} → {user_role.value}")
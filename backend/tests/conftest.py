@@ -6,6 +6,9 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
+from app.core.auth_cache import clear_auth_caches
+from app.core.config import settings
+from app.core.rate_limit import reset_rate_limits
 from app.core.database import Base, get_db
 from app.main import app
 from app.models.user import User as UserModel, UserRole
@@ -26,6 +29,24 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Background loops would use the application engine; tests drive them explicitly
+settings.NOTIFICATION_DISPATCHER_ENABLED = False
+settings.NOTIFICATION_RETENTION_ENABLED = False
+settings.SESSION_DENYLIST_SYNC_ENABLED = False
+settings.MODERATION_JOBS_ENABLED = False
+# Hash passwords inline and cheaply; the process pool is covered by its own test
+settings.BCRYPT_ROUNDS = 4
+settings.PASSWORD_HASH_WORKERS = 0
+
+
+@pytest.fixture(autouse=True)
+def reset_auth_caches():
+    """User ids are reused across test databases, so cached principals must not leak."""
+    clear_auth_caches()
+    reset_rate_limits()
+    yield
+    clear_auth_caches()
+
 
 @pytest.fixture(scope="function")
 def db_session():
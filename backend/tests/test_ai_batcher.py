@@ -0,0 +1,255 @@
+"""
+Tests for dynamic batching of moderation inference.
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.ai_moderation.batcher import InferenceBatcher, InferenceQueueFull
+
+
+class FakePredictor:
+    """Stands in for ImageModerationPredictor.predict_batch; records batch sizes."""
+
+    def __init__(self, delay: float = 0.0, broken=()):
+        self.delay = delay
+        self.broken = set(broken)
+        self.batches = []
+
+    def predict_batch(self, images):
+        self.batches.append(list(images))
+        if self.delay:
+            time.sleep(self.delay)
+        if self.broken.intersection(images):
+            raise ValueError("cannot decode image")
+        return [{"predicted_class": "approved", "confidence": 0.99, "image": image} for image in images]
+
+    def format_prediction_for_api(self, prediction):
+        return {
+            "status": prediction["predicted_class"],
+            "reason": prediction["predicted_class"],
+            "confidence": prediction["confidence"],
+            "probabilities": {prediction["predicted_class"]: prediction["confidence"]},
+            "processing_time_ms": 1,
+            "model": "trained",
+        }
+
+
+@pytest.fixture
+def fake_model(client, monkeypatch):
+    """Install a FakePredictor as the global model; downloads return the URL after a short delay."""
+    from app.ai_moderation import preprocessor
+    from app.core import ai_service
+
+    state = {"active": 0, "max_active": 0}
+
+    async def fake_download(url, timeout=30):
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        try:
+            await asyncio.sleep(0.01)
+            if "broken" in url:
+                raise ValueError("Failed to download image: HTTP 404")
+            return url.encode()
+        finally:
+            state["active"] -= 1
+
+    monkeypatch.setattr(preprocessor, "download_image_bytes_async", fake_download)
+    monkeypatch.setattr(preprocessor, "load_image_from_bytes", bytes.decode)
+    monkeypatch.setattr(ai_service.settings, "AI_MODERATION_CACHE_ENABLED", False)
+    predictor = FakePredictor()
+    ai_service.initialize_predictor(predictor)
+    predictor.downloads = state
+    yield predictor
+    # The batcher worker runs on the test client's event loop
+    client.portal.call(ai_service.close_batcher)
+    ai_service._predictor = None
+    ai_service._batcher = None
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestInferenceBatcher:
+    """Test grouping, result scattering, error isolation and metrics."""
+
+    async def test_concurrent_submissions_share_batches(self):
+        predictor = FakePredictor()
+        batcher = InferenceBatcher(predictor.predict_batch, max_batch_size=4, max_wait_ms=50)
+        try:
+            results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        finally:
+            await batcher.close()
+
+        assert [r["image"] for r in results] == list(range(10))
+        assert [len(batch) for batch in predictor.batches] == [4, 4, 2]
+
+    async def test_single_request_waits_at_most_max_wait(self):
+        predictor = FakePredictor()
+        batcher = InferenceBatcher(predictor.predict_batch, max_batch_size=8, max_wait_ms=20)
+        try:
+            started = time.monotonic()
+            await batcher.submit("only")
+            elapsed = time.monotonic() - started
+        finally:
+            await batcher.close()
+
+        assert predictor.batches == [["only"]]
+        assert elapsed < 0.5
+
+    async def test_requests_arriving_during_inference_form_next_batch(self):
+        predictor = FakePredictor(delay=0.05)
+        batcher = InferenceBatcher(predictor.predict_batch, max_batch_size=16, max_wait_ms=1)
+        try:
+            first = asyncio.ensure_future(batcher.submit(0))
+            await asyncio.sleep(0.02)
+            rest = [asyncio.ensure_future(batcher.submit(i)) for i in range(1, 6)]
+            await asyncio.gather(first, *rest)
+        finally:
+            await batcher.close()
+
+        assert [len(batch) for batch in predictor.batches] == [1, 5]
+
+    async def test_broken_image_does_not_fail_neighbours(self):
+        predictor = FakePredictor(broken={"bad"})
+        batcher = InferenceBatcher(predictor.predict_batch, max_batch_size=4, max_wait_ms=20)
+        try:
+            results = await asyncio.gather(
+                batcher.submit("a"), batcher.submit("bad"), batcher.submit("b"),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.close()
+
+        assert results[0]["image"] == "a"
+        assert isinstance(results[1], ValueError)
+        assert results[2]["image"] == "b"
+        assert batcher.metrics.errors == 1
+
+    async def test_stats_report_batches_and_latency(self):
+        predictor = FakePredictor()
+        batcher = InferenceBatcher(predictor.predict_batch, max_batch_size=3, max_wait_ms=10)
+        try:
+            await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+        finally:
+            await batcher.close()
+
+        stats = batcher.stats()
+        assert stats["batches"] == 2
+        assert stats["items"] == 6
+        assert stats["avg_batch_size"] == 3.0
+        assert stats["latency_p99_ms"] >= stats["latency_p50_ms"] >= 0
+        assert stats["queue_depth"] == 0
+
+    async def test_full_queue_rejects_instead_of_waiting(self):
+        predictor = FakePredictor(delay=0.1)
+        batcher = InferenceBatcher(predictor.predict_batch, max_batch_size=1, max_wait_ms=0, max_queue=2)
+        try:
+            running = asyncio.ensure_future(batcher.submit("running"))
+            await asyncio.sleep(0.02)
+            queued = [asyncio.ensure_future(batcher.submit(i)) for i in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(InferenceQueueFull):
+                await batcher.submit("overflow")
+            await asyncio.gather(running, *queued)
+        finally:
+            await batcher.close()
+
+        assert batcher.metrics.rejected == 1
+
+    async def test_inference_runs_on_dedicated_executor(self):
+        threads = []
+
+        def predict_batch(images):
+            threads.append(threading.current_thread().name)
+            return images
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        batcher = InferenceBatcher(predict_batch, executor=executor)
+        try:
+            await batcher.submit("image")
+        finally:
+            await batcher.close()
+            executor.shutdown()
+
+        assert threads[0].startswith("inference")
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestAutoModerationBackpressure:
+    """Test that uploads fall back to pending when inference is saturated."""
+
+    async def test_saturated_queue_leaves_image_pending(self, monkeypatch):
+        from app.ai_moderation import preprocessor
+        from app.core import ai_service
+
+        async def fake_download(url, timeout=30):
+            return url.encode()
+
+        monkeypatch.setattr(preprocessor, "download_image_bytes_async", fake_download)
+        monkeypatch.setattr(preprocessor, "load_image_from_bytes", bytes.decode)
+        monkeypatch.setattr(ai_service.settings, "AI_MODERATION_CACHE_ENABLED", False)
+        monkeypatch.setattr(ai_service.settings, "AI_MODERATION_MAX_QUEUE", 1)
+        monkeypatch.setattr(ai_service.settings, "AI_MODERATION_MAX_BATCH_SIZE", 1)
+        ai_service.initialize_predictor(FakePredictor(delay=0.1))
+        try:
+            running = asyncio.ensure_future(ai_service.moderate_image_auto("http://img/running"))
+            await asyncio.sleep(0.02)
+            queued = asyncio.ensure_future(ai_service.moderate_image_auto("http://img/queued"))
+            await asyncio.sleep(0.01)
+            result = await ai_service.moderate_image_auto("http://img/overflow")
+            await asyncio.gather(running, queued)
+        finally:
+            await ai_service.close_batcher()
+            monkeypatch.setattr(ai_service, "_predictor", None)
+            monkeypatch.setattr(ai_service, "_batcher", None)
+
+        assert result["status"] == "pending"
+        assert result["reason"] == "queue_full"
+        assert result["auto_action"] is False
+
+
+@pytest.mark.moderation
+class TestBatchModerationEndpoint:
+    """Test /moderation/ai/batch: typed input, bounded downloads, NDJSON streaming."""
+
+    def test_results_keep_request_order(self, client, fake_model, monkeypatch):
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "AI_MODERATION_DOWNLOAD_CONCURRENCY", 3)
+        images = [{"url": f"http://img.example/{i}.jpg", "category": "books"} for i in range(12)]
+
+        response = client.post("/api/v1/moderation/ai/batch", json={"images": images})
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results) == 12
+        assert all(r["status"] == "approved" for r in results)
+        assert fake_model.downloads["max_active"] == 3
+        # Downloads finish close together, so inference is batched
+        assert len(fake_model.batches) < 12
+
+    def test_failed_download_becomes_pending(self, client, fake_model):
+        images = [{"url": "http://img.example/ok.jpg"}, {"url": "http://img.example/broken.jpg"}]
+
+        response = client.post("/api/v1/moderation/ai/batch", json={"images": images})
+
+        results = response.json()["results"]
+        assert results[0]["status"] == "approved"
+        assert results[1]["status"] == "pending"
+        assert results[1]["reason"] == "error"
+
+    def test_invalid_url_is_rejected(self, client, fake_model):
+        response = client.post("/api/v1/moderation/ai/batch", json={"images": [{"url": "not a url"}]})
+        assert response.status_code == 400
+
+    def test_stream_returns_ndjson_lines(self, client, fake_model):
+        images = [{"url": f"http://img.example/{i}.jpg"} for i in range(5)]
+
+        with client.stream("POST", "/api/v1/moderation/ai/batch?stream=true", json={"images": images}) as response:
+            assert response.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in response.iter_lines() if line]
+
+        assert sorted(line["index"] for line in lines) == list(range(5))
+        assert all(line["status"] == "approved" for line in lines)
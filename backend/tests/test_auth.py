@@ -1,9 +1,20 @@
 """
 Tests for authentication endpoints.
 """
+import threading
+from datetime import datetime, timezone
+import bcrypt
 import pytest
 from fastapi import status
-from app.models.user import User as UserModel
+from sqlalchemy import event
+from app.api.v1.endpoints import auth as auth_endpoints
+from app.core import security
+from app.core.auth_cache import cache_principal, clear_auth_caches, is_session_revoked, principal_cache
+from app.core.config import settings
+from app.models.user_session import UserSession
+from app.services.session_service import sync_revoked_sessions
+from app.models.user import User as UserModel, UserRole
+from tests.conftest import engine
 
 
 @pytest.mark.auth
@@ -125,3 +136,245 @@ class TestAuth:
         )
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+
+
+@pytest.fixture
+def admin_headers(client, test_admin):
+    response = client.post(
+        "/api/v1/auth/login",
+        data={"username": test_admin.username, "password": "testpassword123"}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user_queries():
+    """Collect SELECTs against the users table."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.auth
+class TestAuthCache:
+    """Test the verified-token and principal caches."""
+
+    def test_cached_principal_skips_user_query(self, client, auth_headers, db_session, test_user, user_queries):
+        """Repeated requests with the same token do not load the user again."""
+        assert client.get("/api/v1/auth/me", headers=auth_headers).status_code == status.HTTP_200_OK
+        db_session.expunge_all()
+        user_queries.clear()
+
+        response = client.get("/api/v1/auth/me", headers=auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["username"] == test_user.username
+        assert user_queries == []
+
+    def test_profile_update_refreshes_principal(self, client, auth_headers, db_session):
+        """update_user_me drops the cached snapshot."""
+        client.get("/api/v1/auth/me", headers=auth_headers)
+        client.put("/api/v1/users/me", json={"full_name": "Новое Имя"}, headers=auth_headers)
+        db_session.expunge_all()
+
+        response = client.get("/api/v1/auth/me", headers=auth_headers)
+        assert response.json()["full_name"] == "Новое Имя"
+
+    def test_privileged_principals_expire_sooner(self, monkeypatch):
+        """Moderator and admin snapshots use the shorter TTL."""
+        ttls = {}
+        monkeypatch.setattr(principal_cache, "set", lambda user_id, snapshot, ttl: ttls.update({user_id: ttl}))
+        cache_principal(1, {"role": UserRole.USER})
+        cache_principal(2, {"role": UserRole.MODERATOR})
+        cache_principal(3, {"role": UserRole.ADMIN})
+        assert ttls == {
+            1: settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS,
+            2: settings.AUTH_PRIVILEGED_PRINCIPAL_CACHE_TTL_SECONDS,
+            3: settings.AUTH_PRIVILEGED_PRINCIPAL_CACHE_TTL_SECONDS,
+        }
+
+    def test_role_change_revokes_old_tokens(self, client, auth_headers, admin_headers, test_user):
+        """Tokens issued before a role change are rejected."""
+        client.get("/api/v1/auth/me", headers=auth_headers)
+
+        response = client.put(
+            f"/api/v1/admin/users/{test_user.id}/role",
+            json={"role": "moderator"},
+            headers=admin_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert client.get("/api/v1/auth/me", headers=auth_headers).status_code == status.HTTP_401_UNAUTHORIZED
+
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": test_user.username, "password": "testpassword123"}
+        )
+        new_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        assert client.get("/api/v1/auth/me", headers=new_headers).json()["role"] == "moderator"
+
+    def test_deactivation_revokes_access(self, client, auth_headers, admin_headers, test_user):
+        """A deactivated user can neither use old tokens nor log in."""
+        client.get("/api/v1/auth/me", headers=auth_headers)
+
+        response = client.put(
+            f"/api/v1/admin/users/{test_user.id}/status",
+            json={"is_active": False},
+            headers=admin_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["is_active"] is False
+        assert client.get("/api/v1/auth/me", headers=auth_headers).status_code == status.HTTP_401_UNAUTHORIZED
+
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": test_user.username, "password": "testpassword123"}
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.auth
+class TestPasswordHashing:
+    """Test bcrypt offloading and cost upgrades."""
+
+    def test_login_rehashes_outdated_cost(self, client, db_session, test_user):
+        """A hash made with another cost is replaced on successful login."""
+        test_user.hashed_password = bcrypt.hashpw(b"testpassword123", bcrypt.gensalt(rounds=5)).decode()
+        db_session.commit()
+
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": test_user.username, "password": "testpassword123"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        db_session.refresh(test_user)
+        assert test_user.hashed_password.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+        assert security.verify_password("testpassword123", test_user.hashed_password)
+
+    def test_login_returns_429_when_hasher_is_saturated(self, client, test_user, monkeypatch):
+        """Logins fail fast with 429 when the hashing queue is full."""
+        monkeypatch.setattr(security, "_pending", threading.BoundedSemaphore(1))
+        security._pending.acquire()
+
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": test_user.username, "password": "testpassword123"}
+        )
+
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["Retry-After"] == "1"
+
+    @pytest.mark.slow
+    def test_hashing_runs_in_process_pool(self, monkeypatch):
+        """With workers configured, bcrypt runs in the process pool."""
+        monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 1)
+        try:
+            hashed = security.get_password_hash("secret")
+            assert security._executor is not None
+            assert security.verify_password("secret", hashed)
+            assert not security.verify_password("wrong", hashed)
+        finally:
+            security.shutdown_password_hasher()
+
+
+@pytest.mark.auth
+class TestRefreshTokens:
+    """Test refresh token rotation and session revocation."""
+
+    def _login(self, client, user):
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": user.username, "password": "testpassword123"}
+        )
+        return response.json()
+
+    def _headers(self, tokens):
+        return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    def test_refresh_rotates_without_password_check(self, client, test_user, monkeypatch):
+        """Refreshing issues a new token pair and never calls bcrypt."""
+        tokens = self._login(client, test_user)
+        assert tokens["refresh_token"]
+
+        def fail(*args):
+            raise AssertionError("bcrypt must not run on refresh")
+        monkeypatch.setattr(auth_endpoints, "verify_password", fail)
+
+        response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+        assert response.status_code == status.HTTP_200_OK
+        refreshed = response.json()
+        assert refreshed["refresh_token"] != tokens["refresh_token"]
+        assert client.get("/api/v1/auth/me", headers=self._headers(refreshed)).status_code == status.HTTP_200_OK
+
+    def test_reused_refresh_token_revokes_session(self, client, test_user, monkeypatch):
+        """Presenting a rotated-out refresh token ends the whole session."""
+        monkeypatch.setattr(settings, "REFRESH_TOKEN_REUSE_GRACE_SECONDS", 0.0)
+        tokens = self._login(client, test_user)
+        refreshed = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+        response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        response = client.post("/api/v1/auth/refresh", json={"refresh_token": refreshed["refresh_token"]})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert client.get("/api/v1/auth/me", headers=self._headers(refreshed)).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_concurrent_refresh_keeps_session(self, client, test_user):
+        """A second refresh with the same token right away neither revokes nor takes over the session."""
+        tokens = self._login(client, test_user)
+        first = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        second = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+        assert first.status_code == status.HTTP_200_OK
+        assert second.status_code == status.HTTP_409_CONFLICT
+        latest = first.json()
+        assert client.get("/api/v1/auth/me", headers=self._headers(latest)).status_code == status.HTTP_200_OK
+        response = client.post("/api/v1/auth/refresh", json={"refresh_token": latest["refresh_token"]})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_logout_revokes_session(self, client, test_user):
+        """After logout neither the access nor the refresh token works."""
+        tokens = self._login(client, test_user)
+
+        response = client.post("/api/v1/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert client.get("/api/v1/auth/me", headers=self._headers(tokens)).status_code == status.HTTP_401_UNAUTHORIZED
+        response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_password_change_revokes_other_sessions(self, client, test_user):
+        """Changing the password keeps the current session and ends the others."""
+        current = self._login(client, test_user)
+        other = self._login(client, test_user)
+
+        response = client.put(
+            "/api/v1/users/me",
+            json={"password": "newpassword456"},
+            headers=self._headers(current)
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert client.get("/api/v1/auth/me", headers=self._headers(current)).status_code == status.HTTP_200_OK
+        assert client.get("/api/v1/auth/me", headers=self._headers(other)).status_code == status.HTTP_401_UNAUTHORIZED
+        response = client.post("/api/v1/auth/refresh", json={"refresh_token": other["refresh_token"]})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_sync_loads_revocations_from_database(self, client, db_session, test_user):
+        """Revocations made by another process reach the deny-list on sync."""
+        self._login(client, test_user)
+        session = db_session.query(UserSession).one()
+        db_session.query(UserSession).update({"revoked_at": datetime.now(timezone.utc)})
+        db_session.commit()
+        clear_auth_caches()
+
+        assert not is_session_revoked(session.id)
+        assert sync_revoked_sessions(db_session) == 1
+        assert is_session_revoked(session.id)
@@ -0,0 +1,68 @@
+"""
+Tests for the CORS layer.
+"""
+import pytest
+from fastapi import status
+from app.core.cors import CORSMiddleware, expand_origins
+
+
+@pytest.mark.unit
+class TestCORS:
+    """Test preflight answers and headers on simple requests."""
+
+    def test_expand_origins_adds_local_variants(self):
+        assert expand_origins(["http://localhost:3000", "https://bazaar.example"]) == {
+            "http://localhost:3000",
+            "http://127.0.0.1:3000",
+            "http://0.0.0.0:3000",
+            "https://bazaar.example",
+        }
+
+    def test_expand_origins_compares_hosts_exactly(self):
+        assert expand_origins(["https://localhost.evil.example", "http://my127.0.0.1.example:3000"]) == {
+            "https://localhost.evil.example",
+            "http://my127.0.0.1.example:3000",
+        }
+
+    def test_preflight_for_allowed_origin(self, client):
+        response = client.options(
+            "/api/v1/items/",
+            headers={"Origin": "http://127.0.0.1:3000", "Access-Control-Request-Method": "POST"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Access-Control-Allow-Origin"] == "http://127.0.0.1:3000"
+        assert response.headers["Access-Control-Allow-Credentials"] == "true"
+        assert "PATCH" in response.headers["Access-Control-Allow-Methods"]
+        assert response.headers["Access-Control-Max-Age"] == "3600"
+
+    def test_preflight_for_unknown_origin(self, client):
+        response = client.options(
+            "/api/v1/items/",
+            headers={"Origin": "https://evil.example", "Access-Control-Request-Method": "POST"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert "Access-Control-Allow-Origin" not in response.headers
+
+    def test_simple_request_gets_cors_headers(self, client):
+        response = client.get("/health", headers={"Origin": "http://localhost:3000"})
+        assert response.headers["Access-Control-Allow-Origin"] == "http://localhost:3000"
+        assert response.headers["Access-Control-Expose-Headers"] == "*"
+        assert response.headers["Vary"] == "Origin"
+
+    def test_request_without_origin_is_untouched(self, client):
+        response = client.get("/health")
+        assert "Access-Control-Allow-Origin" not in response.headers
+
+    def test_dev_origins_are_off_by_default(self, client):
+        """Other local ports are rejected unless explicitly enabled."""
+        response = client.get("/health", headers={"Origin": "http://localhost:5173"})
+        assert "Access-Control-Allow-Origin" not in response.headers
+
+        middleware = CORSMiddleware(None, ["https://bazaar.example"])
+        assert middleware.is_allowed("https://bazaar.example")
+        assert not middleware.is_allowed("http://localhost:5173")
+
+    def test_dev_origins_can_be_enabled(self):
+        middleware = CORSMiddleware(None, ["https://bazaar.example"], allow_dev_origins=True)
+        assert middleware.is_allowed("http://localhost:5173")
+        assert not middleware.is_allowed("http://localhost.evil.example")
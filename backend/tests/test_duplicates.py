@@ -0,0 +1,236 @@
+"""
+Tests for the embedding index and near-duplicate listing detection
+in the background moderation worker.
+"""
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.core import vector_index
+from app.core.config import settings
+from app.core.vector_index import VectorIndex
+from app.models.item import Item as ItemModel, ItemCategory, ItemType, ModerationStatus
+from app.models.item_embedding import ItemEmbedding
+from app.services import duplicates
+from app.services.duplicates import reset_duplicate_index, save_duplicate_index
+from app.services.moderation_jobs import ModerationJobWorker, enqueue_moderation_job
+from tests.conftest import TestingSessionLocal
+from tests.test_moderation_jobs import FakeModeration, _result
+
+DIM = 16
+
+
+def embedding(seed, noise=0.0, noise_seed=100):
+    vector = np.random.default_rng(seed).normal(size=DIM)
+    if noise:
+        vector = vector + noise * np.random.default_rng(noise_seed).normal(size=DIM)
+    return (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+
+
+def make_item(db_session, owner, title="Чайник", enqueue=True, **fields):
+    item = ItemModel(
+        title=title,
+        item_type=ItemType.RENT,
+        price_per_day=100,
+        owner_id=owner.id,
+        category=ItemCategory.KITCHEN,
+        is_active=True,
+        image_url=f"https://example.com/{title}-{fields.pop('suffix', 0)}.jpg",
+        moderation_status=ModerationStatus.PENDING,
+        **fields,
+    )
+    db_session.add(item)
+    db_session.flush()
+    if enqueue:
+        enqueue_moderation_job(db_session, item)
+    db_session.commit()
+    return item
+
+
+async def moderate(vector):
+    worker = ModerationJobWorker(
+        FakeModeration(_result("approved", "approved", 0.97, embedding=vector)),
+        TestingSessionLocal,
+    )
+    return await worker.process_once()
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    reset_duplicate_index()
+    yield
+    reset_duplicate_index()
+
+
+@pytest.mark.unit
+class TestVectorIndex:
+    """Test the in-memory embedding matrix."""
+
+    def test_search_by_owner(self):
+        index = VectorIndex()
+        index.add(1, owner_id=10, vector=embedding(1))
+        index.add(2, owner_id=10, vector=embedding(2))
+        index.add(3, owner_id=20, vector=embedding(1))
+
+        [(item_id, similarity)] = index.search(embedding(1, noise=0.05), owner_id=10, threshold=0.9)
+        assert item_id == 1 and similarity > 0.9
+        assert [i for i, _ in index.search(embedding(1), threshold=0.99)] in ([1, 3], [3, 1])
+        assert index.search(embedding(1), owner_id=10, threshold=0.99, exclude=[1]) == []
+        assert index.search(embedding(1), owner_id=30) == []
+
+    def test_replace_and_remove(self):
+        index = VectorIndex()
+        for item_id in range(5):
+            index.add(item_id, owner_id=1, vector=embedding(item_id))
+        index.add(0, owner_id=1, vector=embedding(42))
+        assert len(index) == 5
+        assert index.search(embedding(42), k=1)[0][0] == 0
+
+        assert index.remove(1)
+        assert not index.remove(1)
+        assert len(index) == 4 and 1 not in index
+        # The last row moved into the freed slot and is still found
+        assert index.search(embedding(4), k=1)[0] == (4, pytest.approx(1.0, abs=1e-5))
+
+    def test_grows_past_initial_capacity(self, monkeypatch):
+        monkeypatch.setattr(vector_index, "_INITIAL_CAPACITY", 4)
+        index = VectorIndex()
+        for item_id in range(50):
+            index.add(item_id, owner_id=item_id % 3, vector=embedding(item_id))
+        assert len(index) == 50
+        assert index.search(embedding(37), owner_id=1, k=1)[0][0] == 37
+
+    def test_save_and_load(self, tmp_path):
+        index = VectorIndex("v1")
+        index.add(1, owner_id=10, vector=embedding(1))
+        index.add(2, owner_id=11, vector=embedding(2))
+        index.last_id = 7
+        path = tmp_path / "index.npz"
+        index.save(path)
+
+        loaded = VectorIndex.load(path, "v1")
+        assert len(loaded) == 2 and loaded.last_id == 7 and loaded.dim == DIM
+        assert loaded.search(embedding(2), owner_id=11, k=1)[0][0] == 2
+        assert VectorIndex.load(path, "v2") is None
+        assert VectorIndex.load(tmp_path / "missing.npz") is None
+
+    def test_concurrent_saves_keep_a_valid_snapshot(self, tmp_path):
+        path = tmp_path / "index.npz"
+        indexes = []
+        for version in range(4):
+            index = VectorIndex("v1")
+            for item_id in range(200):
+                index.add(item_id, owner_id=version, vector=embedding(item_id))
+            indexes.append(index)
+
+        threads = [threading.Thread(target=index.save, args=(path,)) for index in indexes * 5]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        loaded = VectorIndex.load(path, "v1")
+        assert loaded is not None and len(loaded) == 200
+        assert list(tmp_path.iterdir()) == [path]
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestDuplicateDetection:
+    """Test flagging reposts of the same owner's listings."""
+
+    async def test_repost_is_flagged_for_moderators(self, db_session, test_user):
+        original = make_item(db_session, test_user)
+        await moderate(embedding(1))
+        db_session.refresh(original)
+        assert original.moderation_status == ModerationStatus.APPROVED
+        assert db_session.query(ItemEmbedding).filter_by(item_id=original.id).count() == 1
+
+        repost = make_item(db_session, test_user, suffix=1)
+        await moderate(embedding(1, noise=0.05))
+        db_session.refresh(repost)
+        assert repost.duplicate_of_id == original.id
+        assert repost.moderation_status == ModerationStatus.PENDING
+
+    async def test_different_image_or_owner_is_not_a_duplicate(self, db_session, test_user, test_moderator):
+        make_item(db_session, test_user)
+        await moderate(embedding(1))
+
+        other_image = make_item(db_session, test_user, suffix=1)
+        await moderate(embedding(2))
+        other_owner = make_item(db_session, test_moderator, suffix=2)
+        await moderate(embedding(1))
+
+        for item in (other_image, other_owner):
+            db_session.refresh(item)
+            assert item.duplicate_of_id is None
+            assert item.moderation_status == ModerationStatus.APPROVED
+
+    async def test_inactive_original_does_not_count(self, db_session, test_user):
+        original = make_item(db_session, test_user)
+        await moderate(embedding(1))
+        original.is_active = False
+        db_session.commit()
+
+        repost = make_item(db_session, test_user, suffix=1)
+        await moderate(embedding(1))
+        db_session.refresh(repost)
+        assert repost.duplicate_of_id is None
+
+    async def test_reject_action(self, db_session, test_user, monkeypatch):
+        monkeypatch.setattr(settings, "DUPLICATE_ACTION", "reject")
+        make_item(db_session, test_user, title="Утюг")
+        await moderate(embedding(1))
+
+        repost = make_item(db_session, test_user, title="Утюг", suffix=1)
+        await moderate(embedding(1))
+        db_session.refresh(repost)
+        assert repost.moderation_status == ModerationStatus.REJECTED
+        assert repost.is_active is False
+        assert repost.moderation_comment == "Повтор объявления «Утюг»"
+
+    async def test_embeddings_of_other_processes_are_picked_up(self, db_session, test_user):
+        make_item(db_session, test_user, title="Плед")
+        await moderate(embedding(9))
+        assert len(duplicates._index) == 1
+
+        # A row written by another worker process after the index was built
+        original = make_item(db_session, test_user, enqueue=False, suffix=0)
+        original.moderation_status = ModerationStatus.APPROVED
+        db_session.add(ItemEmbedding(
+            item_id=original.id,
+            owner_id=test_user.id,
+            model_version="unknown",
+            embedding=np.asarray(embedding(3), dtype=np.float32).tobytes(),
+        ))
+        db_session.commit()
+
+        repost = make_item(db_session, test_user, suffix=1)
+        await moderate(embedding(3))
+        db_session.refresh(repost)
+        assert repost.duplicate_of_id == original.id
+
+    async def test_index_is_persisted_and_pruned_on_load(self, db_session, test_user, tmp_path, monkeypatch):
+        path = tmp_path / "duplicates.npz"
+        monkeypatch.setattr(settings, "DUPLICATE_INDEX_PATH", str(path))
+        first = make_item(db_session, test_user, title="Лампа")
+        await moderate(embedding(5))
+        second = make_item(db_session, test_user, title="Стул")
+        await moderate(embedding(6))
+        assert save_duplicate_index(force=True)
+        assert path.exists()
+
+        # Deleted while the worker was down
+        db_session.query(ItemEmbedding).filter_by(item_id=second.id).delete()
+        db_session.commit()
+        reset_duplicate_index()
+
+        db = TestingSessionLocal()
+        try:
+            index = duplicates.get_duplicate_index(db)
+        finally:
+            db.close()
+        assert first.id in index
+        assert second.id not in index
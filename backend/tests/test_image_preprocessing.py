@@ -0,0 +1,120 @@
+"""
+Tests for image download, decoding limits and CLIP preprocessing.
+"""
+from io import BytesIO
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from PIL import Image
+
+np = pytest.importorskip("numpy")
+
+from app.ai_moderation.preprocessor import (
+    CLIP_MEAN,
+    CLIP_STD,
+    ClipPreprocessor,
+    download_image_bytes_async,
+    load_image_from_bytes,
+)
+from app.core.http_client import close_http_session
+
+
+def encode(image, format="JPEG"):
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def gradient(width, height):
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    y = np.linspace(0, 255, height, dtype=np.uint8)
+    pixels = np.stack([np.tile(x, (height, 1)), np.tile(y[:, None], (1, width)), np.full((height, width), 90, np.uint8)], axis=2)
+    return Image.fromarray(pixels)
+
+
+def reference_pixel_values(image, size=224):
+    """Two-step resize, crop and per-image normalization, as CLIPImageProcessor does it"""
+    width, height = image.size
+    scale = size / min(width, height)
+    resized = image.resize((max(size, round(width * scale)), max(size, round(height * scale))), Image.BICUBIC)
+    left, top = (resized.width - size) // 2, (resized.height - size) // 2
+    crop = np.asarray(resized.crop((left, top, left + size, top + size)), dtype=np.float32) / 255
+    return ((crop - np.array(CLIP_MEAN)) / np.array(CLIP_STD)).transpose(2, 0, 1)
+
+
+@pytest.fixture
+async def image_server():
+    """Serves a large body with and without Content-Length"""
+    body = b"x" * 300_000
+
+    async def sized(request):
+        return web.Response(body=body)
+
+    async def chunked(request):
+        response = web.StreamResponse()
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for start in range(0, len(body), 50_000):
+            await response.write(body[start:start + 50_000])
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/sized", sized)
+    app.router.add_get("/chunked", chunked)
+    server = TestServer(app)
+    await server.start_server()
+    yield server
+    await close_http_session()
+    await server.close()
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestImagePreprocessing:
+    """Test draft decoding, pixel and size limits, and batched normalization."""
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        image = load_image_from_bytes(encode(gradient(3000, 2000)))
+        assert image.mode == "RGB"
+        assert min(image.size) >= 224
+        assert image.size[0] <= 3000 // 4
+
+    def test_png_is_decoded_in_full(self):
+        image = load_image_from_bytes(encode(Image.new("RGBA", (640, 480)), "PNG"))
+        assert image.mode == "RGB"
+        assert image.size == (640, 480)
+
+    def test_too_many_pixels_are_rejected_before_decoding(self):
+        with pytest.raises(ValueError, match="too many pixels"):
+            load_image_from_bytes(encode(Image.new("L", (4000, 3000))), max_pixels=10_000_000)
+
+    def test_garbage_is_rejected(self):
+        with pytest.raises(ValueError):
+            load_image_from_bytes(b"not an image")
+
+    def test_matches_reference_preprocessing(self):
+        images = [gradient(640, 480), gradient(300, 900), gradient(224, 224)]
+        batch = ClipPreprocessor()(images)
+        assert batch.shape == (3, 3, 224, 224)
+        assert batch.dtype == np.float32
+        for image, pixel_values in zip(images, batch):
+            # One resample instead of resize+crop: a few levels on a smooth image
+            assert np.abs(pixel_values - reference_pixel_values(image)).mean() < 0.02
+
+    def test_buffer_is_reused(self):
+        preprocess = ClipPreprocessor()
+        first = preprocess([gradient(300, 300)] * 4)
+        second = preprocess([gradient(300, 300)] * 2)
+        assert np.shares_memory(first, second)
+        assert second.shape[0] == 2
+
+    async def test_download_within_limit(self, image_server):
+        data = await download_image_bytes_async(str(image_server.make_url("/sized")), max_bytes=400_000)
+        assert len(data) == 300_000
+
+    @pytest.mark.parametrize("path", ["/sized", "/chunked"])
+    async def test_download_over_limit_is_cut_off(self, image_server, path):
+        with pytest.raises(ValueError, match="too large"):
+            await download_image_bytes_async(str(image_server.make_url(path)), max_bytes=100_000)
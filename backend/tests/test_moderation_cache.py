@@ -0,0 +1,107 @@
+"""
+Tests for the content-hash cache of moderation results.
+"""
+import pytest
+from app.core import ai_service
+from app.core.config import settings
+from app.models.moderation_cache import ModerationResult
+from app.services.moderation_cache import ModerationCache, hash_image
+from tests.conftest import TestingSessionLocal
+
+
+class CountingPredictor:
+    model_version = "v1"
+
+    def __init__(self):
+        self.images = []
+
+    def predict_batch(self, images):
+        self.images.extend(images)
+        return [
+            {
+                "predicted_class": "approved",
+                "confidence": 0.97,
+                "probabilities": {"approved": 0.97, "rejected_spam": 0.03},
+                "processing_time_ms": 12,
+                "embedding": [0.6, 0.8],
+            }
+            for _ in images
+        ]
+
+
+@pytest.fixture
+async def cached_model(db_session, monkeypatch):
+    """Counting predictor behind a cache stored in the test database; downloads are counted."""
+    from app.ai_moderation import preprocessor
+
+    downloads = []
+
+    async def fake_download(url, timeout=30):
+        downloads.append(url)
+        return b"same-photo" if "copy" in url else url.encode()
+
+    monkeypatch.setattr(preprocessor, "download_image_bytes_async", fake_download)
+    monkeypatch.setattr(preprocessor, "load_image_from_bytes", bytes.decode)
+    predictor = CountingPredictor()
+    ai_service.initialize_predictor(predictor)
+    ai_service._cache = ModerationCache("v1", session_factory=TestingSessionLocal)
+    predictor.downloads = downloads
+    yield predictor
+    await ai_service.close_batcher()
+    ai_service._predictor = None
+    ai_service._batcher = None
+    ai_service._cache = None
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestModerationCache:
+    """Test the URL index, content hashing, the database tier and model versions."""
+
+    async def test_same_url_is_not_downloaded_again(self, cached_model):
+        first = await ai_service.predict_image_url("http://img.example/a.jpg")
+        second = await ai_service.predict_image_url("http://img.example/a.jpg")
+
+        assert second["predicted_class"] == first["predicted_class"]
+        assert cached_model.downloads == ["http://img.example/a.jpg"]
+        assert len(cached_model.images) == 1
+
+    async def test_identical_bytes_under_new_url_skip_inference(self, cached_model):
+        await ai_service.predict_image_url("http://img.example/copy-1.jpg")
+        await ai_service.predict_image_url("http://img.example/copy-2.jpg")
+
+        assert len(cached_model.downloads) == 2
+        assert len(cached_model.images) == 1
+        assert ai_service.get_cache().hits == 1
+
+    async def test_database_tier_survives_memory_loss(self, cached_model):
+        await ai_service.predict_image_bytes(b"photo", "http://img.example/p.jpg")
+
+        fresh = ModerationCache("v1", session_factory=TestingSessionLocal)
+        cached = await fresh.get_by_url("http://img.example/p.jpg")
+
+        assert cached["predicted_class"] == "approved"
+        assert cached["embedding"] == pytest.approx([0.6, 0.8])
+        assert cached["processing_time_ms"] == 0
+
+    async def test_other_model_version_misses_and_is_purged(self, cached_model, db_session, monkeypatch):
+        await ai_service.predict_image_bytes(b"photo")
+
+        new_version = ModerationCache("v2", session_factory=TestingSessionLocal)
+        assert await new_version.get(hash_image(b"photo")) is None
+        # v1 has just written: its workers may still be running
+        assert new_version.purge_other_versions() == 0
+
+        monkeypatch.setattr(settings, "AI_MODERATION_CACHE_PURGE_AFTER_SECONDS", 0.0)
+        assert new_version.purge_other_versions() == 1
+        assert db_session.query(ModerationResult).count() == 0
+
+    async def test_versions_share_an_image_during_rollout(self, db_session):
+        prediction = {"predicted_class": "approved", "confidence": 0.9, "probabilities": {"approved": 0.9}}
+        old, new = (ModerationCache(v, session_factory=TestingSessionLocal) for v in ("v1", "v2"))
+        await old.put("abc", prediction)
+        await new.put("abc", {**prediction, "predicted_class": "rejected_spam"})
+
+        fresh_old = ModerationCache("v1", session_factory=TestingSessionLocal)
+        assert (await fresh_old.get("abc"))["predicted_class"] == "approved"
+        assert db_session.query(ModerationResult).count() == 2
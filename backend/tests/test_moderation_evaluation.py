@@ -0,0 +1,178 @@
+"""
+Tests for the moderation evaluation helpers and the benchmark script.
+"""
+import json
+import runpy
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app.ai_moderation.evaluation import (
+    auto_moderation_report,
+    benchmark,
+    classification_report,
+    load_labelled_dataset,
+    percentile,
+)
+from app.core import ai_service
+from app.core.config import settings
+
+CLASSES = ["approved", "rejected_nsfw", "rejected_violence", "rejected_spam"]
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "moderation_benchmark.py"
+
+
+def prediction(predicted_class, confidence):
+    return {"predicted_class": predicted_class, "confidence": confidence}
+
+
+async def _resolved(value):
+    return value
+
+
+class StubPredictor:
+    classes = CLASSES
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, images):
+        self.batches.append(len(images))
+        return [prediction("approved", 0.9) for _ in images]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    for label, color in (("approved", (30, 200, 30)), ("rejected_spam", (200, 30, 30))):
+        (tmp_path / label).mkdir()
+        for i in range(3):
+            Image.new("RGB", (320, 240), color).save(tmp_path / label / f"{i}.jpg")
+    (tmp_path / "approved" / "notes.txt").write_text("not an image")
+    return tmp_path
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestModerationEvaluation:
+    """Test dataset loading, threshold metrics, benchmarking and the JSON report."""
+
+    def test_labelled_dataset(self, dataset):
+        samples = load_labelled_dataset(dataset, CLASSES)
+        assert len(samples) == 6
+        assert [label for _, label in samples] == ["approved"] * 3 + ["rejected_spam"] * 3
+
+    def test_unknown_class_directory_is_rejected(self, dataset):
+        (dataset / "cats").mkdir()
+        with pytest.raises(ValueError, match="cats"):
+            load_labelled_dataset(dataset, CLASSES)
+
+    def test_precision_and_recall_at_threshold(self):
+        predictions = [
+            prediction("approved", 0.95),
+            prediction("approved", 0.6),
+            prediction("rejected_spam", 0.92),
+            prediction("approved", 0.97),
+        ]
+        labels = ["approved", "approved", "rejected_spam", "rejected_spam"]
+
+        everything = classification_report(predictions, labels, CLASSES)
+        assert everything["coverage"] == 1.0
+        assert everything["accuracy"] == 0.75
+        assert everything["classes"]["approved"]["precision"] == pytest.approx(2 / 3, abs=1e-4)
+        assert everything["classes"]["approved"]["recall"] == 1.0
+        assert everything["classes"]["rejected_spam"]["recall"] == 0.5
+        assert everything["classes"]["rejected_nsfw"] == {"precision": None, "recall": None, "support": 0, "predicted": 0}
+
+        # The uncertain approval abstains: precision unchanged, recall drops
+        confident = classification_report(predictions, labels, CLASSES, threshold=0.9)
+        assert confident["coverage"] == 0.75
+        assert confident["classes"]["approved"]["precision"] == 0.5
+        assert confident["classes"]["approved"]["recall"] == 0.5
+
+    def test_auto_moderation_report(self):
+        predictions = [
+            prediction("approved", 0.9),
+            prediction("approved", 0.9),
+            prediction("rejected_nsfw", 0.95),
+            prediction("rejected_nsfw", 0.8),
+        ]
+        labels = ["approved", "rejected_nsfw", "approved", "rejected_nsfw"]
+        report = auto_moderation_report(predictions, labels, approve_confidence=0.85, reject_confidence=0.9)
+        assert report["auto_approved"] == 2
+        assert report["auto_rejected"] == 1
+        assert report["manual"] == 1
+        assert report["automation_rate"] == 0.75
+        assert report["wrongly_approved"] == 1
+        assert report["wrongly_rejected"] == 1
+
+    async def test_report_matches_live_moderation(self, monkeypatch):
+        class FormattingPredictor:
+            def format_prediction_for_api(self, prediction):
+                return dict(prediction)
+
+        monkeypatch.setattr(ai_service, "_predictor", FormattingPredictor())
+        predictions = [
+            prediction("approved", 0.85),
+            prediction("approved", 0.8),
+            prediction("rejected_spam", 0.9),
+            prediction("rejected_spam", 0.75),
+        ]
+        statuses = []
+        for p in predictions:
+            result = await ai_service._moderate(lambda: _resolved(p), "test", None, None)
+            statuses.append(result["status"])
+
+        report = auto_moderation_report(
+            predictions,
+            ["approved"] * len(predictions),
+            approve_confidence=settings.AI_MODERATION_AUTO_APPROVE_CONFIDENCE,
+            reject_confidence=settings.AI_MODERATION_AUTO_REJECT_CONFIDENCE,
+        )
+        assert statuses == ["approved", "pending", "rejected", "pending"]
+        assert report["auto_approved"] == statuses.count("approved")
+        assert report["auto_rejected"] == statuses.count("rejected")
+
+    def test_benchmark_cycles_images_into_batches(self):
+        predictor = StubPredictor()
+        run = benchmark(predictor, [Image.new("RGB", (8, 8))] * 3, batch_size=8, repeat=5, warmup=1)
+        assert predictor.batches == [8] * 6
+        assert run["batch_size"] == 8
+        assert run["calls"] == 5
+        assert run["p50_ms"] <= run["p99_ms"]
+        assert run["images_per_second"] > 0
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 51
+        assert percentile(values, 99) == 100
+        assert percentile([7], 90) == 7
+
+    def test_script_writes_json_report(self, dataset, tmp_path, monkeypatch):
+        pytest.importorskip("onnxruntime")
+        from app.ai_moderation.onnx_engine import default_onnx_path
+        from tests.test_onnx_engine import build_model
+
+        model_dir = tmp_path / "model"
+        model_dir.mkdir()
+        build_model(default_onnx_path(model_dir))
+        output = tmp_path / "report.json"
+        # The script overrides these from its options
+        monkeypatch.setattr(settings, "AI_MODERATION_ONNX_INT8", False)
+        monkeypatch.setattr(settings, "AI_MODERATION_DTYPE", settings.AI_MODERATION_DTYPE)
+        monkeypatch.setattr("sys.argv", [
+            str(SCRIPT), "--images", str(dataset), "--model-dir", str(model_dir), "--engine", "onnx",
+            "--threads", "1", "2", "--batch-sizes", "1", "4", "--repeat", "3", "--output", str(output),
+        ])
+
+        with pytest.raises(SystemExit) as exit_info:
+            runpy.run_path(str(SCRIPT), run_name="__main__")
+        assert exit_info.value.code == 0
+
+        report = json.loads(output.read_text())
+        assert report["config"]["images"] == 6
+        assert report["config"]["classes"] == CLASSES
+        assert [q["threshold"] for q in report["quality"]] == [0.5, 0.7, 0.85, 0.9, 0.95]
+        assert report["quality"][0]["classes"]["approved"]["support"] == 3
+        assert report["auto"]["auto_approved"] + report["auto"]["auto_rejected"] + report["auto"]["manual"] == 6
+        assert [(run["threads"], run["batch_size"]) for run in report["performance"]] == [(1, 1), (1, 4), (2, 1), (2, 4)]
+        assert report["memory"]["peak_rss_mb"] > 0
@@ -0,0 +1,208 @@
+"""
+Tests for the background moderation queue: enqueueing on item creation,
+applying AI decisions, retries and the dead-letter queue.
+"""
+import pytest
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.models.item import ModerationStatus
+from app.models.moderation_job import ModerationJob, ModerationJobStatus
+from app.models.notification import NotificationOutbox, NotificationType
+from app.services.moderation_jobs import ModerationJobWorker, enqueue_moderation_job
+from tests.conftest import TestingSessionLocal
+
+
+def _result(status, reason, confidence, auto_action=True, **extra):
+    return {
+        "status": status,
+        "reason": reason,
+        "confidence": confidence,
+        "probabilities": {},
+        "processing_time_ms": 1,
+        "model": "trained",
+        "auto_action": auto_action,
+        **extra,
+    }
+
+
+class FakeModeration:
+    """Returns queued results per URL and records the calls"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    async def __call__(self, image_url, category=None, min_confidence_for_rejection=0.7):
+        self.calls.append(image_url)
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+@pytest.fixture
+def pending_item(db_session, test_item):
+    test_item.image_url = "https://example.com/photo.jpg"
+    test_item.moderation_status = ModerationStatus.PENDING
+    enqueue_moderation_job(db_session, test_item)
+    db_session.commit()
+    return test_item
+
+
+def _job(db_session):
+    db_session.expire_all()
+    return db_session.query(ModerationJob).one_or_none()
+
+
+def _notifications(db_session, user_id):
+    return db_session.query(NotificationOutbox).filter(NotificationOutbox.user_id == user_id).all()
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestModerationJobs:
+    """Test the durable queue between item creation and AI moderation."""
+
+    def test_create_item_enqueues_job_instead_of_waiting(self, client, auth_headers, db_session, monkeypatch):
+        monkeypatch.setattr(settings, "AI_MODERATION_ENABLED", True)
+        response = client.post(
+            "/api/v1/items/",
+            headers=auth_headers,
+            json={
+                "title": "Lamp",
+                "item_type": "rent",
+                "price_per_day": 100,
+                "category": "furniture",
+                "image_url": "https://example.com/lamp.jpg",
+            },
+        )
+        assert response.status_code == 201
+        assert response.json()["moderation_status"] == "pending"
+        job = _job(db_session)
+        assert job.item_id == response.json()["id"]
+        assert job.image_url == "https://example.com/lamp.jpg"
+        assert job.category == "furniture"
+        assert job.status == ModerationJobStatus.PENDING
+
+    def test_no_job_when_ai_moderation_is_disabled(self, client, auth_headers, db_session):
+        response = client.post(
+            "/api/v1/items/",
+            headers=auth_headers,
+            json={"title": "Lamp", "item_type": "rent", "price_per_day": 100, "image_url": "https://example.com/a.jpg"},
+        )
+        assert response.status_code == 201
+        assert _job(db_session) is None
+
+    async def test_confident_approval_is_applied_with_notification(self, db_session, pending_item):
+        worker = ModerationJobWorker(FakeModeration(_result("approved", "approved", 0.97)), TestingSessionLocal)
+        assert await worker.process_once() == 1
+
+        db_session.refresh(pending_item)
+        assert pending_item.moderation_status == ModerationStatus.APPROVED
+        assert pending_item.moderated_by_id is None
+        assert _job(db_session) is None
+        [notification] = _notifications(db_session, pending_item.owner_id)
+        assert notification.type == NotificationType.ITEM_APPROVED
+
+    async def test_confident_rejection_deactivates_item(self, db_session, pending_item):
+        worker = ModerationJobWorker(FakeModeration(_result("rejected", "rejected_spam", 0.95)), TestingSessionLocal)
+        await worker.process_once()
+
+        db_session.refresh(pending_item)
+        assert pending_item.moderation_status == ModerationStatus.REJECTED
+        assert pending_item.is_active is False
+        assert pending_item.moderation_comment == "Спам или реклама"
+        [notification] = _notifications(db_session, pending_item.owner_id)
+        assert notification.type == NotificationType.ITEM_REJECTED
+
+    async def test_uncertain_result_leaves_item_to_moderators(self, db_session, pending_item):
+        worker = ModerationJobWorker(
+            FakeModeration(_result("pending", "rejected_nsfw", 0.8, auto_action=False)),
+            TestingSessionLocal,
+        )
+        await worker.process_once()
+
+        db_session.refresh(pending_item)
+        assert pending_item.moderation_status == ModerationStatus.PENDING
+        assert _job(db_session) is None
+        assert _notifications(db_session, pending_item.owner_id) == []
+
+    async def test_item_moderated_meanwhile_is_not_touched(self, db_session, pending_item):
+        pending_item.moderation_status = ModerationStatus.REJECTED
+        db_session.commit()
+        worker = ModerationJobWorker(FakeModeration(_result("approved", "approved", 0.99)), TestingSessionLocal)
+        await worker.process_once()
+
+        db_session.refresh(pending_item)
+        assert pending_item.moderation_status == ModerationStatus.REJECTED
+        assert _job(db_session) is None
+        assert _notifications(db_session, pending_item.owner_id) == []
+
+    async def test_errors_are_retried_then_dead_lettered(self, db_session, pending_item, monkeypatch):
+        monkeypatch.setattr(settings, "MODERATION_JOB_MAX_ATTEMPTS", 2)
+        moderation = FakeModeration(_result("pending", "error", 0.0, auto_action=False, error="HTTP 404"))
+        worker = ModerationJobWorker(moderation, TestingSessionLocal)
+
+        await worker.process_once()
+        job = _job(db_session)
+        assert job.attempts == 1
+        assert job.last_error == "HTTP 404"
+        assert job.next_attempt_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+        # Not due yet
+        assert await worker.process_once() == 0
+
+        job.next_attempt_at = None
+        db_session.commit()
+        await worker.process_once()
+        job = _job(db_session)
+        assert job.status == ModerationJobStatus.DEAD
+        assert job.attempts == 2
+        assert len(moderation.calls) == 2
+
+        db_session.refresh(pending_item)
+        assert pending_item.moderation_status == ModerationStatus.PENDING
+
+    async def test_failed_apply_spends_an_attempt(self, db_session, pending_item, monkeypatch):
+        monkeypatch.setattr(settings, "MODERATION_JOB_MAX_ATTEMPTS", 1)
+
+        def broken(*args):
+            raise RuntimeError("database is gone")
+        monkeypatch.setattr(ModerationJobWorker, "_apply", broken)
+        worker = ModerationJobWorker(FakeModeration(_result("approved", "approved", 0.97)), TestingSessionLocal)
+
+        assert await worker.process_once() == 1
+        job = _job(db_session)
+        assert job.status == ModerationJobStatus.DEAD
+        assert job.attempts == 1
+        assert job.last_error == "database is gone"
+
+    async def test_busy_model_postpones_without_spending_attempts(self, db_session, pending_item):
+        worker = ModerationJobWorker(
+            FakeModeration(_result("pending", "queue_full", 0.0, auto_action=False)),
+            TestingSessionLocal,
+        )
+        await worker.process_once()
+        job = _job(db_session)
+        assert job.status == ModerationJobStatus.PENDING
+        assert job.attempts == 0
+        assert job.next_attempt_at is not None
+
+    def test_dead_letter_endpoints(self, client, moderator_headers, auth_headers, db_session, pending_item):
+        job = _job(db_session)
+        job.status = ModerationJobStatus.DEAD
+        job.attempts = 5
+        job.last_error = "timeout"
+        db_session.commit()
+
+        assert client.get("/api/v1/moderation/ai/jobs", headers=auth_headers).status_code == 403
+        response = client.get("/api/v1/moderation/ai/jobs", headers=moderator_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["pending"] == 0 and data["dead"] == 1
+        assert data["dead_jobs"][0]["last_error"] == "timeout"
+
+        response = client.post(f"/api/v1/moderation/ai/jobs/{job.id}/retry", headers=moderator_headers)
+        assert response.status_code == 200
+        assert response.json()["attempts"] == 0
+        job = _job(db_session)
+        assert job.status == ModerationJobStatus.PENDING
+
+        response = client.post(f"/api/v1/moderation/ai/jobs/{job.id}/retry", headers=moderator_headers)
+        assert response.status_code == 409
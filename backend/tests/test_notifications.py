@@ -0,0 +1,296 @@
+"""
+Tests for notifications and the notification outbox.
+"""
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from fastapi import status
+from app.models.item import Item as ItemModel, ModerationStatus
+from app.models.notification import (
+    Notification as NotificationModel,
+    NotificationArchive,
+    NotificationOutbox,
+    NotificationType,
+)
+from app.services.notification_dispatcher import dispatch_pending
+from app.services import notification_retention
+from app.services.notification_retention import archive_read_notifications, ensure_archive_partitions
+from app.services.notification_service import create_item_approved_notification, create_new_booking_notification
+from app.services.notification_templates import get_template, resolve_locale
+
+
+@pytest.fixture
+def pending_item(db_session, test_user) -> ItemModel:
+    item = ItemModel(
+        title="Pending Item",
+        description="Test",
+        item_type="rent",
+        price_per_hour=100.00,
+        owner_id=test_user.id,
+        category="electronics",
+        moderation_status=ModerationStatus.PENDING
+    )
+    db_session.add(item)
+    db_session.commit()
+    db_session.refresh(item)
+    return item
+
+
+@pytest.mark.notifications
+class TestNotificationOutbox:
+    """Test that notifications go through the outbox."""
+
+    def test_approve_records_outbox_entry(self, client, moderator_headers, db_session, pending_item):
+        """Approving an item records an outbox entry instead of a notification."""
+        response = client.post(
+            f"/api/v1/moderation/{pending_item.id}/approve",
+            headers=moderator_headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        entries = db_session.query(NotificationOutbox).all()
+        assert len(entries) == 1
+        assert entries[0].type == NotificationType.ITEM_APPROVED
+        assert entries[0].related_item_id == pending_item.id
+        assert db_session.query(NotificationModel).count() == 0
+
+    def test_dispatch_materializes_notifications(self, client, moderator_headers, auth_headers, db_session, pending_item, test_user):
+        """The dispatcher moves outbox entries into notifications in one batch."""
+        client.post(f"/api/v1/moderation/{pending_item.id}/approve", headers=moderator_headers)
+        client.post(f"/api/v1/moderation/{pending_item.id}/reject", headers=moderator_headers)
+
+        consumed, dispatched = dispatch_pending(db_session)
+        assert consumed == 2
+        assert [n["type"] for n in dispatched] == [NotificationType.ITEM_APPROVED, NotificationType.ITEM_REJECTED]
+        assert all(n["id"] is not None for n in dispatched)
+        assert db_session.query(NotificationOutbox).count() == 0
+        assert dispatch_pending(db_session) == (0, [])
+
+        response = client.get("/api/v1/notifications/", headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 2
+
+        response = client.get("/api/v1/notifications/unread/count", headers=auth_headers)
+        assert response.json()["count"] == 2
+
+    def test_dispatch_respects_batch_size(self, client, moderator_headers, db_session, pending_item):
+        """Only batch_size entries are dispatched per call."""
+        client.post(f"/api/v1/moderation/{pending_item.id}/approve", headers=moderator_headers)
+        client.post(f"/api/v1/moderation/{pending_item.id}/approve", headers=moderator_headers)
+
+        assert len(dispatch_pending(db_session, batch_size=1).notifications) == 1
+        assert db_session.query(NotificationOutbox).count() == 1
+
+
+@pytest.mark.notifications
+class TestNotificationTemplates:
+    """Test template-based notification rendering."""
+
+    def test_notifications_store_params_only(self, client, moderator_headers, db_session, pending_item):
+        """Stored notifications keep compact template params instead of text."""
+        client.post(
+            f"/api/v1/moderation/{pending_item.id}/reject",
+            params={"comment": "Спам"},
+            headers=moderator_headers
+        )
+        dispatch_pending(db_session)
+
+        notification = db_session.query(NotificationModel).one()
+        assert notification.title is None
+        assert notification.message is None
+        assert notification.params == '{"item":"Pending Item","comment":"Спам"}'
+
+    def test_render_uses_current_item_title(self, client, moderator_headers, auth_headers, db_session, pending_item):
+        """Renaming an item is reflected in existing notifications."""
+        client.post(f"/api/v1/moderation/{pending_item.id}/approve", headers=moderator_headers)
+        dispatch_pending(db_session)
+
+        pending_item.title = "Renamed Item"
+        db_session.commit()
+
+        response = client.get("/api/v1/notifications/", headers=auth_headers)
+        data = response.json()
+        assert data[0]["title"] == "Объявление одобрено"
+        assert data[0]["message"] == 'Ваше объявление "Renamed Item" было одобрено и опубликовано.'
+
+    def test_render_in_requested_language(self, client, moderator_headers, auth_headers, db_session, pending_item):
+        """Accept-Language selects the template locale."""
+        client.post(f"/api/v1/moderation/{pending_item.id}/approve", headers=moderator_headers)
+        dispatch_pending(db_session)
+
+        response = client.get(
+            "/api/v1/notifications/",
+            headers={**auth_headers, "Accept-Language": "en-US,en;q=0.9"}
+        )
+        assert response.json()[0]["title"] == "Listing approved"
+
+    def test_legacy_rows_render_stored_text(self, client, auth_headers, db_session, test_user):
+        """Rows created before templates keep their stored text."""
+        db_session.add(NotificationModel(
+            user_id=test_user.id,
+            type=NotificationType.ITEM_APPROVED,
+            title="Старый заголовок",
+            message="Старый текст",
+        ))
+        db_session.commit()
+
+        data = client.get("/api/v1/notifications/", headers=auth_headers).json()
+        assert data[0]["title"] == "Старый заголовок"
+        assert data[0]["message"] == "Старый текст"
+
+    def test_templates_cover_all_types(self):
+        """Every notification type has a template in every locale."""
+        for locale in ("ru", "en"):
+            for notification_type in NotificationType:
+                title, message = get_template(notification_type, locale).render({"item": "X", "renter": "u"})
+                assert title and message
+
+    def test_resolve_locale(self):
+        """The first supported language from Accept-Language wins."""
+        assert resolve_locale(None) == "ru"
+        assert resolve_locale("de-DE,en;q=0.8") == "en"
+        assert resolve_locale("fr") == "ru"
+
+
+@pytest.mark.notifications
+class TestNotificationRetention:
+    """Test archiving of old read notifications."""
+
+    def _add(self, db_session, user, is_read, age_days):
+        notification = NotificationModel(
+            user_id=user.id,
+            type=NotificationType.ITEM_APPROVED,
+            params='{"item":"X"}',
+            is_read=is_read,
+            created_at=datetime.now(timezone.utc) - timedelta(days=age_days),
+        )
+        db_session.add(notification)
+        db_session.commit()
+        return notification.id
+
+    def test_archive_moves_old_read_notifications(self, db_session, test_user):
+        """Only read notifications older than the retention age are archived."""
+        old_read = [self._add(db_session, test_user, True, 60) for _ in range(3)]
+        old_unread = self._add(db_session, test_user, False, 60)
+        recent_read = self._add(db_session, test_user, True, 1)
+
+        archived = archive_read_notifications(db_session, older_than=timedelta(days=30), batch_size=2)
+
+        assert archived == 3
+        remaining = {n.id for n in db_session.query(NotificationModel).all()}
+        assert remaining == {old_unread, recent_read}
+        archive = db_session.query(NotificationArchive).order_by(NotificationArchive.id).all()
+        assert [n.id for n in archive] == old_read
+        assert all(n.params == '{"item":"X"}' and n.is_read for n in archive)
+
+    def test_archive_is_noop_without_candidates(self, db_session, test_user):
+        """Nothing is archived when all notifications are recent or unread."""
+        self._add(db_session, test_user, False, 60)
+        self._add(db_session, test_user, True, 1)
+
+        assert archive_read_notifications(db_session, older_than=timedelta(days=30)) == 0
+        assert db_session.query(NotificationArchive).count() == 0
+
+    def test_partitions_are_cached_only_after_commit(self, monkeypatch):
+        """A partition created in a rolled back transaction is created again."""
+        statements = []
+
+        class PostgresSession:
+            def get_bind(self):
+                return SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+            def execute(self, statement):
+                statements.append(str(statement))
+
+        monkeypatch.setattr(notification_retention, "_known_partitions", set())
+        months = {date(2026, 1, 1)}
+        assert ensure_archive_partitions(PostgresSession(), months) == {"notifications_archive_y2026m01"}
+        assert ensure_archive_partitions(PostgresSession(), months) == {"notifications_archive_y2026m01"}
+        assert len(statements) == 2
+
+        notification_retention._known_partitions.add("notifications_archive_y2026m01")
+        assert ensure_archive_partitions(PostgresSession(), months) == set()
+        assert len(statements) == 2
+
+
+@pytest.mark.notifications
+class TestNotificationCoalescing:
+    """Test merging of bursty notifications about one item."""
+
+    def _booking_request(self, db_session, item, renter, created_at=None):
+        entry = create_new_booking_notification(
+            db_session,
+            owner_id=item.owner_id,
+            booking_id=None,
+            item_id=item.id,
+            item_title=item.title,
+            renter_username=renter,
+        )
+        if created_at is not None:
+            entry.created_at = created_at
+        db_session.commit()
+
+    def test_burst_is_merged_into_one_notification(self, client, auth_headers, db_session, test_item):
+        """Booking requests for one item within the window become one row with a count."""
+        for renter in ("anna", "boris", "vera"):
+            self._booking_request(db_session, test_item, renter)
+
+        consumed, dispatched = dispatch_pending(db_session)
+
+        # Three outbox entries were consumed even though one row came out
+        assert consumed == 3
+        assert len(dispatched) == 1
+        assert dispatched[0]["count"] == 3
+        notification = db_session.query(NotificationModel).one()
+        assert notification.count == 3
+        assert notification.params == '{"item":"%s","renter":"vera"}' % test_item.title
+
+        data = client.get("/api/v1/notifications/", headers=auth_headers).json()
+        assert data[0]["count"] == 3
+        assert data[0]["title"] == "Новые бронирования"
+        assert "3" in data[0]["message"] and "vera" in data[0]["message"]
+        assert client.get("/api/v1/notifications/unread/count", headers=auth_headers).json()["count"] == 1
+
+    def test_later_event_joins_unread_notification(self, db_session, test_item):
+        """An event dispatched later is added to the existing unread notification."""
+        self._booking_request(db_session, test_item, "anna")
+        dispatch_pending(db_session)
+        self._booking_request(db_session, test_item, "boris")
+
+        dispatched = dispatch_pending(db_session).notifications
+
+        notification = db_session.query(NotificationModel).one()
+        assert dispatched[0]["id"] == notification.id
+        assert notification.count == 2
+
+    def test_read_notification_is_not_extended(self, db_session, test_item):
+        """Once read, a notification starts a new group."""
+        self._booking_request(db_session, test_item, "anna")
+        dispatch_pending(db_session)
+        db_session.query(NotificationModel).update({"is_read": True})
+        db_session.commit()
+        self._booking_request(db_session, test_item, "boris")
+
+        dispatch_pending(db_session)
+
+        assert sorted(n.count for n in db_session.query(NotificationModel).all()) == [1, 1]
+
+    def test_events_outside_window_are_not_merged(self, db_session, test_item):
+        """The window is counted from the first event of a group."""
+        start = datetime.now(timezone.utc).replace(tzinfo=None)
+        self._booking_request(db_session, test_item, "anna", start)
+        self._booking_request(db_session, test_item, "boris", start + timedelta(seconds=30))
+        self._booking_request(db_session, test_item, "vera", start + timedelta(seconds=90))
+
+        dispatch_pending(db_session)
+
+        counts = [n.count for n in db_session.query(NotificationModel).order_by(NotificationModel.id)]
+        assert counts == [2, 1]
+
+    def test_other_types_are_not_merged(self, db_session, test_item):
+        """One-off notifications such as approvals are never merged."""
+        for _ in range(2):
+            create_item_approved_notification(db_session, test_item.owner_id, test_item.id, test_item.title)
+        db_session.commit()
+
+        assert len(dispatch_pending(db_session).notifications) == 2
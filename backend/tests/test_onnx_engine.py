@@ -0,0 +1,134 @@
+"""
+Tests for the ONNX Runtime moderation engine.
+
+A tiny graph with the same inputs and outputs as an exported CLIP model
+(mean color -> L2-normalized embedding -> linear head -> softmax) stands in
+for the real export, which needs torch and the model weights.
+"""
+import pytest
+from PIL import Image
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+import numpy as np
+from onnx import TensorProto, helper
+
+from app.ai_moderation.onnx_engine import (
+    OnnxModerationPredictor,
+    compare_predictions,
+    default_onnx_path,
+    quantize_int8,
+    write_metadata,
+)
+from app.ai_moderation.preprocessor import CLIP_MEAN, CLIP_STD, clip_pixel_values
+from app.core import ai_service
+from app.core.config import settings
+
+CLASSES = ["approved", "rejected_nsfw", "rejected_violence", "rejected_spam"]
+
+
+def build_model(path, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = rng.normal(size=(3, len(CLASSES))).astype(np.float32)
+    graph = helper.make_graph(
+        [
+            helper.make_node("GlobalAveragePool", ["pixel_values"], ["pooled"]),
+            helper.make_node("Flatten", ["pooled"], ["features"]),
+            helper.make_node("LpNormalization", ["features"], ["embeddings"], axis=1, p=2),
+            helper.make_node("MatMul", ["embeddings", "weights"], ["logits"]),
+            helper.make_node("Softmax", ["logits"], ["probs"], axis=1),
+        ],
+        "moderation",
+        [helper.make_tensor_value_info("pixel_values", TensorProto.FLOAT, ["batch", 3, 224, 224])],
+        [
+            helper.make_tensor_value_info("probs", TensorProto.FLOAT, ["batch", len(CLASSES)]),
+            helper.make_tensor_value_info("embeddings", TensorProto.FLOAT, ["batch", 3]),
+        ],
+        initializer=[helper.make_tensor("weights", TensorProto.FLOAT, weights.shape, weights.flatten())],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    write_metadata(path, {"classes": CLASSES, "image_size": 224, "quantization": None})
+    return path
+
+
+def images():
+    return [
+        Image.new("RGB", (320, 240), (200, 30, 30)),
+        Image.new("RGB", (240, 320), (30, 200, 30)),
+        Image.new("L", (224, 224), 128),
+    ]
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestOnnxEngine:
+    """Test CLIP preprocessing, the ONNX predictor, int8 quantization and engine selection."""
+
+    def test_clip_pixel_values(self):
+        batch = clip_pixel_values(images())
+        assert batch.shape == (3, 3, 224, 224)
+        assert batch.dtype == np.float32
+        # Solid red: every pixel of the red channel is normalized the same way
+        expected = (200 / 255 - CLIP_MEAN[0]) / CLIP_STD[0]
+        assert np.allclose(batch[0, 0], expected, atol=1e-3)
+
+    def test_batch_matches_single_predictions(self, tmp_path):
+        predictor = OnnxModerationPredictor(build_model(tmp_path / "moderation.onnx"), threads=1)
+        batch = predictor.predict_batch(images())
+        for image, prediction in zip(images(), batch):
+            single = predictor.predict(image)
+            assert single["predicted_class"] == prediction["predicted_class"]
+            assert single["probabilities"] == pytest.approx(prediction["probabilities"], abs=1e-6)
+        assert set(batch[0]["probabilities"]) == set(CLASSES)
+        assert sum(batch[0]["probabilities"].values()) == pytest.approx(1.0, abs=1e-5)
+        assert np.linalg.norm(batch[0]["embedding"]) == pytest.approx(1.0, abs=1e-5)
+
+    def test_version_follows_file_content(self, tmp_path):
+        first = OnnxModerationPredictor(build_model(tmp_path / "a.onnx", seed=0))
+        same = OnnxModerationPredictor(build_model(tmp_path / "b.onnx", seed=0))
+        other = OnnxModerationPredictor(build_model(tmp_path / "c.onnx", seed=1))
+        assert first.model_version == same.model_version
+        assert first.model_version != other.model_version
+
+    def test_int8_parity(self, tmp_path):
+        fp32 = OnnxModerationPredictor(build_model(tmp_path / "moderation.onnx"))
+        int8_path = quantize_int8(tmp_path / "moderation.onnx", tmp_path / "moderation.int8.onnx")
+        int8 = OnnxModerationPredictor(int8_path)
+        assert int8.quantization == "int8"
+        assert int8.model_version != fp32.model_version
+
+        report = compare_predictions(fp32.predict_batch(images()), int8.predict_batch(images()))
+        assert report["images"] == 3
+        assert report["top1_agreement"] == 1.0
+        assert report["max_abs_prob_diff"] < 0.05
+        assert report["min_embedding_cosine"] > 0.99
+
+    def test_memory_report(self, tmp_path):
+        predictor = OnnxModerationPredictor(build_model(tmp_path / "moderation.onnx"))
+        report = predictor.memory_report()
+        assert report["dtype"] == "float32"
+        assert report["weights_mb"] < 1
+        assert report["rss_mb"] > 0 and report["peak_rss_mb"] > 0
+
+    def test_engine_selected_from_settings(self, tmp_path, monkeypatch):
+        build_model(default_onnx_path(tmp_path))
+        monkeypatch.setattr(settings, "AI_MODERATION_ENABLED", True)
+        monkeypatch.setattr(settings, "AI_MODERATION_MODEL_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "AI_MODERATION_ENGINE", "onnx")
+        try:
+            assert ai_service.load_predictor_from_settings()
+            assert isinstance(ai_service.get_predictor(), OnnxModerationPredictor)
+        finally:
+            ai_service._predictor = None
+            ai_service._batcher = None
+            ai_service._cache = None
+
+    def test_unknown_engine_is_rejected(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "AI_MODERATION_ENABLED", True)
+        monkeypatch.setattr(settings, "AI_MODERATION_MODEL_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "AI_MODERATION_ENGINE", "tensorrt")
+        assert not ai_service.load_predictor_from_settings()
+        assert ai_service.get_predictor() is None
@@ -0,0 +1,94 @@
+"""
+Tests for the rate limiting middleware.
+"""
+import pytest
+from fastapi import status
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.rate_limit import MemoryStore, RateLimitMiddleware, RateLimitRule
+from app.core.security import create_access_token
+
+
+def _limited_app(per_minute=2):
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/limited", ok, methods=["GET"]), Route("/free", ok, methods=["GET"])])
+    rules = [RateLimitRule("test", per_minute, (("GET", "/limited"),))]
+    return RateLimitMiddleware(app, rules=rules, store=MemoryStore())
+
+
+def _bearer(user_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': f'u{user_id}', 'uid': user_id})}"}
+
+
+@pytest.mark.unit
+class TestRateLimitMiddleware:
+    """Test token-bucket limits, keys and headers."""
+
+    def test_limit_exceeded_returns_429(self):
+        """Requests beyond the bucket capacity get 429 with Retry-After."""
+        client = TestClient(_limited_app(per_minute=2))
+
+        first = client.get("/limited")
+        assert first.status_code == status.HTTP_200_OK
+        assert first.headers["RateLimit-Limit"] == "2"
+        assert first.headers["RateLimit-Remaining"] == "1"
+        assert client.get("/limited").status_code == status.HTTP_200_OK
+
+        response = client.get("/limited")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["Retry-After"] == "30"
+        assert response.headers["RateLimit-Remaining"] == "0"
+
+    def test_unlimited_routes_are_untouched(self):
+        """Routes outside any class pass through without headers."""
+        client = TestClient(_limited_app(per_minute=1))
+        for _ in range(3):
+            response = client.get("/free")
+            assert response.status_code == status.HTTP_200_OK
+            assert "RateLimit-Limit" not in response.headers
+
+    def test_buckets_are_per_user(self):
+        """Authenticated clients get their own bucket, independent of the IP."""
+        client = TestClient(_limited_app(per_minute=1))
+
+        assert client.get("/limited", headers=_bearer(1)).status_code == status.HTTP_200_OK
+        assert client.get("/limited", headers=_bearer(1)).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert client.get("/limited", headers=_bearer(2)).status_code == status.HTTP_200_OK
+        assert client.get("/limited").status_code == status.HTTP_200_OK
+
+    def test_memory_store_evicts_least_recent_keys(self):
+        """The in-process store stays bounded."""
+        store = MemoryStore(max_keys=2)
+        client = TestClient(RateLimitMiddleware(
+            _limited_app().app,
+            rules=[RateLimitRule("test", 1, (("GET", "/limited"),))],
+            store=store,
+        ))
+        for user_id in (1, 2, 3):
+            client.get("/limited", headers=_bearer(user_id))
+        assert len(store._buckets) == 2
+
+
+@pytest.mark.auth
+class TestLoginRateLimit:
+    """Test that the app limits login attempts per IP."""
+
+    def test_login_is_limited(self, client, test_user):
+        for _ in range(settings.RATE_LIMIT_AUTH_PER_MINUTE):
+            response = client.post(
+                "/api/v1/auth/login",
+                data={"username": test_user.username, "password": "wrong"}
+            )
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": test_user.username, "password": "testpassword123"}
+        )
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers["Retry-After"]) >= 1
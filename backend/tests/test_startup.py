@@ -0,0 +1,87 @@
+"""
+Tests for application startup and the readiness probe.
+"""
+import os
+import subprocess
+import sys
+import pytest
+from fastapi import status
+from app.core.readiness import ReadinessProbe
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.unit
+class TestReadiness:
+    """Test /ready and cached dependency checks."""
+
+    def test_ready_reports_checks_and_model_state(self, client):
+        response = client.get("/ready")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["checks"]["database"] == "ok"
+        assert data["model"] == "disabled"
+
+    async def test_failed_check_makes_service_not_ready(self):
+        def broken():
+            raise RuntimeError("connection refused")
+
+        probe = ReadinessProbe({"database": lambda: None, "storage": broken, "cache": None})
+        result = await probe.status()
+        assert result["status"] == "not_ready"
+        assert result["checks"] == {
+            "database": "ok",
+            "storage": "error: connection refused",
+            "cache": "skipped",
+        }
+
+    async def test_results_are_cached(self):
+        calls = []
+        probe = ReadinessProbe({"database": lambda: calls.append(1)}, cache_seconds=60)
+        for _ in range(5):
+            await probe.results()
+        assert len(calls) == 1
+
+        probe.cache_seconds = 0
+        await probe.results()
+        assert len(calls) == 2
+
+    async def test_slow_check_times_out(self):
+        import time
+
+        probe = ReadinessProbe({"storage": lambda: time.sleep(0.5)}, timeout=0.05)
+        assert (await probe.results())["storage"] == "timeout"
+
+
+@pytest.mark.slow
+class TestColdStart:
+    """Test that importing the app stays cheap when AI moderation is off."""
+
+    # Timing is opt-in: it depends on the machine. CI sets IMPORT_TIME_BUDGET_SECONDS
+    IMPORT_BUDGET_SECONDS = os.getenv("IMPORT_TIME_BUDGET_SECONDS")
+
+    def _import_app(self):
+        from scripts.importtime import HEAVY_MODULES
+
+        code = (
+            "import sys, time; start = time.perf_counter(); import app.main; "
+            "elapsed = time.perf_counter() - start; "
+            f"print(elapsed, ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        env = dict(os.environ, DATABASE_URL="sqlite://", SECRET_KEY="test", AI_MODERATION_ENABLED="false")
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        elapsed, _, heavy = result.stdout.strip().partition(" ")
+        return float(elapsed), heavy
+
+    def test_import_skips_heavy_modules(self):
+        _, heavy = self._import_app()
+        assert heavy == ""
+
+    @pytest.mark.skipif(IMPORT_BUDGET_SECONDS is None, reason="IMPORT_TIME_BUDGET_SECONDS is not set")
+    def test_import_fits_budget(self):
+        elapsed, _ = self._import_app()
+        assert elapsed < float(self.IMPORT_BUDGET_SECONDS)
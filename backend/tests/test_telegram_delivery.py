@@ -0,0 +1,171 @@
+"""
+Tests for Telegram delivery of notifications against a local stub Bot API server.
+"""
+import pytest
+from datetime import datetime, timezone
+from aiohttp import web
+from app.core.config import settings
+from app.core.token_bucket import TokenBucket
+from app.models.notification import Notification as NotificationModel, NotificationType
+from app.models.user import User as UserModel
+from app.services.telegram_delivery import TelegramDeliveryWorker, TelegramTransport, lease_seconds
+from tests.conftest import TestingSessionLocal
+
+
+class StubBotAPI:
+    """Minimal Telegram Bot API stand-in: records sendMessage calls."""
+
+    def __init__(self):
+        self.sent = []
+        self.responses = {}
+
+    async def send_message(self, request):
+        payload = await request.json()
+        chat_id = payload["chat_id"]
+        queued = self.responses.get(chat_id)
+        if queued:
+            status, body = queued.pop(0)
+            return web.json_response(body, status=status)
+        self.sent.append((chat_id, payload["text"]))
+        return web.json_response({"ok": True, "result": {}})
+
+
+@pytest.fixture
+async def stub_bot_api():
+    stub = StubBotAPI()
+    app = web.Application()
+    app.router.add_post("/bot{token}/sendMessage", stub.send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    stub.base_url = f"http://127.0.0.1:{port}"
+    yield stub
+    await runner.cleanup()
+
+
+@pytest.fixture
+def fast_delivery(monkeypatch):
+    monkeypatch.setattr(settings, "TELEGRAM_PER_CHAT_RATE", 1000.0)
+    monkeypatch.setattr(settings, "TELEGRAM_GLOBAL_RATE", 1000.0)
+
+
+def _user(db_session, name, telegram_id):
+    user = UserModel(
+        email=f"{name}@example.com",
+        username=name,
+        hashed_password="x",
+        telegram_id=telegram_id,
+    )
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+def _notification(db_session, user, item="Дрель"):
+    notification = NotificationModel(
+        user_id=user.id,
+        type=NotificationType.ITEM_APPROVED,
+        params=f'{{"item":"{item}"}}',
+    )
+    db_session.add(notification)
+    db_session.commit()
+    return notification.id
+
+
+@pytest.mark.notifications
+class TestTelegramDelivery:
+    """Test the batched Telegram delivery worker."""
+
+    async def test_delivers_rendered_notifications(self, db_session, stub_bot_api, fast_delivery):
+        """Undelivered notifications are sent once and marked delivered."""
+        user = _user(db_session, "tg_user", "1001")
+        offline = _user(db_session, "no_tg_user", None)
+        first = _notification(db_session, user)
+        skipped = _notification(db_session, offline)
+
+        worker = TelegramDeliveryWorker(TelegramTransport("token", stub_bot_api.base_url), TestingSessionLocal)
+        try:
+            assert await worker.deliver_once() == 1
+            assert await worker.deliver_once() == 0
+        finally:
+            await worker.transport.close()
+
+        assert stub_bot_api.sent == [
+            ("1001", 'Объявление одобрено\n\nВаше объявление "Дрель" было одобрено и опубликовано.')
+        ]
+        db_session.expire_all()
+        assert db_session.get(NotificationModel, first).delivered_at is not None
+        # Users without Telegram are skipped instead of staying undelivered forever
+        assert db_session.get(NotificationModel, skipped).delivered_at is not None
+        assert db_session.get(NotificationModel, skipped).delivery_attempts == 0
+
+    async def test_rate_limited_chat_is_rescheduled(self, db_session, stub_bot_api, fast_delivery):
+        """A 429 with retry_after postpones the chat's messages."""
+        user = _user(db_session, "tg_limited", "2002")
+        notification_id = _notification(db_session, user)
+        stub_bot_api.responses["2002"] = [
+            (429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 30}})
+        ]
+
+        worker = TelegramDeliveryWorker(TelegramTransport("token", stub_bot_api.base_url), TestingSessionLocal)
+        try:
+            await worker.deliver_once()
+        finally:
+            await worker.transport.close()
+
+        db_session.expire_all()
+        notification = db_session.get(NotificationModel, notification_id)
+        assert notification.delivered_at is None
+        assert notification.delivery_attempts == 1
+        next_attempt = notification.next_delivery_at.replace(tzinfo=timezone.utc)
+        assert (next_attempt - datetime.now(timezone.utc)).total_seconds() > 20
+
+    async def test_blocked_bot_is_not_retried(self, db_session, stub_bot_api, fast_delivery):
+        """A 403 from Telegram stops further attempts."""
+        user = _user(db_session, "tg_blocked", "3003")
+        notification_id = _notification(db_session, user)
+        stub_bot_api.responses["3003"] = [
+            (403, {"ok": False, "description": "Forbidden: bot was blocked by the user"})
+        ]
+
+        worker = TelegramDeliveryWorker(TelegramTransport("token", stub_bot_api.base_url), TestingSessionLocal)
+        try:
+            await worker.deliver_once()
+            assert await worker.deliver_once() == 0
+        finally:
+            await worker.transport.close()
+
+        db_session.expire_all()
+        notification = db_session.get(NotificationModel, notification_id)
+        assert notification.delivered_at is None
+        assert notification.delivery_attempts == settings.TELEGRAM_MAX_ATTEMPTS
+
+    def test_lease_covers_throttled_batch(self, monkeypatch):
+        """A batch is leased for at least as long as the rate limits make it take."""
+        monkeypatch.setattr(settings, "TELEGRAM_SEND_TIMEOUT_SECONDS", 0.0)
+        margin = settings.TELEGRAM_DELIVERY_LEASE_SECONDS
+        assert lease_seconds([]) == margin
+        # 100 messages to one chat at 1 msg/s
+        assert lease_seconds(["1"] * 100) == pytest.approx(100 / settings.TELEGRAM_PER_CHAT_RATE + margin)
+        # 100 chats, limited by the global rate
+        assert lease_seconds([str(i) for i in range(100)]) == pytest.approx(100 / settings.TELEGRAM_GLOBAL_RATE + margin)
+
+
+@pytest.mark.unit
+class TestTokenBucket:
+    """Test the token bucket used for rate limits."""
+
+    def test_acquire_until_empty(self):
+        bucket = TokenBucket(rate=1.0, capacity=2.0, now=0.0)
+        assert bucket.acquire(now=0.0) == 0.0
+        assert bucket.acquire(now=0.0) == 0.0
+        assert bucket.acquire(now=0.0) == pytest.approx(1.0)
+        assert bucket.acquire(now=1.0) == 0.0
+
+    def test_reserve_goes_into_debt(self):
+        bucket = TokenBucket(rate=2.0, capacity=1.0, now=0.0)
+        assert bucket.reserve(now=0.0) == 0.0
+        assert bucket.reserve(now=0.0) == pytest.approx(0.5)
+        assert bucket.reserve(now=0.0) == pytest.approx(1.0)
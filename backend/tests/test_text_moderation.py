@@ -0,0 +1,188 @@
+"""
+Tests for the listing text pre-filter: the Aho-Corasick automaton,
+normalization, hot reload and its effect on moderation decisions.
+"""
+import json
+import os
+
+import pytest
+
+from app.core import text_filter
+from app.core.config import settings
+from app.core.text_filter import AhoCorasick, TextFilter, _Pattern, check_text, get_text_filter, normalize
+from app.models.item import ModerationStatus
+from app.models.moderation_job import ModerationJob
+from app.models.notification import NotificationOutbox, NotificationType
+from app.services.moderation_jobs import ModerationJobWorker, enqueue_moderation_job
+from tests.conftest import TestingSessionLocal
+from tests.test_moderation_jobs import FakeModeration, _result
+
+
+def automaton(*words):
+    return AhoCorasick(_Pattern("test", word, word, False, False) for word in words)
+
+
+@pytest.fixture
+def fresh_filter(monkeypatch):
+    """A filter instance of its own, re-checking the file on every call"""
+    monkeypatch.setattr(text_filter, "_current", text_filter._ReloadingFilter())
+    monkeypatch.setattr(settings, "TEXT_MODERATION_RELOAD_INTERVAL_SECONDS", 0.0)
+
+
+def write_blocklists(path, patterns, mtime):
+    path.write_text(json.dumps({"banned_words": {"weight": 1.0, "whole_words": True, "patterns": patterns}}))
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestTextFilter:
+    """Test matching, normalization and scoring."""
+
+    def test_overlapping_patterns(self):
+        matches = sorted((end, p.pattern) for end, p in automaton("he", "she", "his", "hers").iter_matches("ushers"))
+        assert matches == [(4, "he"), (4, "she"), (6, "hers")]
+
+    def test_failure_links_recover_from_partial_match(self):
+        matches = [p.pattern for _, p in automaton("abcd", "bce").iter_matches("abce")]
+        assert matches == ["bce"]
+
+    def test_homoglyphs_and_invisible_characters(self):
+        # Latin a/o/k, digit 3, zero-width space, upper case
+        assert normalize("KA3И\u200bHO") == normalize("казино")
+        assert check_text("Ставки на спoрт").categories == ("banned_words",)
+
+    def test_whole_words_and_prefixes(self):
+        blocklists = {"words": {"whole_words": True, "patterns": ["кот", "инвестиц*"]}}
+        compiled = TextFilter(blocklists)
+        assert compiled.check("продам кот").categories == ("words",)
+        assert compiled.check("продам котел").categories == ()
+        assert compiled.check("выгодные инвестиции").categories == ("words",)
+        assert compiled.check("реинвестиции").categories == ()
+
+    def test_phone_numbers_and_links(self):
+        result = check_text("Стол", "Звоните +7 (916) 123-45-67 или пишите t.me/seller")
+        assert result.categories == ("external_links", "phone_numbers")
+        assert result.score == 1.0
+        # Prices and dates are not phone numbers
+        assert check_text("Цена 1500 руб, залог 3000, до 12.05.2026").categories == ()
+
+    def test_clean_text(self):
+        result = check_text("Настольная лампа", "Почти новая, забирать в 3 общежитии")
+        assert result == (0.0, (), ())
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestTextFilterReload:
+    """Test hot reload of the blocklist file."""
+
+    def test_changed_file_is_recompiled(self, tmp_path, monkeypatch, fresh_filter):
+        path = tmp_path / "blocklists.json"
+        write_blocklists(path, ["кальян"], 1_000)
+        monkeypatch.setattr(settings, "TEXT_MODERATION_BLOCKLIST_PATH", str(path))
+        first = get_text_filter()
+        assert check_text("кальян").score == 1.0
+        assert check_text("казино").score == 0.0
+        assert get_text_filter() is first
+
+        write_blocklists(path, ["казино"], 2_000)
+        assert get_text_filter() is not first
+        assert check_text("кальян").score == 0.0
+        assert check_text("казино").score == 1.0
+
+    def test_broken_file_keeps_previous_lists(self, tmp_path, monkeypatch, fresh_filter):
+        path = tmp_path / "blocklists.json"
+        write_blocklists(path, ["кальян"], 1_000)
+        monkeypatch.setattr(settings, "TEXT_MODERATION_BLOCKLIST_PATH", str(path))
+        assert check_text("кальян").score == 1.0
+
+        path.write_text("{not json")
+        os.utime(path, (2_000, 2_000))
+        assert check_text("кальян").score == 1.0
+
+
+@pytest.mark.unit
+@pytest.mark.moderation
+class TestTextModeration:
+    """Test how the text score feeds listing moderation."""
+
+    def create(self, client, auth_headers, **fields):
+        payload = {"title": "Лампа", "item_type": "rent", "price_per_day": 100, **fields}
+        response = client.post("/api/v1/items/", headers=auth_headers, json=payload)
+        assert response.status_code == 201
+        return response.json()
+
+    def test_banned_words_reject_at_once(self, client, auth_headers, db_session, monkeypatch):
+        monkeypatch.setattr(settings, "AI_MODERATION_ENABLED", True)
+        data = self.create(client, auth_headers, description="Ставки на спорт", image_url="https://example.com/a.jpg")
+        assert data["moderation_status"] == "rejected"
+        assert data["is_active"] is False
+        assert data["text_moderation_flags"] == "banned_words"
+        assert "Запрещенные товары" in data["moderation_comment"]
+        # No image check for an already rejected listing
+        assert db_session.query(ModerationJob).count() == 0
+        [entry] = db_session.query(NotificationOutbox).all()
+        assert entry.type == NotificationType.ITEM_REJECTED
+        assert entry.related_item_id == data["id"]
+
+    @pytest.mark.parametrize("title", ["Поддельная кожа, куртка", "Книга: оружие и тактика"])
+    def test_ambiguous_words_go_to_review(self, client, auth_headers, db_session, title):
+        data = self.create(client, auth_headers, title=title)
+        assert data["moderation_status"] == "pending"
+        assert data["is_active"] is True
+        assert data["text_moderation_flags"] == "restricted_goods"
+        assert db_session.query(NotificationOutbox).count() == 0
+
+    def test_contacts_alone_go_to_review(self, client, auth_headers):
+        data = self.create(client, auth_headers, description="Пишите в телеграм +7 999 123-45-67")
+        assert data["moderation_status"] == "pending"
+        assert data["is_active"] is True
+        assert data["text_moderation_score"] == 1.0
+
+    def test_suspicious_text_is_flagged(self, client, auth_headers):
+        data = self.create(client, auth_headers, description="Подробности в telegram")
+        assert data["moderation_status"] == "pending"
+        assert data["text_moderation_score"] == 0.5
+        assert data["text_moderation_flags"] == "external_links"
+
+    async def test_clean_image_does_not_approve_suspicious_text(self, db_session, test_item):
+        test_item.image_url = "https://example.com/photo.jpg"
+        test_item.moderation_status = ModerationStatus.PENDING
+        test_item.text_moderation_score = 0.5
+        enqueue_moderation_job(db_session, test_item)
+        db_session.commit()
+
+        worker = ModerationJobWorker(FakeModeration(_result("approved", "approved", 0.99)), TestingSessionLocal)
+        assert await worker.process_once() == 1
+        db_session.refresh(test_item)
+        assert test_item.moderation_status == ModerationStatus.PENDING
+
+    def test_editing_approved_item_rechecks_text(self, client, auth_headers, db_session, test_item):
+        response = client.put(
+            f"/api/v1/items/{test_item.id}", headers=auth_headers, json={"description": "Скидка по промокоду"}
+        )
+        assert response.json()["moderation_status"] == "pending"
+
+        response = client.put(
+            f"/api/v1/items/{test_item.id}",
+            headers=auth_headers,
+            json={"description": "Пишите в whatsapp 89161234567"},
+        )
+        assert response.json()["moderation_status"] == "pending"
+        assert response.json()["text_moderation_flags"] == "external_links,phone_numbers"
+
+        for _ in range(2):
+            response = client.put(
+                f"/api/v1/items/{test_item.id}", headers=auth_headers, json={"description": "Ставки на спорт, онлайн казино"}
+            )
+            assert response.json()["moderation_status"] == "rejected"
+            assert response.json()["is_active"] is False
+        # The owner is notified once, not on every edit of a rejected listing
+        assert db_session.query(NotificationOutbox).filter_by(type=NotificationType.ITEM_REJECTED).count() == 1
+
+    def test_filter_can_be_disabled(self, client, auth_headers, monkeypatch):
+        monkeypatch.setattr(settings, "TEXT_MODERATION_ENABLED", False)
+        data = self.create(client, auth_headers, description="казино")
+        assert data["moderation_status"] == "pending"
+        assert data["text_moderation_score"] is None
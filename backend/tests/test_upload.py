@@ -0,0 +1,133 @@
+"""
+Tests for image upload with AI moderation.
+"""
+import threading
+import time
+import pytest
+from fastapi import status
+from app.api.v1.endpoints import upload
+from app.core import ai_service
+from app.core.config import settings
+
+
+class VerdictPredictor:
+    """Returns a fixed verdict; records what it was asked to classify."""
+
+    model_version = "test"
+
+    def __init__(self, predicted_class="approved", confidence=0.99):
+        self.predicted_class = predicted_class
+        self.confidence = confidence
+        self.images = []
+        self.started = threading.Event()
+
+    def predict_batch(self, images):
+        self.started.set()
+        self.images.extend(images)
+        return [
+            {
+                "predicted_class": self.predicted_class,
+                "confidence": self.confidence,
+                "probabilities": {self.predicted_class: self.confidence},
+                "processing_time_ms": 1,
+            }
+            for _ in images
+        ]
+
+    def format_prediction_for_api(self, prediction):
+        return {
+            "status": "approved" if prediction["predicted_class"] == "approved" else "rejected",
+            "reason": prediction["predicted_class"],
+            "confidence": prediction["confidence"],
+            "probabilities": prediction["probabilities"],
+            "processing_time_ms": prediction["processing_time_ms"],
+            "model": "trained",
+        }
+
+
+@pytest.fixture
+def storage(client, monkeypatch):
+    """In-memory S3: records puts and deletes."""
+    state = {"objects": {}, "deleted": [], "fail": False, "put_saw_inference": None}
+
+    def fake_upload(file_content, filename, content_type, s3_key=None):
+        time.sleep(0.05)
+        if state["fail"]:
+            raise Exception("Ошибка загрузки файла в S3: connection refused")
+        predictor = ai_service.get_predictor()
+        state["put_saw_inference"] = predictor is not None and predictor.started.is_set()
+        state["objects"][s3_key] = file_content
+        return f"http://localhost:9000/bazaar-images/{s3_key}"
+
+    def fake_delete(s3_key):
+        state["deleted"].append(s3_key)
+        state["objects"].pop(s3_key, None)
+        return True
+
+    async def no_download(url, timeout=30):
+        raise AssertionError(f"upload must not download {url}")
+
+    from app.ai_moderation import preprocessor
+
+    monkeypatch.setattr(upload, "upload_file_to_s3", fake_upload)
+    monkeypatch.setattr(upload, "delete_file_from_s3", fake_delete)
+    monkeypatch.setattr(preprocessor, "download_image_bytes_async", no_download)
+    monkeypatch.setattr(preprocessor, "load_image_from_bytes", bytes.decode)
+    monkeypatch.setattr(settings, "AWS_S3_BUCKET", "bazaar-images")
+    monkeypatch.setattr(settings, "AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setattr(settings, "AWS_S3_ENDPOINT_URL", "http://minio:9000")
+    monkeypatch.setattr(settings, "AI_MODERATION_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_MODERATION_CACHE_ENABLED", False)
+    yield state
+    # The batcher worker runs on the test client's event loop
+    client.portal.call(ai_service.close_batcher)
+    ai_service._predictor = None
+    ai_service._batcher = None
+
+
+def _post_image(client, headers, content=b"jpeg-bytes"):
+    return client.post(
+        "/api/v1/upload/image",
+        files={"file": ("photo.jpg", content, "image/jpeg")},
+        headers=headers,
+    )
+
+
+@pytest.mark.moderation
+class TestUploadModeration:
+    """Test that uploads are moderated from memory, alongside the S3 put."""
+
+    def test_approved_image_is_kept(self, client, auth_headers, storage):
+        predictor = VerdictPredictor("approved")
+        ai_service.initialize_predictor(predictor)
+
+        response = _post_image(client, auth_headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["moderation"]["status"] == "approved"
+        key = data["url"].split("/bazaar-images/")[-1]
+        assert storage["objects"] == {key: b"jpeg-bytes"}
+        # Classified from the uploaded bytes, while the put was still running
+        assert predictor.images == ["jpeg-bytes"]
+        assert storage["put_saw_inference"] is True
+
+    def test_rejected_image_is_deleted(self, client, auth_headers, storage):
+        ai_service.initialize_predictor(VerdictPredictor("rejected_spam", confidence=0.97))
+
+        response = _post_image(client, auth_headers)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Спам" in response.json()["detail"]
+        assert storage["objects"] == {}
+        assert len(storage["deleted"]) == 1
+        assert storage["deleted"][0].startswith("items/")
+
+    def test_storage_failure_is_reported(self, client, auth_headers, storage):
+        ai_service.initialize_predictor(VerdictPredictor("approved"))
+        storage["fail"] = True
+
+        response = _post_image(client, auth_headers)
+
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert "connection refused" in response.json()["detail"]
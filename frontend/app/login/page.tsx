@@ -36,6 +36,7 @@ export default function LoginPage() {
     try {
       const response = await authApi.login(data)
       localStorage.setItem('token', response.access_token)
+      localStorage.setItem('refresh_token', response.refresh_token)
       router.push('/')
     } catch (err: any) {
       const errorMessage = err.response?.data?.detail || err.message || 'Ошибка входа'
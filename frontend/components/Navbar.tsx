@@ -59,7 +59,7 @@ export default function Navbar() {
   }, [])
 
   const handleLogout = () => {
-    localStorage.removeItem('token')
+    authApi.logout()
     setUser(null)
     router.push('/')
   }
@@ -43,9 +43,46 @@ api.interceptors.request.use((config) => {
   return Promise.reject(error)
 })
 
+// Запросы, после 401 на которые обновлять токен бессмысленно
+const AUTH_ENDPOINTS = ['/auth/login', '/auth/refresh', '/auth/logout']
+
+// Один запрос обновления на все параллельные 401
+let refreshPromise: Promise<string | null> | null = null
+
+const refreshAccessToken = (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem('refresh_token')
+  if (!refreshToken) {
+    return Promise.resolve(null)
+  }
+  if (!refreshPromise) {
+    refreshPromise = axios
+      .post(`${API_URL}/auth/refresh`, { refresh_token: refreshToken }, { timeout: 10000 })
+      .then((response) => {
+        localStorage.setItem('token', response.data.access_token)
+        localStorage.setItem('refresh_token', response.data.refresh_token)
+        return response.data.access_token as string
+      })
+      .catch(async (error) => {
+        // 409: другая вкладка только что обновила токен, берем его из хранилища
+        if (error.response?.status !== 409) {
+          return null
+        }
+        await new Promise((resolve) => setTimeout(resolve, 500))
+        if (localStorage.getItem('refresh_token') === refreshToken) {
+          return null
+        }
+        return localStorage.getItem('token')
+      })
+      .finally(() => {
+        refreshPromise = null
+      })
+  }
+  return refreshPromise
+}
+
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
     // Обработка сетевых ошибок (когда сервер недоступен)
     if (!error.response) {
       const errorDetails = {
@@ -88,7 +125,18 @@ api.interceptors.response.use(
     
     if (error.response?.status === 401) {
       if (typeof window !== 'undefined') {
+        // Истекший access-токен обновляем по refresh-токену и повторяем запрос
+        const config = error.config
+        if (config && !config._retried && !AUTH_ENDPOINTS.includes(config.url)) {
+          config._retried = true
+          const token = await refreshAccessToken()
+          if (token) {
+            config.headers.Authorization = `Bearer ${token}`
+            return api(config)
+          }
+        }
         localStorage.removeItem('token')
+        localStorage.removeItem('refresh_token')
         window.location.href = '/login'
       }
     }
@@ -36,6 +36,7 @@ export interface RegisterData {
 
 export interface TokenResponse {
   access_token: string
+  refresh_token: string
   token_type: string
 }
 
@@ -53,6 +54,15 @@ export const authApi = {
     return response.data
   },
 
+  logout: async (): Promise<void> => {
+    const refreshToken = localStorage.getItem('refresh_token')
+    localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
+    if (refreshToken) {
+      await api.post('/auth/logout', { refresh_token: refreshToken }).catch(() => undefined)
+    }
+  },
+
   register: async (data: RegisterData): Promise<User> => {
     const response = await api.post('/auth/register', data)
     return response.data